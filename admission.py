@@ -0,0 +1,156 @@
+import time
+import asyncio
+from collections import deque
+from agent_settings import ADMISSION_REQUESTS_PER_MINUTE, ADMISSION_TOKENS_PER_MINUTE, ADMISSION_BURST_SECONDS
+from agent_settings import ADMISSION_INITIAL_CONCURRENCY, ADMISSION_MIN_CONCURRENCY, ADMISSION_MAX_CONCURRENCY
+from agent_settings import ADMISSION_LATENCY_TARGET_SECONDS, ADMISSION_DECREASE_FACTOR, ADMISSION_DECREASE_COOLDOWN_SECONDS
+from deadline import DeadlineExceeded, remaining_time
+
+class TokenBucket():
+    """
+    Token bucket refilled continuously at rate per second, holding at most capacity tokens.
+    The level can go negative when a call used more than was reserved for it.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """
+        Seconds until amount tokens are available, 0 if they are available now.
+        Amounts above capacity count as capacity, the bucket could never hold them.
+        """
+        self.refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount):
+        """
+        Takes amount tokens, clamped to capacity as in wait_time.
+        """
+        self.refill()
+        self.level -= min(amount, self.capacity)
+
+class AdmissionController():
+    """
+    Admission control of the calls to one deployment: a token bucket for requests and one for tokens,
+    plus a concurrency limit adapted AIMD-style (additive increase on fast successes, multiplicative
+    decrease on 429s and slow calls). Waiting calls are admitted in arrival order and give up with DeadlineExceeded
+    when their tick budget runs out.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.requests = TokenBucket(ADMISSION_REQUESTS_PER_MINUTE / 60, ADMISSION_REQUESTS_PER_MINUTE / 60 * ADMISSION_BURST_SECONDS)
+        self.tokens = TokenBucket(ADMISSION_TOKENS_PER_MINUTE / 60, ADMISSION_TOKENS_PER_MINUTE / 60 * ADMISSION_BURST_SECONDS)
+        self.limit = float(ADMISSION_INITIAL_CONCURRENCY)
+        self.in_flight = 0
+        self.waiters = deque()
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.throttles = 0
+
+    def admission_wait(self, tokens):
+        """
+        Seconds to wait before the call can be admitted, 0 if it can go now, None if it waits for a call to finish.
+        """
+        blocked = self.blocked_until - time.monotonic()
+        if blocked > 0:
+            return blocked
+        if self.in_flight >= max(ADMISSION_MIN_CONCURRENCY, int(self.limit)):
+            return None
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    async def acquire(self, tokens):
+        """
+        Waits until a call estimated at tokens tokens may be sent to the deployment.
+        A call arriving while others wait queues behind them, only the head of the queue checks for a free slot,
+        and it wakes the next one once it is admitted or gives up.
+        """
+        turn = None
+        try:
+            while True:
+                head = not self.waiters or self.waiters[0] is turn
+                wait = self.admission_wait(tokens) if head else None
+                if wait == 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    self.in_flight += 1
+                    self.admitted += 1
+                    return
+                remaining = remaining_time()
+                if remaining is not None and (remaining <= 0 or (wait is not None and wait > remaining)):
+                    self.rejected += 1
+                    raise DeadlineExceeded(f"{remaining:.2f}s left, not enough to be admitted to deployment {self.name}")
+                if turn is None:
+                    turn = asyncio.Event()
+                    self.waiters.append(turn)
+                turn.clear()
+                timeouts = [t for t in (wait, remaining) if t is not None]
+                timeout = min(timeouts) if timeouts else None
+                try:
+                    await asyncio.wait_for(turn.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if turn is not None:
+                head = self.waiters[0] is turn
+                self.waiters.remove(turn)
+                if head:
+                    self.wake_next()
+
+    def wake_next(self):
+        if self.waiters:
+            self.waiters[0].set()
+
+    def release(self, used_tokens=None, reserved_tokens=0):
+        """
+        Frees the slot of a finished call and charges the difference between the tokens it used and the ones reserved.
+        """
+        self.in_flight -= 1
+        if used_tokens is not None:
+            # Only the clamped reservation was taken at admission
+            self.tokens.take(used_tokens - min(reserved_tokens, self.tokens.capacity))
+        # One slot freed, one waiter woken: the others would only find it taken
+        self.wake_next()
+
+    def on_success(self, latency):
+        if latency > ADMISSION_LATENCY_TARGET_SECONDS:
+            self.decrease()
+        else:
+            self.limit = min(ADMISSION_MAX_CONCURRENCY, self.limit + 1 / self.limit)
+            # The limit may have grown by a slot
+            self.wake_next()
+
+    def on_throttle(self, retry_after=None):
+        self.throttles += 1
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        self.decrease()
+
+    def decrease(self):
+        now = time.monotonic()
+        if now - self.last_decrease < ADMISSION_DECREASE_COOLDOWN_SECONDS:
+            return
+        self.limit = max(ADMISSION_MIN_CONCURRENCY, self.limit * ADMISSION_DECREASE_FACTOR)
+        self.last_decrease = now
+
+    def stats(self):
+        return {
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttles": self.throttles,
+        }
@@ -0,0 +1,55 @@
+from collections import OrderedDict
+from agent_settings import AGENT_CACHE_SIZE
+from metrics import CACHE_LOOKUPS
+
+def agent_cache_key(kind, need_reasoning, valid_movement, maverick=False, plan_mode=False):
+    """
+    Builds the cache key of a prebuilt agent.
+    Duplicated movements are dropped but the order is kept, as the order decides how the Literal is generated.
+    """
+    return (kind, need_reasoning, tuple(dict.fromkeys(valid_movement)), bool(maverick), bool(plan_mode))
+
+class AgentCache():
+    """
+    Bounded LRU cache of prebuilt agents, so the Literal, output schema and model of an agent
+    are only built once per distinct set of valid movements.
+    """
+    def __init__(self, maxsize=AGENT_CACHE_SIZE, name="agent"):
+        self.maxsize = maxsize
+        self.name = name
+        self.agents = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, builder):
+        agent = self.agents.get(key)
+        if agent is not None:
+            self.agents.move_to_end(key)
+            self.hits += 1
+            CACHE_LOOKUPS.labels(self.name, "hit").inc()
+            return agent
+        self.misses += 1
+        CACHE_LOOKUPS.labels(self.name, "miss").inc()
+        agent = builder()
+        self.agents[key] = agent
+        if len(self.agents) > self.maxsize:
+            self.agents.popitem(last=False)
+            self.evictions += 1
+        return agent
+
+    def clear(self):
+        self.agents.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.agents),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+agent_cache = AgentCache()
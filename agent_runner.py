@@ -0,0 +1,58 @@
+from decision_cache import decision_cache, decision_cache_key
+from canonical import canonical_stats
+from resilience import executor
+from single_flight import single_flight
+from agent_settings import SINGLE_FLIGHT, DECISION_CACHE_ENABLED
+
+def is_deterministic(agent):
+    return agent.model_settings.temperature == 0
+
+async def run_agent(specialist, input):
+    """
+    Runs an initialised specialist agent (BombermanAgent, BattleAgent, PredictAgent) with retries and failover on transient errors.
+    Temperature 0 agents are answered from the decision cache (unless DECISION_CACHE=false) when the same prompt was seen before, or the same
+    canonical state when the specialist carries one (see canonical.CanonicalState). Concurrent temperature 0 calls with
+    the same key share one agent run (see single_flight.SingleFlight), sampled calls each get their own answer.
+
+    Returns:
+        Dict of the structured output of the agent, tagged with source "cache" when it did not take an agent run of its own
+    """
+    agent = specialist.agent
+    canonical = getattr(specialist, "canonical", None)
+    deterministic = is_deterministic(agent)
+    cacheable = deterministic and DECISION_CACHE_ENABLED
+    raw_key = decision_cache_key(specialist.kind, agent.model.model, agent.instructions, input, specialist.allowed_actions)
+    cache_key = raw_key
+    if canonical is not None:
+        cache_key = decision_cache_key(specialist.kind, agent.model.model, agent.instructions, canonical.key, canonical.allowed_actions)
+    if cacheable:
+        cached = decision_cache.get(cache_key)
+        if canonical is not None:
+            canonical_stats.record(raw_key, cached is not None, canonical.reflection)
+        if cached is not None:
+            return dict(canonical.reflect(cached) if canonical is not None else cached, source="cache")
+
+    ran = False
+    async def call():
+        nonlocal ran
+        ran = True
+        # Results are shared in the canonical frame, each caller maps them back to its own
+        run_agent_results = await executor.run(specialist, input)
+        run_agent_results = run_agent_results.final_output.model_dump()
+        if canonical is not None:
+            run_agent_results = canonical.reflect(run_agent_results)
+        if cacheable:
+            decision_cache.set(cache_key, run_agent_results)
+        return run_agent_results
+
+    if SINGLE_FLIGHT and deterministic:
+        shared = await single_flight.run(cache_key, call)
+    else:
+        shared = await call()
+    if cacheable and canonical is not None:
+        canonical_stats.remember(raw_key)
+    results = dict(canonical.reflect(shared) if canonical is not None else shared)
+    if not ran:
+        # Coalesced into the run of another caller
+        results["source"] = "cache"
+    return results
@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 from agents.model_settings import ModelSettings, Reasoning
 from pydantic import BaseModel
@@ -7,7 +8,13 @@ import asyncio
 import openai
 import azure.core.exceptions
 
-BATCH_SIZE = 20
+BATCH_SIZE = 20  # batch items decided concurrently by /batch
+MAX_BATCH_REQUESTS = 1000
+SESSION_MAX_GAMES = 10000
+SESSION_IDLE_SECONDS = 600  # games without a tick for this long are dropped
+SESSION_HISTORY_LENGTH = 5  # own actions kept per game, the "Last 5 Moves" of the prompts
+SESSION_POSITION_HISTORY = 10  # positions kept per opponent
+SESSION_MAX_IN_FLIGHT = 4  # ticks of one WebSocket game session in flight at once, ticks of the same game_id still run one at a time
 BASE_BACKOFF = 5  # seconds
 MAX_RETRIES=5
 RETRY_DELAY_SECONDS=5
@@ -24,6 +31,66 @@ RETRYABLE_EXCEPTIONS = (
     azure.core.exceptions.ServiceRequestError,
 )
 MAX_SLEEP = 60
+AGENT_CACHE_SIZE = 256
+DECISION_CACHE_SIZE = 4096
+DECISION_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DECISION_CACHE_TTL_SECONDS = 300
+DECISION_CACHE_ENABLED = os.environ.get("DECISION_CACHE", "true").lower() == "true"  # off for load tests of the LLM path
+CANONICAL_CACHE_KEYS = os.environ.get("CANONICAL_CACHE_KEYS", "true").lower() == "true"  # decision cache keyed by canonical features instead of the prompt
+CANONICAL_SYMMETRY = os.environ.get("CANONICAL_SYMMETRY", "true").lower() == "true"  # mirror-image states share a cache entry
+CANONICAL_ARENA_SIZE = 17  # width and height of the arena, to mirror positions
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "true").lower() == "true"  # concurrent identical agent calls share one run
+DEFAULT_DEADLINE_SECONDS = 5
+REASONING_DEADLINE_SECONDS = 30  # default budget of need_reasoning ticks, answered by the slower reasoning deployments
+MAX_DEADLINE_SECONDS = 60
+BREAKER_WINDOW = 20  # recent calls per deployment considered for the error rate
+BREAKER_MIN_REQUESTS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_THROTTLE_TRIP = 3  # consecutive 429s that open the breaker
+BREAKER_COOLDOWN_SECONDS = 30
+LATENCY_WINDOW = 200  # recent successful calls per deployment kept for latency percentiles
+HEDGING_ENABLED = os.environ.get("HEDGE_REQUESTS", "false").lower() == "true"
+HEDGE_PERCENTILE = 0.9  # hedge once the call is slower than this percentile of recent latency
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.2
+BATCHED_OPPONENT_PREDICTION = os.environ.get("BATCH_PREDICTIONS", "true").lower() == "true"
+ADMISSION_REQUESTS_PER_MINUTE = int(os.environ.get("DEPLOYMENT_RPM", 600))  # per deployment
+ADMISSION_TOKENS_PER_MINUTE = int(os.environ.get("DEPLOYMENT_TPM", 200000))  # per deployment
+ADMISSION_BURST_SECONDS = 10  # seconds of rate the buckets can hold
+ADMISSION_EXPECTED_OUTPUT_TOKENS = 200  # reserved per call on top of the estimated prompt tokens
+ADMISSION_INITIAL_CONCURRENCY = 8
+ADMISSION_MIN_CONCURRENCY = 1
+ADMISSION_MAX_CONCURRENCY = 64
+ADMISSION_LATENCY_TARGET_SECONDS = 5  # calls slower than this shrink the concurrency limit
+ADMISSION_DECREASE_FACTOR = 0.5
+ADMISSION_DECREASE_COOLDOWN_SECONDS = 2
+PREDICTOR_CONFIDENCE_THRESHOLD = 0.6  # local opponent predictions below this confidence go to the PredictAgent
+PREDICTOR_MAX_OPPONENTS = 1024
+PREDICTION_BUDGET_FRACTION = 0.5  # share of the remaining tick budget the opponent predictions may use
+PROMPT_TOKEN_BUDGETS = {"bot": 800, "battle": 1200, "agentic": 1200}  # user prompt tokens per endpoint
+PROMPT_MIN_OPPONENTS = 1  # opponents never dropped from a prompt to fit the budget
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1"))  # share of the records below WARNING that are written
+LOG_QUEUE_SIZE = 10000  # records waiting for the writer thread, more are dropped
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "azure").lower()  # "mock" serves the chat completions locally, see mock_llm.py
+MOCK_LATENCY_MS = float(os.environ.get("MOCK_LATENCY_MS", 300))  # median latency of a mock completion
+MOCK_LATENCY_SIGMA = float(os.environ.get("MOCK_LATENCY_SIGMA", 0.5))  # log-normal spread of the mock latency
+MOCK_CACHE_SPEEDUP = float(os.environ.get("MOCK_CACHE_SPEEDUP", 0.5))  # latency saved when the whole prompt is cached
+MOCK_THROTTLE_RATE = float(os.environ.get("MOCK_THROTTLE_RATE", 0))  # share of mock calls answered with a 429
+MOCK_SERVER_ERROR_RATE = float(os.environ.get("MOCK_SERVER_ERROR_RATE", 0))  # share of mock calls answered with a 5xx
+MOCK_TIMEOUT_RATE = float(os.environ.get("MOCK_TIMEOUT_RATE", 0))  # share of mock calls that time out
+MOCK_TIMEOUT_SECONDS = float(os.environ.get("MOCK_TIMEOUT_SECONDS", 30))
+MOCK_FAULT_DEPLOYMENTS = [d for d in os.environ.get("MOCK_FAULT_DEPLOYMENTS", "").split(",") if d]  # faults on all deployments when empty
+MOCK_SEED = os.environ.get("MOCK_SEED")
+SERVER_HOST = os.environ.get("HOST", "0.0.0.0")
+SERVER_PORT = int(os.environ.get("PORT", 6000))
+GRID_BOMB_POWER = 3  # blast reach of a bomb in cells, as in the bomberman_rl settings
+GRID_BOMB_TIMER = 4  # ticks from planting a bomb to its explosion
+GRID_EXPLOSION_TICKS = 2  # ticks a blast stays deadly
+FAST_PATH_ESCAPE_MARGIN = 1  # the safest escape of the danger map is played without the LLM when its margin is this low
+PLAN_MODE = os.environ.get("PLAN_MODE", "false").lower() == "true"  # game sessions get multi-tick plans from the agents
+PLAN_MAX_STEPS = 4  # planned actions after the current one
+SERVER_WORKERS = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1))  # worker processes in production mode
 
 class MyAgentSettings(ModelSettings):
     normal_setting = ModelSettings(temperature=0)
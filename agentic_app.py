@@ -1,42 +1,24 @@
-import os
-import json
+import logging
 import asyncio
-from typing import List, Dict, Any
 from specialised_agents.bomberman import BombermanAgent
-from specialised_agents.predict import PredictAgent
-from agents import Agent, OpenAIChatCompletionsModel, Runner, function_tool
-from llm import a_client, a_client_reasoning, a_client_eu2_prod
-from agent_settings import MyAgentSettings
-from tool_logger import ToolLogger
+from specialised_agents.predict import PredictAgent, BatchPredictAgent
+from agent_settings import PREDICTION_BUDGET_FRACTION, BATCHED_OPPONENT_PREDICTION, CANONICAL_CACHE_KEYS
+from fast_path import resolve_fast_path
+from deadline import remaining_time
+from opponent_model import local_predictions, opponent_model
+from prompt_builder import PromptBuilder, render, opponent_relevance, render_safe_actions
+from canonical import CanonicalState
+
+logger = logging.getLogger(__name__)
 
 async def agentic_bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius,
-                     plant_bomb_available, coins_collection_policy, movement_history, opponents, maverick_top_actions="", maverick_features="", maverick_best_action=""):
+                     plant_bomb_available, coins_collection_policy, movement_history, opponents, maverick_top_actions="", maverick_features="", maverick_best_action="", step=None, game_id=None):
     """
     Agentic bot that uses PredictAgent as tools to predict each opponent's move,
     then makes a final decision using the main orchestrator agent.
     """
 
-    # Parse opponent data
-    opponent_predictions = {}
-
-    # Step 1: For each opponent, create a PredictAgent and predict their next move
-    if opponents and len(opponents) > 0:
-        predict_tasks = []
-        for opp in opponents:
-            opp_name = opp.get("name", "Unknown")
-            predict_tasks.append(predict_opponent_move(need_reasoning, opp, game_state, valid_movement, check_bomb_radius, plant_bomb_available))
-
-        # Run all predictions in parallel
-        predictions = await asyncio.gather(*predict_tasks, return_exceptions=True)
-
-        for idx, opp in enumerate(opponents):
-            opp_name = opp.get("name", "Unknown")
-            if idx < len(predictions) and not isinstance(predictions[idx], Exception):
-                opponent_predictions[opp_name] = predictions[idx]
-            else:
-                opponent_predictions[opp_name] = {"action": "UNKNOWN", "reasoning": "Prediction failed"}
-
-    # Step 2: Build input for main orchestrator
+    # Step 1: Build input for main orchestrator
     crate_available = nearest_crate.get("crate_available")
     crate_action = nearest_crate.get("crate_action")
     crate_distance = nearest_crate.get("crate_distance")
@@ -51,90 +33,138 @@ async def agentic_bot(need_reasoning, game_state, valid_movement, nearest_crate,
     coin_action = coins_collection_policy.get("coin_action")
     coin_reason = coins_collection_policy.get("coin_reason")
 
-    current_input = f"Valid Movement : {valid_movement}\nCurrent Status: {current_status}\n"
+    prompt = PromptBuilder("agentic")
+    prompt.add("status", valid_movement=valid_movement, current_status=current_status)
 
     if crate_available == "yes":
-        current_input += f"Crate reason: {crate_reason}\nCrate action: {crate_action}\n"
+        prompt.add("crate", crate_reason=crate_reason, crate_action=crate_action)
 
     if in_danger == "yes":
         if escape_bomb_action not in valid_movement:
             valid_movement.append(escape_bomb_action)
-        current_input += f"Are you in a bomb radius : {in_bomb_radius}\nIn Danger of bomb : {in_danger}\nEscape from Bomb : {escape_bomb_action}\n"
+        prompt.add("danger", in_bomb_radius=in_bomb_radius, in_danger=in_danger, escape_bomb_action=escape_bomb_action)
+        if check_bomb_radius.get("safe_actions"):
+            prompt.add("safe_actions", safe_actions=render_safe_actions(check_bomb_radius["safe_actions"]))
 
     if plant_bomb == "true":
         if "BOMB" not in valid_movement:
             valid_movement.append("BOMB")
-        current_input += f"Plant Bomb Reason: {plant_bomb_reason}\n"
+        prompt.add("plant_bomb", plant_bomb_reason=plant_bomb_reason)
 
     if coin_available == "yes":
         if coin_action not in valid_movement:
             valid_movement.append(coin_action)
-        current_input += f"Collect Coins Action : {coin_action}\nReason for coins : {coin_reason}\n"
+        prompt.add("coins", coin_action=coin_action, coin_reason=coin_reason)
 
-    # Add opponent predictions to input
+    # Step 2: Resolve forced moves locally, skipping the opponent predictions and the main agent
+    fast_path = resolve_fast_path("agentic", valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy)
+    if fast_path:
+        fast_path['opponent_predictions'] = {}
+        return fast_path
+
+    # Step 3: Predict the next move of each opponent
+    opponent_predictions = {}
+    if opponents and len(opponents) > 0:
+        # Leave part of the tick budget for the main agent
+        remaining = remaining_time()
+        prediction_timeout = max(remaining, 0) * PREDICTION_BUDGET_FRACTION if remaining is not None else None
+        opponent_predictions = await predict_opponents(need_reasoning, opponents, game_state, valid_movement, check_bomb_radius, plant_bomb_available, timeout=prediction_timeout, step=step, game_id=game_id)
+
+    # Add opponent predictions to input, the least relevant opponents are dropped first when over budget
     if opponent_predictions:
-        current_input += "\n--- Opponent Predictions ---\n"
+        prompt.set_roster(opponents)
+        relevance = {opp.get("name", "Unknown"): opponent_relevance(opp) for opp in opponents}
+        prompt.set_opponents(render("predictions_header"))
         for opp_name, prediction in opponent_predictions.items():
             opp_action = prediction.get("action", "UNKNOWN")
             opp_reasoning = prediction.get("reasoning", "No reasoning available")
-            current_input += f"Opponent {opp_name}:\n  Predicted Action: {opp_action}\n  Reasoning: {opp_reasoning}\n\n"
-
-    movement_input = ""
-    if movement_history:
-        movement_input = "Last 5 Moves :\n"
-        for m in movement_history:
-            movement_input += f"Action : {m.get('action')}, Reason : {m.get('reasoning')}\n"
-        final_input = movement_input + "\n" + current_input
-    else:
-        final_input = current_input
+            prompt.add_opponent(render("prediction", name=opp_name, action=opp_action, reasoning=opp_reasoning), relevance.get(opp_name, 0))
+
+    prompt.set_history(movement_history)
     if maverick_best_action:
-        final_input += f"""Maverick Actions:{maverick_top_actions}\nMaverick Features:{maverick_features}\nMaverick Best Action: {maverick_best_action}"""
+        prompt.append("maverick", maverick_top_actions=maverick_top_actions, maverick_features=maverick_features, maverick_best_action=maverick_best_action)
         maverick = True
     else:
         maverick = False
-    # Step 3: Create main orchestrator agent with opponent predictions
+    final_input, _, tokens_saved = prompt.build()
+    # Step 4: Create main orchestrator agent with opponent predictions
     agent = BombermanAgent()
     await agent.initialise_agent(need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available, maverick=maverick)
+    if CANONICAL_CACHE_KEYS:
+        agent.canonical = CanonicalState("agentic", valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, opponents, opponent_predictions,
+                                         extras={"maverick_top_actions": maverick_top_actions, "maverick_features": maverick_features, "maverick_best_action": maverick_best_action})
     results = await agent.run_agent(final_input)
     results['valid_movement'] = valid_movement
     results['opponent_predictions'] = opponent_predictions
+    results['prompt_tokens_saved'] = tokens_saved
 
     return results
 
 
-async def predict_opponent_move(need_reasoning, opponent_data, game_state, valid_movement, check_bomb_radius, plant_bomb_available):
+async def predict_opponents(need_reasoning, opponents, game_state, valid_movement, check_bomb_radius, plant_bomb_available, timeout=None, step=None, game_id=None):
     """
-    Use PredictAgent to predict a single opponent's next move.
+    Predicts the next move of every opponent. Opponents the local model is confident about are answered locally,
+    the rest either in one batched call (BATCHED_OPPONENT_PREDICTION) or with one PredictAgent call per opponent, all in parallel.
 
     Args:
-        need_reasoning: Whether to use reasoning model
-        opponent_data: Dict containing opponent analysis
-        game_state: Current game state
-        valid_movement: Valid movements for our agent
-        check_bomb_radius: Bomb danger data
-        plant_bomb_available: Bomb planting data
+        timeout: Seconds to wait for the predictions, opponents not predicted by then are marked as failed
+        step: Tick of the game, so the local model learns each tick once
+        game_id: Game of the tick, so the local model keeps the opponents of each game apart
 
     Returns:
-        Dict with predicted action and reasoning
+        Dict of opponent name to predicted action and reasoning
     """
+    opponent_predictions, opponents = local_predictions(opponents, step, game_id)
+    if not opponents:
+        return opponent_predictions
+
+    async def predict_single(opp):
+        return [await predict_opponent_move(need_reasoning, opp, game_state, valid_movement, check_bomb_radius, plant_bomb_available)]
+
+    if BATCHED_OPPONENT_PREDICTION and len(opponents) > 1:
+        groups = [(asyncio.ensure_future(predict_opponent_moves(need_reasoning, opponents, game_state, check_bomb_radius, plant_bomb_available)), opponents)]
+    else:
+        groups = [(asyncio.ensure_future(predict_single(opp)), [opp]) for opp in opponents]
+
     try:
-        opp_name = opponent_data.get("name", "Unknown")
-        opp_position = opponent_data.get("position", [0, 0])
-        opp_distance = opponent_data.get("distance_to_us", 0)
-        opp_in_danger = opponent_data.get("in_danger", False)
-        opp_escape_routes = opponent_data.get("escape_routes", [])
-        opp_bombs_available = opponent_data.get("bombs_available", 0)
-        opp_score = opponent_data.get("score", 0)
-        opp_score_diff = opponent_data.get("score_diff", 0)
-        opp_valid_moves = opponent_data.get("valid_moves", [])
-        opp_last_actions = opponent_data.get("last_3_actions", [])
-        opp_nearest_coin_dir = opponent_data.get("nearest_coin_direction", None)
-        opp_nearest_crate_dir = opponent_data.get("nearest_crate_direction", None)
-        opp_can_bomb_us = opponent_data.get("can_bomb_us", False)
+        done, pending = await asyncio.wait([task for task, _ in groups], timeout=timeout)
+    finally:
+        for task, _ in groups:
+            task.cancel()
+
+    for task, group in groups:
+        predictions = task.result() if task in done and task.exception() is None else []
+        for idx, opp in enumerate(group):
+            opp_name = opp.get("name", "Unknown")
+            if idx < len(predictions):
+                opponent_predictions[opp_name] = predictions[idx]
+                if predictions[idx].get("action") != "UNKNOWN":
+                    opponent_model.record_prediction(opp_name, predictions[idx].get("action"), "llm", game_id)
+            else:
+                opponent_predictions[opp_name] = {"action": "UNKNOWN", "reasoning": "Prediction failed"}
+    return opponent_predictions
 
-        # Build input for predict agent
-        predict_input = f"""
-Opponent: {opp_name}
+
+def build_predict_input(opponent_data, header="Opponent"):
+    """
+    Describes the state of one opponent for the predict agents.
+    """
+    opp_name = opponent_data.get("name", "Unknown")
+    opp_position = opponent_data.get("position", [0, 0])
+    opp_distance = opponent_data.get("distance_to_us", 0)
+    opp_in_danger = opponent_data.get("in_danger", False)
+    opp_escape_routes = opponent_data.get("escape_routes", [])
+    opp_bombs_available = opponent_data.get("bombs_available", 0)
+    opp_score = opponent_data.get("score", 0)
+    opp_score_diff = opponent_data.get("score_diff", 0)
+    opp_valid_moves = opponent_data.get("valid_moves", [])
+    opp_last_actions = opponent_data.get("last_3_actions", [])
+    opp_nearest_coin_dir = opponent_data.get("nearest_coin_direction", None)
+    opp_nearest_crate_dir = opponent_data.get("nearest_crate_direction", None)
+    opp_can_bomb_us = opponent_data.get("can_bomb_us", False)
+
+    return f"""
+{header}: {opp_name}
 Position: {opp_position}
 Distance to us: {opp_distance}
 
@@ -152,15 +182,51 @@ Intent indicators:
 - Nearest coin direction: {opp_nearest_coin_dir}
 - Nearest crate direction: {opp_nearest_crate_dir}
 - Can bomb us: {opp_can_bomb_us}
-
-Based on this information, predict what action this opponent will take next.
-Consider:
-1. If they're in danger, they'll likely try to escape
-2. If they can collect coins easily, they might go for it
-3. If they're aggressive and can bomb us, they might attack
-4. Their recent movement patterns indicate their strategy
 """
 
+
+async def predict_opponent_moves(need_reasoning, opponents, game_state, check_bomb_radius, plant_bomb_available):
+    """
+    Use BatchPredictAgent to predict the next move of all opponents in a single call.
+
+    Returns:
+        List of dicts with predicted action and reasoning, in the order of the opponents
+    """
+    try:
+        predict_input = ""
+        for idx, opp in enumerate(opponents, start=1):
+            predict_input += build_predict_input(opp, header=f"Opponent {idx}")
+
+        predict_agent = BatchPredictAgent()
+        await predict_agent.initialise_agent(need_reasoning, game_state, [opp.get("valid_moves", []) for opp in opponents])
+        return await predict_agent.run_agent(predict_input)
+
+    except Exception as e:
+        logger.error(f"Error predicting opponents in batch: {str(e)}", exc_info=True)
+        return [{"action": "UNKNOWN", "reasoning": f"Prediction failed: {str(e)}"} for _ in opponents]
+
+
+async def predict_opponent_move(need_reasoning, opponent_data, game_state, valid_movement, check_bomb_radius, plant_bomb_available):
+    """
+    Use PredictAgent to predict a single opponent's next move.
+
+    Args:
+        need_reasoning: Whether to use reasoning model
+        opponent_data: Dict containing opponent analysis
+        game_state: Current game state
+        valid_movement: Valid movements for our agent
+        check_bomb_radius: Bomb danger data
+        plant_bomb_available: Bomb planting data
+
+    Returns:
+        Dict with predicted action and reasoning
+    """
+    try:
+        opp_valid_moves = opponent_data.get("valid_moves", [])
+
+        # Build input for predict agent
+        predict_input = build_predict_input(opponent_data)
+
         # Create and run predict agent
         predict_agent = PredictAgent()
         await predict_agent.initialise_agent(need_reasoning, game_state, opp_valid_moves, check_bomb_radius, plant_bomb_available)
@@ -169,5 +235,5 @@ Consider:
         return prediction
 
     except Exception as e:
-        print(f"Error predicting opponent {opponent_data.get('name', 'Unknown')}: {str(e)}")
+        logger.error(f"Error predicting opponent {opponent_data.get('name', 'Unknown')}: {str(e)}", exc_info=True)
         return {"action": "UNKNOWN", "reasoning": f"Prediction failed: {str(e)}"}
@@ -1,6 +1,10 @@
 from specialised_agents.bomberman import BombermanAgent
+from fast_path import resolve_fast_path
+from prompt_builder import PromptBuilder, render_safe_actions
+from canonical import CanonicalState
+from agent_settings import CANONICAL_CACHE_KEYS
 
-async def bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, rl_model_suggestion="", maverick_top_actions="", maverick_features="", maverick_best_action=""):
+async def bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, rl_model_suggestion="", maverick_top_actions="", maverick_features="", maverick_best_action="", plan_mode=False):
     # {"coin_available":"no", "coin_action":"WAIT", "coin_reason":"No coins available to collect."}
     # {'crate_available': 'yes', 'crate_action': 'LEFT', 'crate_pos': (np.int64(13), np.int64(1)), 'crate_distance': 1.0, 'crate_reason': 'Nearest crate identified and reachable.'}
     crate_available = nearest_crate.get("crate_available")
@@ -16,37 +20,40 @@ async def bot(need_reasoning, game_state, valid_movement, nearest_crate, check_b
     coin_available = coins_collection_policy.get("coin_available")
     coin_action = coins_collection_policy.get("coin_action")
     coin_reason = coins_collection_policy.get("coin_reason")
-    current_input = f"Valid Movement : {valid_movement}\n Current Status: {current_status}\n"
+    prompt = PromptBuilder("bot")
+    prompt.add("status", valid_movement=valid_movement, current_status=current_status)
     if crate_available=="yes":
-        current_input += f"Crate reason: {crate_reason}\nCrate action: {crate_action}\n"
+        prompt.add("crate", crate_reason=crate_reason, crate_action=crate_action)
     if in_danger=="yes":
         if escape_bomb_action not in valid_movement:
             valid_movement.append(escape_bomb_action)
-        current_input += f"Are you in a bomb radius : {in_bomb_radius}\nIn Danger of bomb : {in_danger}\nEscape from Bomb : {escape_bomb_action}\n"
+        prompt.add("danger", in_bomb_radius=in_bomb_radius, in_danger=in_danger, escape_bomb_action=escape_bomb_action)
+        if check_bomb_radius.get("safe_actions"):
+            prompt.add("safe_actions", safe_actions=render_safe_actions(check_bomb_radius["safe_actions"]))
     if plant_bomb=="true":
         valid_movement.append("BOMB")
-        current_input += f"Plant Bomb Reason: {plant_bomb_reason}\n"
+        prompt.add("plant_bomb", plant_bomb_reason=plant_bomb_reason)
     if coin_available == "yes":
         if coin_action not in valid_movement:
             valid_movement.append(coin_action)
-        current_input += f"Collect Coins Action : {coin_action}\nReason for coins : {coin_reason}\n"
-    movement_input = ""
-    if movement_history:
-        movement_input = "Last 5 Moves :\n"
-        for m in movement_history:
-            movement_input += f"Action : {m.get('action')}, Reason : {m.get('reasoning')}"
-        final_input = movement_input +"\n"+current_input
-    else:
-        final_input = current_input
+        prompt.add("coins", coin_action=coin_action, coin_reason=coin_reason)
+    fast_path = resolve_fast_path("bot", valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy)
+    if fast_path:
+        return fast_path
+    prompt.set_history(movement_history)
     if rl_model_suggestion:
-        final_input += f"Q Learning Model actions : {rl_model_suggestion}"
+        prompt.append("rl_suggestion", rl_model_suggestion=rl_model_suggestion)
     if maverick_best_action:
-        # final_input += f"""Maverick Actions:{maverick_top_actions}\nMaverick Features:{maverick_features}\nMaverick Best Action: {maverick_best_action}"""
+        # prompt.append("maverick", maverick_top_actions=maverick_top_actions, maverick_features=maverick_features, maverick_best_action=maverick_best_action)
         maverick = True
     else:
         maverick = False
+    final_input, _, tokens_saved = prompt.build()
     agent = BombermanAgent()
-    await agent.initialise_agent(need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available, maverick=maverick)
+    await agent.initialise_agent(need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available, maverick=maverick, plan_mode=plan_mode)
+    if CANONICAL_CACHE_KEYS:
+        agent.canonical = CanonicalState("bot", valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, extras={"rl_model_suggestion": rl_model_suggestion})
     results = await agent.run_agent(final_input)
     results['valid_movement'] = valid_movement
+    results['prompt_tokens_saved'] = tokens_saved
     return results
\ No newline at end of file
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark of the per-request decode cost of the tick payloads
+Usage: python bench_decode.py [iterations]
+"""
+
+import sys
+import json
+import time
+from schemas import decode_tick, encoder
+
+STRING_FIELDS = ["valid_movement", "nearest_crate", "check_bomb_radius", "plant_bomb_available", "coins_collection_policy", "movement_history", "opponents"]
+
+def legacy_decode(raw):
+    """Decoding as the handlers did before the shared typed decoder: json.loads, then each string encoded field."""
+    data = json.loads(raw)
+    for field in STRING_FIELDS:
+        if isinstance(data.get(field), str):
+            data[field] = json.loads(data[field])
+    return data
+
+def bench(name, func, raw, iterations):
+    func(raw)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(raw)
+    elapsed = time.perf_counter() - started
+    print(f"  {name:<28} {elapsed / iterations * 1e6:8.2f} us/request")
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    with open('test_payload.json', 'r') as f:
+        payload = json.load(f)
+    nested = json.dumps(payload).encode()
+    string_encoded = json.dumps({k: json.dumps(v) if k in STRING_FIELDS else v for k, v in payload.items()}).encode()
+    response = {"reasoning": "Collecting the coin above.", "action": "UP", "valid_movement": payload["valid_movement"]}
+
+    print(f"Decode ({iterations} iterations)")
+    for label, raw in [("nested", nested), ("string encoded", string_encoded)]:
+        print(f" {label} payload, {len(raw)} bytes")
+        bench("json + manual (legacy)", legacy_decode, raw, iterations)
+        bench("msgspec typed", decode_tick, raw, iterations)
+
+    print("Encode response")
+    bench("json.dumps", lambda r: json.dumps(r).encode(), response, iterations)
+    bench("msgspec", encoder.encode, response, iterations)
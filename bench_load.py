@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Load test of the agent endpoints with generated payload variants
+Usage: python bench_load.py [--url http://0.0.0.0:6000] [--endpoints / /battle-agent /agentic-predict]
+                            [--requests 200] [--concurrency 16] [--rate 0] [--output bench_results.json] [--baseline previous.json]
+
+Each endpoint is driven in turn. With --rate 0 the load is closed loop (--concurrency requests always in flight),
+otherwise requests arrive as a Poisson process at --rate per second, at most --concurrency in flight.
+Tokens per decision come from the /metrics counters before and after each endpoint run.
+Payloads are generated afresh for every endpoint and run (from --seed when given, else a random seed saved with the
+results), so a run does not start on a decision cache warmed by the previous one. cache_rate reports the answers the
+service still took from its decision cache within the run, start it with DECISION_CACHE=false to bench the LLM path alone.
+With --baseline, the seed of the baseline is reused unless --seed is given, so both runs send the same payloads:
+restart the service (or run it with DECISION_CACHE=false) between the two runs so the second one starts on a cold cache.
+"""
+
+import sys
+import copy
+import json
+import time
+import random
+import asyncio
+import argparse
+import httpx
+
+MOVES = ["UP", "RIGHT", "DOWN", "LEFT"]
+TOKEN_METRICS = ["bomberman_input_tokens_total", "bomberman_output_tokens_total", "bomberman_cached_input_tokens_total"]
+
+def generate_payload(base, rng):
+    """
+    Variant of the base payload: random valid movements, danger state, coin and crate policies, history length and opponents.
+    """
+    payload = copy.deepcopy(base)
+    valid_movement = rng.sample(MOVES, rng.randint(1, len(MOVES)))
+    payload["valid_movement"] = valid_movement
+
+    in_danger = rng.random() < 0.3
+    payload["check_bomb_radius"] = {
+        "in_bomb_radius": "yes" if in_danger else "no",
+        "in_danger": "yes" if in_danger else "no",
+        "escape_bomb_action": rng.choice(valid_movement) if in_danger else "WAIT",
+    }
+    plant = rng.random() < 0.3
+    payload["plant_bomb_available"] = {
+        "plant": "true" if plant else "false",
+        "reason": "adjacent to crate" if plant else "not adjacent to crate",
+        "current_status": "No bomb detected.",
+    }
+    coin_available = rng.random() < 0.5
+    payload["coins_collection_policy"] = {
+        "coin_available": "yes" if coin_available else "no",
+        "coin_action": rng.choice(MOVES) if coin_available else "WAIT",
+        "coin_reason": "Coins are reachable." if coin_available else "No coins available to collect.",
+    }
+    crate_available = rng.random() < 0.6
+    payload["nearest_crate"] = {
+        "crate_available": "yes" if crate_available else "no",
+        "crate_action": rng.choice(MOVES) if crate_available else "WAIT",
+        "crate_distance": float(rng.randint(1, 10)),
+        "crate_reason": "Nearest crate identified and reachable." if crate_available else "No crate reachable.",
+    }
+    payload["movement_history"] = [
+        {"action": rng.choice(MOVES + ["WAIT", "BOMB"]), "reasoning": rng.choice(base["movement_history"])["reasoning"]}
+        for _ in range(rng.randint(0, 5))
+    ]
+
+    opponents = []
+    for idx in range(rng.randint(0, 3)):
+        opp = copy.deepcopy(rng.choice(base["opponents"]))
+        x, y = rng.randint(1, 15), rng.randint(1, 15)
+        opp["name"] = f"{opp['name']}_{idx}"
+        opp["position"] = [x, y]
+        opp["distance_to_us"] = float(rng.randint(1, 15))
+        opp["in_danger"] = rng.random() < 0.3
+        opp["escape_routes"] = rng.sample(MOVES, rng.randint(1, 2)) if opp["in_danger"] else []
+        opp["can_bomb_us"] = rng.random() < 0.2
+        opp["valid_moves"] = rng.sample(MOVES, rng.randint(1, len(MOVES)))
+        opp["last_3_actions"] = [[x, y + 1], [x, y], [x, y]]
+        opponents.append(opp)
+    payload["opponents"] = opponents
+    return payload
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+async def scrape_tokens(client, url):
+    """
+    Returns the token counters of /metrics summed over deployments, or None if the metrics are not available.
+    """
+    try:
+        response = await client.get(f"{url}/metrics")
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    totals = dict.fromkeys(TOKEN_METRICS, 0.0)
+    for line in response.text.splitlines():
+        name = line.split("{", 1)[0].split(" ", 1)[0]
+        if name in totals:
+            totals[name] += float(line.rsplit(" ", 1)[1])
+    return totals
+
+async def run_endpoint(client, url, endpoint, payloads, concurrency, rate, deadline_ms):
+    in_flight = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def send(payload):
+        try:
+            started = time.perf_counter()
+            headers = {"X-Deadline-Ms": str(deadline_ms)} if deadline_ms else {}
+            try:
+                response = await client.post(f"{url}{endpoint}", json=payload, headers=headers)
+                latency = time.perf_counter() - started
+                body = response.json() if response.status_code == 200 else {}
+                source = body.get("source", "llm") if response.status_code == 200 else "error"
+                samples.append({"latency": latency, "status": response.status_code, "source": source})
+            except httpx.HTTPError as e:
+                samples.append({"latency": time.perf_counter() - started, "status": None, "source": "error", "error": str(e)})
+        finally:
+            in_flight.release()
+
+    tokens_before = await scrape_tokens(client, url)
+    started = time.perf_counter()
+    tasks = []
+    for payload in payloads:
+        if rate > 0:
+            await asyncio.sleep(random.expovariate(rate))
+        await in_flight.acquire()
+        tasks.append(asyncio.create_task(send(payload)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    tokens_after = await scrape_tokens(client, url)
+
+    latencies = [s["latency"] for s in samples]
+    count = len(samples)
+    result = {
+        "requests": count,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(count / elapsed, 2) if elapsed else None,
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": max(latencies) if latencies else None,
+        "error_rate": round(sum(s["source"] == "error" for s in samples) / count, 4),
+        "fallback_rate": round(sum(s["source"] == "fallback" for s in samples) / count, 4),
+        "fast_path_rate": round(sum(s["source"] == "fast_path" for s in samples) / count, 4),
+        "cache_rate": round(sum(s["source"] == "cache" for s in samples) / count, 4),
+    }
+    if tokens_before is not None and tokens_after is not None:
+        for name in TOKEN_METRICS:
+            key = name.replace("bomberman_", "").replace("_total", "") + "_per_decision"
+            result[key] = round((tokens_after[name] - tokens_before[name]) / count, 1)
+    return result
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the metrics that got worse than the baseline results by more than the tolerance.
+    """
+    regressions = []
+    for endpoint, metrics in results["endpoints"].items():
+        previous = baseline.get("endpoints", {}).get(endpoint)
+        if not previous:
+            continue
+        for key in ["latency_p50", "latency_p95", "latency_p99", "error_rate", "fallback_rate", "input_tokens_per_decision"]:
+            old, new = previous.get(key), metrics.get(key)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > 1e-3:
+                regressions.append(f"{endpoint} {key}: {old} -> {new}")
+        if metrics.get("throughput_rps") and previous.get("throughput_rps") and metrics["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint} throughput_rps: {previous['throughput_rps']} -> {metrics['throughput_rps']}")
+    return regressions
+
+async def main(args):
+    with open(args.payload, 'r') as f:
+        base = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    if args.seed is None and baseline is not None:
+        args.seed = baseline.get("config", {}).get("seed")
+        if args.seed is not None:
+            print(f"Reusing seed {args.seed} of the baseline")
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+
+    results = {"config": vars(args), "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "endpoints": {}}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for endpoint in args.endpoints:
+            rng = random.Random(f"{args.seed}:{endpoint}")
+            payloads = [generate_payload(base, rng) for _ in range(args.requests)]
+            print(f"Running {len(payloads)} requests against {endpoint} (seed {args.seed}) ...")
+            results["endpoints"][endpoint] = await run_endpoint(client, args.url, endpoint, payloads, args.concurrency, args.rate, args.deadline_ms)
+            print(json.dumps(results["endpoints"][endpoint], indent=2))
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the agent endpoints")
+    parser.add_argument("--url", default="http://0.0.0.0:6000")
+    parser.add_argument("--endpoints", nargs="+", default=["/", "/battle-agent", "/agentic-predict"])
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16, help="maximum requests in flight")
+    parser.add_argument("--rate", type=float, default=0, help="arrival rate in requests per second, 0 for closed loop")
+    parser.add_argument("--deadline-ms", type=int, default=None, help="X-Deadline-Ms sent with each request")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=None, help="seed of the payload variants, by default the one of the baseline, else random")
+    parser.add_argument("--payload", default="test_payload.json", help="base payload the variants are generated from")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="previous results, exit with 1 if any metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed relative regression against the baseline")
+    sys.exit(asyncio.run(main(parser.parse_args())))
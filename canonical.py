@@ -0,0 +1,190 @@
+import re
+import json
+import time
+from collections import Counter, OrderedDict
+from metrics import CACHE_LOOKUPS
+from agent_settings import CANONICAL_SYMMETRY, CANONICAL_ARENA_SIZE, DECISION_CACHE_SIZE, DECISION_CACHE_TTL_SECONDS
+
+# Reflections of the arena as (mirror x, mirror y), with the direction mapping of each. Every reflection is its own inverse.
+REFLECTIONS = {
+    "identity": (False, False),
+    "mirror_x": (True, False),
+    "mirror_y": (False, True),
+    "mirror_xy": (True, True),
+}
+# Action tokens as the agents write them, lowercase direction words of the prose are left alone (e.g. "upper right corner")
+ACTION_TOKENS = re.compile(r"\b(UP|DOWN|LEFT|RIGHT)\b")
+# Field of plant_bomb_available each endpoint renders as the current status of its prompt, current_status when not listed
+STATUS_FIELDS = {"bot": "plant_bomb_reason", "battle": "plant_bomb_reason"}
+
+def quantize(value):
+    """
+    Numbers (and numeric strings) rounded to integers, so 3, 3.0 and "3.0" give the same key.
+    """
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return value
+    if isinstance(value, (int, float)):
+        return int(round(value))
+    return value
+
+def flag(value):
+    """
+    Yes/no flags sent as "yes", "true", True and the like, reduced to a bool.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ("yes", "true")
+    return bool(value)
+
+def reflect_direction(action, reflection):
+    mirror_x, mirror_y = REFLECTIONS[reflection]
+    if mirror_x and action in ("LEFT", "RIGHT"):
+        return "RIGHT" if action == "LEFT" else "LEFT"
+    if mirror_y and action in ("UP", "DOWN"):
+        return "DOWN" if action == "UP" else "UP"
+    return action
+
+def reflect_position(position, reflection):
+    mirror_x, mirror_y = REFLECTIONS[reflection]
+    if not isinstance(position, (list, tuple)) or len(position) != 2:
+        return position
+    x, y = quantize(position[0]), quantize(position[1])
+    if mirror_x and isinstance(x, int):
+        x = CANONICAL_ARENA_SIZE - 1 - x
+    if mirror_y and isinstance(y, int):
+        y = CANONICAL_ARENA_SIZE - 1 - y
+    return [x, y]
+
+def reflect_text(text, reflection):
+    """
+    Action tokens of a free text answer mapped through the reflection.
+    """
+    replace = lambda match: reflect_direction(match.group(0), reflection)
+    return ACTION_TOKENS.sub(replace, text) if isinstance(text, str) and reflection != "identity" else text
+
+def canonical_opponent(opp, prediction, reflection):
+    """
+    Decision relevant fields of an opponent, without its name and free text.
+    """
+    directions = lambda values: sorted(reflect_direction(v, reflection) for v in values or [])
+    return {
+        "position": reflect_position(opp.get("position"), reflection),
+        "distance": quantize(opp.get("distance_to_us")),
+        "in_danger": flag(opp.get("in_danger")),
+        "escape_routes": directions(opp.get("escape_routes")),
+        "bombs": quantize(opp.get("bombs_available")),
+        "score_diff": quantize(opp.get("score_diff")),
+        "valid_moves": directions(opp.get("valid_moves")),
+        "last_positions": [reflect_position(p, reflection) for p in opp.get("last_3_actions") or []],
+        "coin_direction": reflect_direction(opp.get("nearest_coin_direction"), reflection),
+        "crate_direction": reflect_direction(opp.get("nearest_crate_direction"), reflection),
+        "can_bomb_us": flag(opp.get("can_bomb_us")),
+        "predicted_action": reflect_direction(prediction, reflection),
+    }
+
+def canonical_features(reflection, status_field, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, opponents, predictions):
+    move = lambda action: reflect_direction(action, reflection)
+    return {
+        "valid_movement": sorted(set(move(m) for m in valid_movement)),
+        "crate": [flag(nearest_crate.get("crate_available")), move(nearest_crate.get("crate_action")), quantize(nearest_crate.get("crate_distance"))],
+        "danger": [
+            flag(check_bomb_radius.get("in_bomb_radius")),
+            flag(check_bomb_radius.get("in_danger")),
+            move(check_bomb_radius.get("escape_bomb_action")),
+            quantize(check_bomb_radius.get("ticks_to_explosion")),
+            sorted([move(s.get("action")), quantize(s.get("margin"))] for s in check_bomb_radius.get("safe_actions") or []),
+        ],
+        # The status is one of a few fixed sentences (e.g. "Standing on a bomb."), it tells apart states planting depends on
+        "plant": [flag(plant_bomb_available.get("plant")), plant_bomb_available.get(status_field)],
+        "coin": [flag(coins_collection_policy.get("coin_available")), move(coins_collection_policy.get("coin_action"))],
+        "history": [move(m.get("action")) if isinstance(m, dict) else move(m) for m in movement_history or []],
+        "opponents": sorted(
+            (canonical_opponent(opp, (predictions or {}).get(opp.get("name", "Unknown"), {}).get("action"), reflection) for opp in opponents or []),
+            key=lambda opp: json.dumps(opp, sort_keys=True),
+        ),
+    }
+
+class CanonicalState():
+    """
+    Canonical form of the features of a tick, the cache key of the decision. Free text is dropped, numbers are
+    quantized, opponents sorted, and the board is reflected to whichever of its mirror images serialises first,
+    so that mirror-image states share one entry. Cached decisions are stored in the canonical frame and mapped back
+    with the same reflection.
+    """
+    def __init__(self, endpoint, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy,
+                 movement_history, opponents=(), predictions=None, extras=None):
+        # Extra inputs (RL or Maverick suggestions) are free text we cannot reflect, they pin the identity
+        extras = {name: value for name, value in (extras or {}).items() if value}
+        reflections = list(REFLECTIONS) if CANONICAL_SYMMETRY and not extras else ["identity"]
+        status_field = STATUS_FIELDS.get(endpoint, "current_status")
+        candidates = []
+        for reflection in reflections:
+            features = canonical_features(reflection, status_field, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, opponents, predictions)
+            candidates.append((json.dumps([endpoint, features, extras], sort_keys=True, default=str), reflection))
+        self.key, self.reflection = min(candidates)
+        self.allowed_actions = tuple(sorted(set(reflect_direction(m, self.reflection) for m in valid_movement)))
+
+    def reflect(self, decision):
+        """
+        Maps a decision between the frame of the request and the canonical frame, both ways as reflections are involutions.
+        """
+        if self.reflection == "identity" or not isinstance(decision, dict):
+            return decision
+        decision = dict(decision)
+        if "action" in decision:
+            decision["action"] = reflect_direction(decision["action"], self.reflection)
+        if isinstance(decision.get("plan"), list):
+            decision["plan"] = [reflect_direction(action, self.reflection) for action in decision["plan"]]
+        if "reasoning" in decision:
+            decision["reasoning"] = reflect_text(decision["reasoning"], self.reflection)
+        return decision
+
+class CanonicalStats():
+    """
+    Hit rate of the decision cache with canonical keys, against the hit rate the raw prompt keys would have had.
+    The raw keys are only remembered, in a bounded LRU with the size and TTL of the decision cache, to answer what would have hit.
+    """
+    def __init__(self, maxsize=DECISION_CACHE_SIZE, ttl_seconds=DECISION_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.raw_keys = OrderedDict()
+        self.lookups = Counter()
+
+    def record(self, raw_key, hit, reflection):
+        expires_at = self.raw_keys.get(raw_key)
+        raw_hit = expires_at is not None and expires_at > time.monotonic()
+        if raw_hit:
+            self.raw_keys.move_to_end(raw_key)
+        elif expires_at is not None:
+            del self.raw_keys[raw_key]
+        self.lookups["total"] += 1
+        self.lookups["raw_hits"] += raw_hit
+        self.lookups["canonical_hits"] += hit
+        self.lookups["reflected"] += reflection != "identity"
+        CACHE_LOOKUPS.labels("decision_raw", "hit" if raw_hit else "miss").inc()
+
+    def remember(self, raw_key):
+        """
+        Records that a decision landed for the raw key, as the prompt keyed cache would have stored it.
+        """
+        self.raw_keys[raw_key] = time.monotonic() + self.ttl_seconds
+        self.raw_keys.move_to_end(raw_key)
+        if len(self.raw_keys) > self.maxsize:
+            self.raw_keys.popitem(last=False)
+
+    def stats(self):
+        total = self.lookups["total"]
+        return {
+            "lookups": total,
+            "raw_hits": self.lookups["raw_hits"],
+            "canonical_hits": self.lookups["canonical_hits"],
+            "reflected_keys": self.lookups["reflected"],
+            "raw_hit_rate": round(self.lookups["raw_hits"] / total, 4) if total else 0.0,
+            "canonical_hit_rate": round(self.lookups["canonical_hits"] / total, 4) if total else 0.0,
+        }
+
+canonical_stats = CanonicalStats()
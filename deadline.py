@@ -0,0 +1,67 @@
+import logging
+import time
+import asyncio
+import contextvars
+from collections import Counter
+from metrics import FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+# Absolute time.monotonic() deadline of the tick being processed, visible to every task spawned for it.
+tick_deadline = contextvars.ContextVar("tick_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the remaining budget of a tick cannot cover the next step, e.g. another retry.
+    """
+
+def remaining_time():
+    """
+    Returns the seconds left in the budget of the current tick, or None if no deadline is set.
+    """
+    deadline = tick_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+class DeadlineStats():
+    def __init__(self):
+        self.requests = Counter()
+        self.fallbacks = Counter()
+
+    def stats(self):
+        return {
+            endpoint: {
+                "requests": requests,
+                "fallbacks": self.fallbacks[endpoint],
+                "fallback_rate": round(self.fallbacks[endpoint] / requests, 4),
+            }
+            for endpoint, requests in self.requests.items()
+        }
+
+deadline_stats = DeadlineStats()
+
+async def run_with_deadline(endpoint, coro, budget_seconds, fallback):
+    """
+    Runs the whole decision pipeline of a tick under a time budget.
+
+    Args:
+        endpoint: Name of the endpoint, for the fallback statistics
+        coro: Coroutine producing the response
+        budget_seconds: Time budget of the tick
+        fallback: Callable returning the locally computed response used when the budget runs out
+
+    Returns:
+        The response of the coroutine, or of the fallback if it did not finish in time
+    """
+    deadline_stats.requests[endpoint] += 1
+    token = tick_deadline.set(time.monotonic() + budget_seconds)
+    try:
+        return await asyncio.wait_for(coro, timeout=budget_seconds)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        deadline_stats.fallbacks[endpoint] += 1
+        FALLBACKS.labels(endpoint).inc()
+        logger.warning(f"Deadline of {budget_seconds:.2f}s exceeded on {endpoint}, returning fallback action.", extra={"endpoint": endpoint})
+        return fallback()
+    finally:
+        tick_deadline.reset(token)
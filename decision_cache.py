@@ -0,0 +1,88 @@
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from metrics import CACHE_LOOKUPS
+from agent_settings import DECISION_CACHE_SIZE, DECISION_CACHE_MAX_BYTES, DECISION_CACHE_TTL_SECONDS
+
+# Rough per entry bookkeeping overhead (tuple, OrderedDict node, dict shell) on top of the payload.
+ENTRY_OVERHEAD_BYTES = 256
+
+def decision_cache_key(kind, deployment, instructions, prompt, allowed_actions):
+    """
+    Hashes everything that decides the output of a temperature 0 call into a fixed size key.
+    """
+    payload = json.dumps([kind, deployment, instructions, prompt, list(allowed_actions)], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DecisionCache():
+    """
+    LRU cache of agent decisions with a TTL and a memory bound.
+    Entries are evicted oldest first once either the entry count or the byte budget is exceeded.
+    """
+    def __init__(self, maxsize=DECISION_CACHE_SIZE, max_bytes=DECISION_CACHE_MAX_BYTES, ttl_seconds=DECISION_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            CACHE_LOOKUPS.labels("decision", "miss").inc()
+            return None
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            CACHE_LOOKUPS.labels("decision", "miss").inc()
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        CACHE_LOOKUPS.labels("decision", "hit").inc()
+        return dict(value)
+
+    def set(self, key, value):
+        size = len(key) + len(json.dumps(value, default=str)) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, size, dict(value))
+        self.current_bytes += size
+        while len(self.entries) > self.maxsize or self.current_bytes > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self.entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        self.entries.clear()
+        self.current_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxsize": self.maxsize,
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+decision_cache = DecisionCache()
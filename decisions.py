@@ -0,0 +1,183 @@
+import logging
+import json
+import time
+import functools
+from app import bot
+from agentic_app import agentic_bot
+from battle_app import battle_bot
+from fast_path import fallback_decision
+from deadline import run_with_deadline
+from session_store import session_store, current_session
+from plan import plan_mode, serve_plan, record_plan
+from metrics import observe_decision
+from grid_engine import parse_game_state, compute_features
+from agent_settings import DEFAULT_DEADLINE_SECONDS, REASONING_DEADLINE_SECONDS, MAX_DEADLINE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Feature fields that may arrive either nested or as JSON encoded strings, with their defaults.
+FEATURE_FIELDS = {
+    "valid_movement": "[]",
+    "nearest_crate": "{}",
+    "check_bomb_radius": "{}",
+    "plant_bomb_available": "{}",
+    "coins_collection_policy": "{}",
+    "movement_history": "[]",
+    "opponents": "[]",
+}
+
+# Feature fields the grid engine can derive from a raw game_state when the client does not send them.
+GRID_FEATURE_FIELDS = ["valid_movement", "nearest_crate", "check_bomb_radius", "plant_bomb_available", "coins_collection_policy"]
+# Fields of the danger map of the grid engine, always added to check_bomb_radius when game_state is parseable.
+# They take precedence over client-sent fields of the same names: the server-side danger map is the one the fast path trusts.
+DANGER_FIELDS = ["ticks_to_explosion", "safe_actions", "danger_horizon"]
+
+def parse_features(data):
+    """
+    Features of the tick from the payload. Fields the client did not precompute are derived server-side
+    from game_state by the grid engine, when it holds the arena and our agent, and check_bomb_radius
+    always gets the time to explosion, the ranked safe actions and the horizon of the danger map (DANGER_FIELDS),
+    replacing any value the client sent for them. A game_state the grid engine cannot parse is ignored.
+    """
+    try:
+        grid = parse_game_state(data.get("game_state"))
+        derived = compute_features(grid) if grid is not None else {}
+    except (ValueError, TypeError, IndexError, KeyError) as e:
+        # A malformed game_state must not cost the tick, the client-supplied features are used as they are
+        logger.warning(f"Could not derive features from game_state: {e!r}")
+        derived = {}
+    features = {}
+    for field, default in FEATURE_FIELDS.items():
+        if field not in data and field in derived:
+            features[field] = derived[field]
+            continue
+        value = data.get(field, default)
+        if isinstance(value, str):
+            value = json.loads(value)
+        features[field] = value
+    if derived and isinstance(features["check_bomb_radius"], dict):
+        features["check_bomb_radius"] = dict(features["check_bomb_radius"], **{key: derived["check_bomb_radius"][key] for key in DANGER_FIELDS})
+    return features
+
+def deadline_budget(deadline_ms, need_reasoning="no"):
+    """
+    Time budget of the tick in seconds from a deadline in milliseconds, clamped to MAX_DEADLINE_SECONDS.
+    Without a deadline, need_reasoning ticks get REASONING_DEADLINE_SECONDS, as they run on the reasoning
+    deployments, and the others DEFAULT_DEADLINE_SECONDS.
+    """
+    default = REASONING_DEADLINE_SECONDS if need_reasoning == "yes" else DEFAULT_DEADLINE_SECONDS
+    if deadline_ms is None:
+        return default
+    try:
+        budget = float(deadline_ms) / 1000
+    except (TypeError, ValueError):
+        return default
+    return min(max(budget, 0), MAX_DEADLINE_SECONDS)
+
+def deadline_fallback(features):
+    return lambda: fallback_decision(features["valid_movement"], features["nearest_crate"], features["check_bomb_radius"], features["coins_collection_policy"])
+
+def with_session(decide):
+    """
+    Lets the clients of a game send only the per-tick delta: payloads with a game_id are completed from,
+    and recorded into, the server-side session of that game (see GameSession.apply_delta).
+    Ticks of the same game are decided one at a time in arrival order, the time spent waiting for the previous
+    ones counts against their budget.
+    """
+    @functools.wraps(decide)
+    async def decide_with_session(data, budget):
+        game_id = data.get("game_id")
+        if game_id is None:
+            return await decide(data, budget)
+        if data.get("reset"):
+            session_store.close(game_id)
+        session = session_store.get(game_id)
+        for field in ("movement_history", "opponents"):
+            if isinstance(data.get(field), str):
+                data = dict(data, **{field: json.loads(data[field])})
+        started = time.monotonic()
+        async with session.lock:
+            budget = max(budget - (time.monotonic() - started), 0)
+            token = current_session.set(session)
+            try:
+                final_answer = await decide(session.apply_delta(data), budget)
+            finally:
+                current_session.reset(token)
+            session.record_decision(final_answer)
+        return final_answer
+    return decide_with_session
+
+@observe_decision("bot")
+@with_session
+async def decide_action(data, budget):
+    need_reasoning = data.get("need_reasoning","no")
+    game_state = data.get("game_state","{}")
+    rl_model_suggestion = data.get("rl_model_suggestion","")
+    features = parse_features(data)
+    if len(features["valid_movement"]) == 0:
+        features["valid_movement"] = ["WAIT"]
+    planned = serve_plan("bot", features)
+    if planned:
+        return planned
+    try:
+        # Bot Response in the final answer already, together with the final map dict url.
+        final_answer = await run_with_deadline(
+            "bot",
+            bot(need_reasoning, game_state, features["valid_movement"], features["nearest_crate"], features["check_bomb_radius"], features["plant_bomb_available"], features["coins_collection_policy"], features["movement_history"], rl_model_suggestion="", maverick_top_actions="", maverick_features="", maverick_best_action="", plan_mode=plan_mode()),
+            budget,
+            deadline_fallback(features),
+        )
+        record_plan("bot", final_answer)
+        return final_answer
+    except Exception as e:
+        logger.error(f"Error : {str(e)}", exc_info=True)
+        return {"reasoning": f"Error! {str(e)}", "action":"WAIT", "source": "error"}
+
+@observe_decision("agentic")
+@with_session
+async def decide_agentic(data, budget):
+    need_reasoning = data.get("need_reasoning","no")
+    game_state = data.get("game_state","{}")
+    features = parse_features(data)
+    try:
+        # Agentic bot: Uses PredictAgent tools to predict each opponent's move, then makes final decision
+        final_answer = await run_with_deadline(
+            "agentic",
+            agentic_bot(need_reasoning, game_state, features["valid_movement"], features["nearest_crate"], features["check_bomb_radius"], features["plant_bomb_available"], features["coins_collection_policy"], features["movement_history"], features["opponents"], step=data.get("tick"), game_id=data.get("game_id")),
+            budget,
+            deadline_fallback(features),
+        )
+        return final_answer
+    except Exception as e:
+        logger.error(f"Error : {str(e)}", exc_info=True)
+        return {"reasoning": f"Error! {str(e)}", "action":"WAIT", "source": "error"}
+
+@observe_decision("battle")
+@with_session
+async def decide_battle(data, budget):
+    need_reasoning = data.get("need_reasoning","no")
+    game_state = data.get("game_state","{}")
+    features = parse_features(data)
+    planned = serve_plan("battle", features)
+    if planned:
+        return planned
+    try:
+        # Battle bot: Aggressive agent focused on destroying crates and eliminating opponents while maintaining safety
+        final_answer = await run_with_deadline(
+            "battle",
+            battle_bot(need_reasoning, game_state, features["valid_movement"], features["nearest_crate"], features["check_bomb_radius"], features["plant_bomb_available"], features["coins_collection_policy"], features["movement_history"], features["opponents"], maverick_top_actions="", maverick_features="", maverick_best_action="", plan_mode=plan_mode()),
+            budget,
+            deadline_fallback(features),
+        )
+        record_plan("battle", final_answer)
+        return final_answer
+    except Exception as e:
+        logger.error(f"Error : {str(e)}", exc_info=True)
+        return {"reasoning": f"Error! {str(e)}", "action":"WAIT", "source": "error"}
+
+# Decision function of each endpoint, by path.
+DECIDERS = {
+    "/": decide_action,
+    "/agentic-predict": decide_agentic,
+    "/battle-agent": decide_battle,
+}
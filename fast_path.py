@@ -0,0 +1,130 @@
+from collections import Counter
+from agent_settings import FAST_PATH_ESCAPE_MARGIN
+
+# Pre-LLM policies, tried in order. Each policy receives the request features and returns
+# (action, reasoning) when the move is already decided, or None to let the agent decide.
+FAST_PATH_POLICIES = []
+
+def fast_path_policy(policy):
+    """
+    Registers a policy in the pre-LLM stage.
+    """
+    FAST_PATH_POLICIES.append(policy)
+    return policy
+
+def playable(action, valid_movement):
+    """
+    Whether an action of the danger map may be played this tick, WAIT always can.
+    """
+    return action == "WAIT" or action in valid_movement
+
+@fast_path_policy
+def escape_bomb(valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy):
+    # Only forced when the escape is the only way out: the only safe action of the danger map when we have one,
+    # else the only movement available (WAIT and BOMB keep us in the blast). Otherwise the agent weighs the options.
+    escape_bomb_action = check_bomb_radius.get("escape_bomb_action")
+    if check_bomb_radius.get("in_danger") != "yes" or not escape_bomb_action or escape_bomb_action not in valid_movement:
+        return None
+    safe_actions = check_bomb_radius.get("safe_actions")
+    if safe_actions is not None:
+        options = [item.get("action") for item in safe_actions]
+    else:
+        options = [m for m in dict.fromkeys(valid_movement) if m not in ("WAIT", "BOMB")]
+    if options == [escape_bomb_action]:
+        return escape_bomb_action, f"In danger of a bomb, {escape_bomb_action} is the only escape."
+    return None
+
+@fast_path_policy
+def single_valid_movement(valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy):
+    movements = list(dict.fromkeys(valid_movement))
+    if len(movements) == 1:
+        return movements[0], f"{movements[0]} is the only valid movement."
+    return None
+
+@fast_path_policy
+def single_safe_action(valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy):
+    # Every other move walks into a blast we could not escape afterwards. Only meaningful while a blast is on its
+    # way to us: without bombs the danger map has no horizon and ranks every move as safe.
+    ticks_to_explosion = check_bomb_radius.get("ticks_to_explosion")
+    safe_actions = check_bomb_radius.get("safe_actions")
+    if not check_bomb_radius.get("danger_horizon") or ticks_to_explosion is None:
+        return None
+    if safe_actions and len(safe_actions) == 1 and playable(safe_actions[0]["action"], valid_movement):
+        action = safe_actions[0]["action"]
+        return action, f"Bomb blast reaches us in {ticks_to_explosion} ticks, {action} is the only action that survives it."
+    return None
+
+@fast_path_policy
+def safe_escape(valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy):
+    # Safe actions ranked by the danger map of the grid engine, when the payload carries a game_state (see grid_engine.DangerMap).
+    # Only played when even the safest escape leaves no slack, the agent weighs the escapes otherwise.
+    ticks_to_explosion = check_bomb_radius.get("ticks_to_explosion")
+    safe_actions = check_bomb_radius.get("safe_actions")
+    if ticks_to_explosion is None or not safe_actions or safe_actions[0]["margin"] > FAST_PATH_ESCAPE_MARGIN:
+        return None
+    if not playable(safe_actions[0]["action"], valid_movement):
+        return None
+    action, margin = safe_actions[0]["action"], safe_actions[0]["margin"]
+    return action, f"Bomb blast reaches us in {ticks_to_explosion} ticks, {action} is the safest escape ({margin} ticks of margin)."
+
+class FastPathStats():
+    """
+    Counts, per endpoint, how many ticks were resolved locally and by which policy.
+    """
+    def __init__(self):
+        self.ticks = Counter()
+        self.resolved = Counter()
+        self.policies = Counter()
+
+    def record(self, endpoint, policy_name=None):
+        self.ticks[endpoint] += 1
+        if policy_name:
+            self.resolved[endpoint] += 1
+            self.policies[policy_name] += 1
+
+    def stats(self):
+        return {
+            endpoint: {
+                "ticks": ticks,
+                "fast_path": self.resolved[endpoint],
+                "fast_path_rate": round(self.resolved[endpoint] / ticks, 4),
+            }
+            for endpoint, ticks in self.ticks.items()
+        } | {"policies": dict(self.policies)}
+
+fast_path_stats = FastPathStats()
+
+def resolve_fast_path(endpoint, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy):
+    """
+    Runs the pre-LLM policies over the request features of a tick.
+
+    Returns:
+        Response dict tagged with source "fast_path" if a policy decided the move, else None
+    """
+    for policy in FAST_PATH_POLICIES:
+        decision = policy(valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy)
+        if decision:
+            action, reasoning = decision
+            fast_path_stats.record(endpoint, policy.__name__)
+            return {"reasoning": reasoning, "action": action, "valid_movement": valid_movement, "source": "fast_path", "policy": policy.__name__}
+    fast_path_stats.record(endpoint)
+    return None
+
+def fallback_decision(valid_movement, nearest_crate, check_bomb_radius, coins_collection_policy, reason="Deadline exceeded"):
+    """
+    Best locally computed action when the agent cannot answer in time:
+    escape a bomb, then collect a coin, then head to a crate, else WAIT.
+    """
+    if check_bomb_radius.get("in_danger") == "yes" and check_bomb_radius.get("escape_bomb_action"):
+        action = check_bomb_radius.get("escape_bomb_action")
+        reasoning = f"{reason}, escaping from bomb with {action}."
+    elif coins_collection_policy.get("coin_available") == "yes" and coins_collection_policy.get("coin_action"):
+        action = coins_collection_policy.get("coin_action")
+        reasoning = f"{reason}, collecting coin with {action}."
+    elif nearest_crate.get("crate_available") == "yes" and nearest_crate.get("crate_action"):
+        action = nearest_crate.get("crate_action")
+        reasoning = f"{reason}, moving towards crate with {action}."
+    else:
+        action = "WAIT"
+        reasoning = f"{reason}, waiting."
+    return {"reasoning": reasoning, "action": action, "valid_movement": valid_movement, "source": "fallback"}
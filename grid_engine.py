@@ -0,0 +1,358 @@
+import json
+import functools
+import numpy as np
+from agent_settings import GRID_BOMB_POWER, GRID_BOMB_TIMER, GRID_EXPLOSION_TICKS
+
+# Moves in the order ties are broken, with their (dx, dy) on the arena, indexed [x, y] as in the game state.
+DIRECTIONS = ["UP", "RIGHT", "DOWN", "LEFT"]
+OFFSETS = [(0, -1), (1, 0), (0, 1), (-1, 0)]
+# Ticks until explosion of the cells no bomb reaches
+NO_DANGER = np.iinfo(np.int16).max
+
+class GridState():
+    """
+    Game state of the bomberman_rl environment parsed into arrays:
+    arena (-1 stone wall, 1 crate, 0 free), bombs (x, y, timer), explosion map, coins, our agent and the others.
+    """
+    def __init__(self, game_state):
+        self.arena = np.asarray(game_state["field"], dtype=np.int8)
+        self.shape = self.arena.shape
+        bombs = [(xy[0], xy[1], timer) for xy, timer in game_state.get("bombs") or []]
+        self.bombs = np.asarray(bombs, dtype=np.int16).reshape(-1, 3)
+        explosion_map = game_state.get("explosion_map")
+        self.explosion_map = np.asarray(explosion_map, dtype=np.int8) if explosion_map is not None else np.zeros(self.shape, dtype=np.int8)
+        self.coins = np.asarray(game_state.get("coins") or [], dtype=np.int16).reshape(-1, 2)
+        name, score, bombs_left, position = game_state["self"]
+        self.name = name
+        self.score = score
+        self.bombs_left = bool(bombs_left)
+        self.position = (int(position[0]), int(position[1]))
+        self.others = [(n, s, bool(b), (int(p[0]), int(p[1]))) for n, s, b, p in game_state.get("others") or []]
+
+        self.crates = self.arena == 1
+        self.free = self.arena == 0
+        self.bomb_cells = np.zeros(self.shape, dtype=bool)
+        self.bomb_cells[self.bombs[:, 0], self.bombs[:, 1]] = True
+        self.agent_cells = np.zeros(self.shape, dtype=bool)
+        for _, _, _, (x, y) in self.others:
+            self.agent_cells[x, y] = True
+        # Cells an agent can step into this tick
+        self.walkable = self.free & ~self.bomb_cells & ~self.agent_cells
+        self.coin_cells = np.zeros(self.shape, dtype=bool)
+        self.coin_cells[self.coins[:, 0], self.coins[:, 1]] = True
+
+    def in_bounds(self, x, y):
+        return 0 <= x < self.shape[0] and 0 <= y < self.shape[1]
+
+    def blast_cells(self, x, y, power=GRID_BOMB_POWER):
+        """
+        Cells reached by the blast of a bomb at (x, y): up to power cells in each direction, stopped by stone walls.
+        """
+        cells = [(x, y)]
+        for dx, dy in OFFSETS:
+            for i in range(1, power + 1):
+                cx, cy = x + dx * i, y + dy * i
+                if not self.in_bounds(cx, cy) or self.arena[cx, cy] == -1:
+                    break
+                cells.append((cx, cy))
+        return cells
+
+    def blast_timers(self, bombs=None):
+        """
+        Ticks until the bombs blow up each cell, NO_DANGER where no blast reaches.
+        """
+        bombs = self.bombs if bombs is None else np.asarray(bombs, dtype=np.int16).reshape(-1, 3)
+        timers = np.full(self.arena.size, NO_DANGER, dtype=np.int16)
+        if len(bombs):
+            cells, owners = blast_geometry(self.arena == -1, tuple(map(tuple, bombs[:, :2].tolist())))
+            np.minimum.at(timers, cells, bombs[owners, 2])
+        return timers.reshape(self.shape)
+
+    def blast_mask(self, bombs=None):
+        return self.blast_timers(bombs) != NO_DANGER
+
+class WallsKey():
+    """
+    Hashable view of the stone walls of an arena, so the blast geometry can be cached across ticks.
+    """
+    def __init__(self, walls):
+        self.walls = walls
+        self.key = (walls.shape, walls.tobytes())
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+@functools.lru_cache(maxsize=256)
+def cached_blast_geometry(walls_key, positions, power):
+    """
+    Flat indexes of the cells in the blast of every bomb, propagated for all bombs at once: one step outwards
+    in each direction per array operation, a ray stopping at the first stone wall or the arena border.
+
+    Returns:
+        Tuple of (cells, owners), owners[i] being the index of the bomb whose blast reaches cells[i]
+    """
+    walls = walls_key.walls
+    width, height = walls.shape
+    origins = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    cells = [origins[:, 0] * height + origins[:, 1]]
+    owners = [np.arange(len(origins))]
+    for dx, dy in OFFSETS:
+        alive = np.ones(len(origins), dtype=bool)
+        for i in range(1, power + 1):
+            xs, ys = origins[:, 0] + dx * i, origins[:, 1] + dy * i
+            alive &= (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            alive[alive] &= ~walls[xs[alive], ys[alive]]
+            if not alive.any():
+                break
+            cells.append(xs[alive] * height + ys[alive])
+            owners.append(np.flatnonzero(alive))
+    return np.concatenate(cells), np.concatenate(owners)
+
+def blast_geometry(walls, positions, power=GRID_BOMB_POWER):
+    """
+    Blast cells of bombs at the given positions. Only stone walls stop a blast, so the geometry depends on the bomb
+    positions alone and is reused while only the timers of the bombs change from tick to tick.
+    """
+    return cached_blast_geometry(WallsKey(walls), positions, power)
+
+def neighbours(mask):
+    """
+    Cells 4-adjacent to any cell of the mask.
+    """
+    result = np.zeros_like(mask)
+    result[1:, :] |= mask[:-1, :]
+    result[:-1, :] |= mask[1:, :]
+    result[:, 1:] |= mask[:, :-1]
+    result[:, :-1] |= mask[:, 1:]
+    return result
+
+def to_bits(mask):
+    """
+    Packs a boolean grid into an integer, cell (x, y) is bit x * height + y.
+    """
+    return int.from_bytes(np.packbits(mask.ravel(), bitorder="little").tobytes(), "little")
+
+def lowest_cell(bits, height):
+    index = (bits & -bits).bit_length() - 1
+    return (index // height, index % height)
+
+@functools.lru_cache(maxsize=8)
+def edge_bits(shape):
+    """
+    Bits of the first and last cell of every column of the arena, shifts along y must not wrap from one column into the next.
+    """
+    index = np.arange(shape[0] * shape[1]).reshape(shape) % shape[1]
+    return to_bits(index == 0), to_bits(index == shape[1] - 1)
+
+def expand(bits, shape):
+    """
+    Packed cells 4-adjacent to any of the packed cells.
+    """
+    first, last = edge_bits(shape)
+    height = shape[1]
+    return ((bits << 1) & ~first) | ((bits >> 1) & ~last) | (bits << height) | (bits >> height)
+
+class Search():
+    """
+    Breadth first search from our agent over the walkable cells. The arena is packed into integers so every step expands
+    the whole frontier at once with four shifts, and one pass answers the nearest cell of every target mask.
+    layers[d] holds the cells first reached after d moves.
+    """
+    def __init__(self, grid, targets, max_steps=None):
+        self.grid = grid
+        height = grid.shape[1]
+        self.height = height
+        x, y = grid.position
+        open_cells = to_bits(grid.walkable)
+        frontier = 1 << (x * height + y)
+        open_cells &= ~frontier
+        pending = {name: to_bits(mask) for name, mask in targets.items()}
+        self.layers = []
+        self.nearest = {}
+        while frontier:
+            self.layers.append(frontier)
+            for name in [name for name, bits in pending.items() if bits & frontier]:
+                self.nearest[name] = lowest_cell(pending.pop(name) & frontier, height)
+            if not pending or (max_steps is not None and len(self.layers) > max_steps):
+                break
+            frontier = expand(frontier, grid.shape) & open_cells
+            open_cells &= ~frontier
+
+    def distance(self, cell):
+        bit = 1 << (cell[0] * self.height + cell[1])
+        return next((d for d, layer in enumerate(self.layers) if layer & bit), -1)
+
+    def first_move(self, cell):
+        """
+        First move of a shortest path from our agent to the cell, found by walking the layers back from the cell.
+        """
+        d = self.distance(cell) if cell is not None else -1
+        if d <= 0:
+            return "WAIT"
+        x, y = cell
+        for d in range(d - 1, 0, -1):
+            x, y = next((x - dx, y - dy) for dx, dy in OFFSETS if self.grid.in_bounds(x - dx, y - dy) and self.layers[d] >> ((x - dx) * self.height + y - dy) & 1)
+        return DIRECTIONS[OFFSETS.index((x - self.grid.position[0], y - self.grid.position[1]))]
+
+class DangerMap():
+    """
+    When each cell is deadly: explodes_in holds the ticks until a blast reaches the cell (NO_DANGER if none does)
+    and clears_in the ticks until the cell is safe again. A bomb shown with timer t blows up after our (t + 1)th move,
+    its blast stays deadly for GRID_EXPLOSION_TICKS ticks, and cells of the explosion map are deadly while it is non zero.
+
+    alive[t] holds the packed cells where our agent can stand after t moves and still survive every later blast,
+    computed backwards from the tick where the last blast clears.
+    """
+    def __init__(self, grid, extra_bombs=()):
+        self.grid = grid
+        x, y = grid.position
+        extra_bombs = np.asarray(extra_bombs, dtype=np.int16).reshape(-1, 3)
+        timers = grid.blast_timers(np.concatenate([grid.bombs, extra_bombs])).astype(np.int32)
+        reached = timers != NO_DANGER
+        self.explodes_in = np.where(reached, timers + 1, NO_DANGER)
+        self.clears_in = np.where(reached, timers + 1 + GRID_EXPLOSION_TICKS, 0)
+        burning = grid.explosion_map > 0
+        self.explodes_in[burning] = 0
+        self.clears_in = np.maximum(self.clears_in, np.where(burning, grid.explosion_map, 0))
+        self.horizon = int(self.clears_in.max())
+
+        own = 1 << (x * grid.shape[1] + y)
+        walkable = grid.walkable.copy()
+        walkable[extra_bombs[:, 0], extra_bombs[:, 1]] = False
+        walkable = to_bits(walkable)
+        self.alive = [0] * (self.horizon + 1)
+        for t in range(self.horizon, 0, -1):
+            # Our own cell may only be kept (WAIT or BOMB) on the first move, a bomb there blocks it afterwards
+            cells = walkable | own if t == 1 else walkable
+            if t == self.horizon:
+                self.alive[t] = cells
+            else:
+                self.alive[t] = cells & ~self.deadly(t) & (self.alive[t + 1] | expand(self.alive[t + 1], grid.shape))
+
+    def deadly(self, t):
+        return to_bits((self.explodes_in <= t) & (t < self.clears_in))
+
+    def ticks_to_explosion(self, cell=None):
+        """
+        Ticks until the cell (our agent's by default) explodes, or None if no blast reaches it.
+        """
+        x, y = self.grid.position if cell is None else cell
+        ticks = int(self.explodes_in[x, y])
+        return None if ticks == NO_DANGER else ticks
+
+    def safe_actions(self):
+        """
+        Moves after which our agent can still survive every blast, ranked by margin: the number of ticks it could then
+        stay on the cell it moved to before having to move on. Cells out of reach of every blast have the full horizon.
+
+        Returns:
+            List of (action, margin), best first, ties in DIRECTIONS order then WAIT
+        """
+        grid = self.grid
+        x, y = grid.position
+        candidates = [(d, (x + dx, y + dy)) for d, (dx, dy) in zip(DIRECTIONS, OFFSETS) if grid.in_bounds(x + dx, y + dy) and grid.walkable[x + dx, y + dy]]
+        candidates.append(("WAIT", (x, y)))
+        if not self.horizon:
+            return [(action, 0) for action, _ in candidates]
+        ranked = []
+        for action, (cx, cy) in candidates:
+            bit = 1 << (cx * grid.shape[1] + cy)
+            margin = 0
+            while margin < self.horizon and self.alive[margin + 1] & bit:
+                margin += 1
+            if margin:
+                ranked.append((action, margin))
+        return sorted(ranked, key=lambda item: -item[1])
+
+def parse_game_state(game_state):
+    """
+    Returns:
+        GridState of a bomberman_rl game state (dict or JSON string), or None if it has no arena or agent
+    """
+    if isinstance(game_state, str):
+        try:
+            game_state = json.loads(game_state)
+        except json.JSONDecodeError:
+            return None
+    if not isinstance(game_state, dict) or not game_state.get("field") or not game_state.get("self"):
+        return None
+    return GridState(game_state)
+
+def compute_features(grid):
+    """
+    Derives the feature dicts the clients otherwise precompute, from one search of the grid.
+
+    Returns:
+        Dict with valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available and coins_collection_policy
+    """
+    x, y = grid.position
+    danger = DangerMap(grid)
+    own_blast = grid.blast_mask(np.array([(x, y, GRID_BOMB_TIMER)]))
+    # Cells a crate can be bombed from, our own cell included even when we already stand on a bomb
+    adjacent_to_crate = neighbours(grid.crates)
+    crate_spots = adjacent_to_crate & grid.free & ~grid.bomb_cells
+    crate_spots[x, y] = adjacent_to_crate[x, y]
+    search = Search(grid, {"coin": grid.coin_cells, "crate": crate_spots})
+    nearest = search.nearest
+
+    valid_movement = [d for d, (dx, dy) in zip(DIRECTIONS, OFFSETS) if grid.in_bounds(x + dx, y + dy) and grid.walkable[x + dx, y + dy]]
+
+    crate = nearest.get("crate")
+    if crate is None:
+        nearest_crate = {"crate_available": "no", "crate_action": "WAIT", "crate_reason": "No reachable crate."}
+    else:
+        nearest_crate = {
+            "crate_available": "yes",
+            "crate_action": "BOMB" if crate == (x, y) else search.first_move(crate),
+            "crate_pos": next([crate[0] + dx, crate[1] + dy] for dx, dy in OFFSETS if grid.in_bounds(crate[0] + dx, crate[1] + dy) and grid.crates[crate[0] + dx, crate[1] + dy]),
+            "crate_distance": float(search.distance(crate) + 1),
+            "crate_reason": "Adjacent to a crate, a bomb would destroy it." if crate == (x, y) else "Nearest crate identified and reachable.",
+        }
+
+    ticks_to_explosion = danger.ticks_to_explosion()
+    in_bomb_radius = ticks_to_explosion is not None
+    safe_actions = danger.safe_actions()
+    check_bomb_radius = {
+        "in_bomb_radius": "yes" if in_bomb_radius else "no",
+        "in_danger": "yes" if in_bomb_radius else "no",
+        "escape_bomb_action": safe_actions[0][0] if in_bomb_radius and safe_actions else "WAIT",
+        "ticks_to_explosion": ticks_to_explosion,
+        "safe_actions": [{"action": action, "margin": margin} for action, margin in safe_actions],
+        "danger_horizon": danger.horizon,
+    }
+
+    # Planting keeps us on our cell for the first move, we must then outrun our own bomb and the others
+    can_escape = any(action == "WAIT" for action, _ in DangerMap(grid, [(x, y, GRID_BOMB_TIMER)]).safe_actions())
+    opponent_in_blast = any(own_blast[ox, oy] for _, _, _, (ox, oy) in grid.others)
+    if grid.bomb_cells[x, y]:
+        current_status = "Standing on a bomb."
+    elif in_bomb_radius:
+        current_status = "In the blast radius of a bomb."
+    else:
+        current_status = "No bomb detected."
+    if not grid.bombs_left:
+        plant, reason = "false", "no bomb available"
+    elif not (crate == (x, y) or opponent_in_blast):
+        plant, reason = "false", "not adjacent to crate"
+    elif not can_escape:
+        plant, reason = "false", "no escape route from own bomb"
+    else:
+        plant, reason = "true", "opponent in blast radius" if opponent_in_blast else "adjacent to crate"
+    plant_bomb_available = {"plant": plant, "reason": reason, "current_status": current_status, "plant_bomb_reason": current_status}
+
+    coin = nearest.get("coin")
+    if coin is None:
+        coins_collection_policy = {"coin_available": "no", "coin_action": "WAIT", "coin_reason": "No coins available to collect."}
+    else:
+        coins_collection_policy = {"coin_available": "yes", "coin_action": search.first_move(coin), "coin_reason": f"Nearest coin is {search.distance(coin)} steps away."}
+
+    return {
+        "valid_movement": valid_movement,
+        "nearest_crate": nearest_crate,
+        "check_bomb_radius": check_bomb_radius,
+        "plant_bomb_available": plant_bomb_available,
+        "coins_collection_policy": coins_collection_policy,
+    }
@@ -1,13 +1,18 @@
+import logging
 import os
 import re
 import json
 import httpx
+import asyncio
 from openai import AzureOpenAI, AsyncAzureOpenAI
-import openai
-import time
+from dataclasses import dataclass
+from agent_settings import LLM_BACKEND
+from mock_llm import MockLLM
+
+logger = logging.getLogger(__name__)
 
 use_apim = os.environ.get('USE_APIM')
-print("USE APIM : ",use_apim)
+logger.info(f"USE APIM : {use_apim}")
 
 def extract_json(string):
     string = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]', '', string)
@@ -28,79 +33,145 @@ def extract_eval_json(string):
         final = string
     return final
 
-if use_apim.lower() == 'true':
-    print("Loading APIM")
-    client = AzureOpenAI(
-        api_key = os.environ.get("OPENAI_APIM_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_APIM_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.Client(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
-    )
+class LLMConfigError(ValueError):
+    """
+    Raised when a client is first needed and its environment variables are missing or invalid.
+    """
 
-    a_client = AsyncAzureOpenAI(
-        api_key = os.environ.get("OPENAI_APIM_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_APIM_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
-    )
-    a_client_reasoning = AsyncAzureOpenAI(
-        api_key = os.environ.get("OPENAI_API_DEV_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_API_DEV_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
+# Environment variables of the key and endpoint of each client, the primary client goes through APIM when USE_APIM=true.
+CLIENT_SETTINGS = {
+    "primary": ("OPENAI_API_KEY", "OPENAI_API_ENDPOINT"),
+    "primary_apim": ("OPENAI_APIM_KEY", "OPENAI_APIM_ENDPOINT"),
+    "dev": ("OPENAI_API_DEV_KEY", "OPENAI_API_DEV_ENDPOINT"),
+    "eu2_prod": ("GPT5_KEY", "GPT5_ENDPOINT"),
+}
+
+# Clients built so far, and their HTTP clients, by name. Clients are only built on first use, see get_client.
+CLIENTS = {}
+HTTP_CLIENTS = {}
+# Mock backends by client name, when LLM_BACKEND=mock
+MOCK_BACKENDS = {}
+
+def client_timeout():
+    try:
+        return int(os.environ.get("TIMEOUT", 30))
+    except ValueError:
+        raise LLMConfigError(f"TIMEOUT must be a number of seconds, got {os.environ.get('TIMEOUT')!r}")
+
+def client_settings(name):
+    """
+    Returns:
+        Tuple of (api key, endpoint, api version) of the client, validated
+    """
+    if name == "primary" and (use_apim or "false").lower() == "true":
+        name = "primary_apim"
+    key_var, endpoint_var = CLIENT_SETTINGS[name]
+    missing = [var for var in (key_var, endpoint_var, "OPENAI_API_VERSION") if not os.environ.get(var)]
+    if missing:
+        raise LLMConfigError(f"Missing environment variables for the {name} client: {', '.join(missing)}")
+    return os.environ[key_var], os.environ[endpoint_var], os.environ["OPENAI_API_VERSION"]
+
+def build_client(name):
+    if LLM_BACKEND == "mock":
+        MOCK_BACKENDS[name] = MockLLM(name, {d.model: d.name for route in DEPLOYMENT_ROUTES.values() for d in route if d.client_name == name})
+        return AsyncAzureOpenAI(
+            api_key = "mock",
+            azure_endpoint = "http://mock-llm.local",
+            api_version = os.environ.get("OPENAI_API_VERSION", "2024-10-21"),
+            timeout=client_timeout(),
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=MOCK_BACKENDS[name].transport())
         )
+    api_key, endpoint, api_version = client_settings(name)
+    HTTP_CLIENTS[name] = httpx.AsyncClient(
+        verify=os.environ.get('REQUESTS_CA_BUNDLE')
     )
-    a_client_eu2_prod = AsyncAzureOpenAI(
-        api_key = os.environ.get("GPT5_KEY"),
-        azure_endpoint = os.environ.get("GPT5_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
+    return AsyncAzureOpenAI(
+        api_key = api_key,
+        azure_endpoint = endpoint,
+        api_version = api_version,
+        timeout=client_timeout(),
+        # Retries, backoff and failover are owned by resilience.ResilientExecutor, stacked SDK retries would hide failures from the breakers
+        max_retries=0,
+        http_client=HTTP_CLIENTS[name]
     )
-else:
-    client = AzureOpenAI(
-        api_key = os.environ.get("OPENAI_API_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_API_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
+
+def get_client(name):
+    """
+    Returns the async client of the given name ("primary", "dev" or "eu2_prod"), building it on first use.
+    """
+    client = CLIENTS.get(name)
+    if client is None:
+        client = CLIENTS[name] = build_client(name)
+        logger.info(f"Built {name} client", extra={"client": name, "backend": LLM_BACKEND})
+    return client
+
+def get_sync_client():
+    api_key, endpoint, api_version = client_settings("primary")
+    return AzureOpenAI(
+        api_key = api_key,
+        azure_endpoint = endpoint,
+        api_version = api_version,
+        timeout=client_timeout(),
         http_client=httpx.Client(
             verify=os.environ.get('REQUESTS_CA_BUNDLE')
         )
     )
-    a_client = AsyncAzureOpenAI(
-        api_key = os.environ.get("OPENAI_API_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_API_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
-    )
-    a_client_reasoning = AsyncAzureOpenAI(
-        api_key = os.environ.get("OPENAI_API_DEV_KEY"),
-        azure_endpoint = os.environ.get("OPENAI_API_DEV_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
-    )
-    a_client_eu2_prod = AsyncAzureOpenAI(
-        api_key = os.environ.get("GPT5_KEY"),
-        azure_endpoint = os.environ.get("GPT5_ENDPOINT"),
-        api_version = os.environ.get("OPENAI_API_VERSION"),
-        timeout=int(os.environ.get("TIMEOUT")),
-        http_client=httpx.AsyncClient(
-            verify=os.environ.get('REQUESTS_CA_BUNDLE')
-        )
-    )
+
+# Former module level clients, still importable but now built on first access.
+LEGACY_CLIENTS = {"a_client": "primary", "a_client_reasoning": "dev", "a_client_eu2_prod": "eu2_prod"}
+
+def __getattr__(attribute):
+    if attribute in LEGACY_CLIENTS:
+        return get_client(LEGACY_CLIENTS[attribute])
+    if attribute == "client":
+        return get_sync_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {attribute!r}")
+
+async def warm_clients(names):
+    """
+    Builds the clients and opens a connection to each endpoint, so the first ticks do not pay for DNS and TLS.
+    Clients with a missing configuration and endpoints that cannot be reached are logged, not fatal,
+    so a worker still starts when e.g. only the failover deployment is misconfigured.
+    """
+    async def warm(name):
+        try:
+            client = get_client(name)
+        except LLMConfigError as e:
+            logger.error(f"{e}, calls to its deployments will fail", extra={"client": name})
+            return
+        if name not in HTTP_CLIENTS:
+            return
+        try:
+            await HTTP_CLIENTS[name].get(str(client.base_url), timeout=5)
+        except httpx.HTTPError as e:
+            logger.warning(f"Could not warm the connection of the {name} client: {e}", extra={"client": name})
+    await asyncio.gather(*(warm(name) for name in names))
+
+async def close_clients():
+    for name, client in list(CLIENTS.items()):
+        await client.close()
+    CLIENTS.clear()
+    HTTP_CLIENTS.clear()
+
+@dataclass
+class Deployment:
+    name: str
+    client_name: str
+    model: str
+
+    @property
+    def client(self):
+        return get_client(self.client_name)
+
+# Compatible deployments per kind of agent, in order of preference. The first one is the deployment the agents are built with.
+DEPLOYMENT_ROUTES = {
+    "chat": [
+        Deployment("primary", "primary", os.environ.get("OPENAI_DEPLOYMENT_NAME")),
+        Deployment("dev", "dev", os.environ.get("OPENAI_DEV_DEPLOYMENT_NAME", os.environ.get("OPENAI_DEPLOYMENT_NAME"))),
+    ],
+    "reasoning": [
+        Deployment("eu2_prod", "eu2_prod", os.environ.get("GPT5")),
+        Deployment("dev_reasoning", "dev", os.environ.get("OPENAI_DEV_GPT5", os.environ.get("GPT5"))),
+    ],
+}
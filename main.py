@@ -1,131 +1,228 @@
 import os
-import pickle
-import uuid
+import sys
+import time
+# Wall clock start of the server, set by serve_production before the workers are spawned, else the import of this worker
+started_at = float(os.environ.get("SERVER_STARTED_AT", time.time()))
+import asyncio
 import logging
-import json
 import uvicorn
-import traceback
-from fastapi import FastAPI, Request
+import tempfile
+import importlib.util
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Request, Response, WebSocket, WebSocketDisconnect
+import msgspec
 from dotenv import load_dotenv
 load_dotenv()
 
+from structured_logging import setup_logging, logging_stats
+setup_logging()
+logger = logging.getLogger(__name__)
+
 from agents import set_tracing_disabled
 set_tracing_disabled(True)
 
-from app import bot
-from agentic_app import agentic_bot
-from battle_app import battle_bot
+from decisions import DECIDERS, decide_action, decide_agentic, decide_battle, deadline_budget
+from agent_cache import agent_cache
+from decision_cache import decision_cache
+from canonical import canonical_stats
+from single_flight import single_flight
+from fast_path import fast_path_stats
+from deadline import deadline_stats
+from resilience import executor
+from opponent_model import opponent_model
+from session_store import session_store
+from prompt_builder import prompt_stats, token_encoding
+from plan import plan_stats
+from tool_logger import prompt_cache_stats
+from metrics import render_metrics
+from llm import DEPLOYMENT_ROUTES, MOCK_BACKENDS, close_clients, warm_clients
+from schemas import FastJSONResponse, decode_batch, decode_tick, encoder
+from agent_settings import BATCH_SIZE, MAX_BATCH_REQUESTS, SESSION_MAX_IN_FLIGHT, SERVER_HOST, SERVER_PORT, SERVER_WORKERS
+
+# Startup timings of this worker, in seconds since the start of the server
+startup_stats = {"pid": os.getpid(), "imports_seconds": round(time.time() - started_at, 3)}
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    Builds the LLM clients and opens their connections before the first tick, and closes them on shutdown.
+    The tokenizer is loaded meanwhile in a thread, as tiktoken reads (or downloads) its encoding with blocking IO.
+    """
+    warm_started = time.monotonic()
+    await asyncio.gather(
+        warm_clients(sorted({deployment.client_name for route in DEPLOYMENT_ROUTES.values() for deployment in route})),
+        asyncio.to_thread(token_encoding),
+    )
+    startup_stats["warmup_seconds"] = round(time.monotonic() - warm_started, 3)
+    startup_stats["ready_seconds"] = round(time.time() - started_at, 3)
+    logger.info(f"Worker ready in {startup_stats['ready_seconds']}s", extra=startup_stats)
+    yield
+    await close_clients()
+
+app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+
+@app.exception_handler(msgspec.MsgspecError)
+async def malformed_payload(request: Request, exc: msgspec.MsgspecError):
+    # Malformed payloads are rejected before any agent work starts
+    return FastJSONResponse(status_code=422, content={"error": f"Malformed payload: {str(exc)}"})
 
-app = FastAPI()
+def request_deadline(request, data):
+    """
+    Time budget of the tick in seconds, from the X-Deadline-Ms header or the deadline_ms body field.
+    """
+    return deadline_budget(request.headers.get("x-deadline-ms", data.get("deadline_ms")), data.get("need_reasoning"))
 
 @app.post("/")
 async def generate_action(request: Request):
-    logging.info('Processing a request.')
-    data = await request.json()
-    need_reasoning = data.get("need_reasoning","no")
-    game_state = data.get("game_state","{}")
-    valid_movement = data.get("valid_movement","[]")
-    nearest_crate = data.get("nearest_crate","{}")
-    check_bomb_radius = data.get("check_bomb_radius","{}")
-    plant_bomb_available = data.get("plant_bomb_available","{}")
-    coins_collection_policy = data.get("coins_collection_policy","{}")
-    movement_history = data.get("movement_history","[]")
-    rl_model_suggestion = data.get("rl_model_suggestion","")
-    if isinstance(valid_movement, str):
-        valid_movement = json.loads(valid_movement)
-    if isinstance(nearest_crate, str):
-        nearest_crate = json.loads(nearest_crate)
-    if isinstance(check_bomb_radius, str):
-        check_bomb_radius = json.loads(check_bomb_radius)
-    if isinstance(plant_bomb_available, str):
-        plant_bomb_available = json.loads(plant_bomb_available)
-    if isinstance(coins_collection_policy, str):
-        coins_collection_policy = json.loads(coins_collection_policy)
-    if isinstance(movement_history, str):
-        movement_history = json.loads(movement_history)
-    if len(valid_movement) == 0:
-        valid_movement = ["WAIT"]
-    try:
-        # Bot Response in the final answer already, together with the final map dict url.
-        final_answer = await bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, rl_model_suggestion="", maverick_top_actions="", maverick_features="", maverick_best_action="")
-        return final_answer
-    except Exception as e:
-        print(f"Error : {str(e)}")
-        print(traceback.format_exc())
-        return {"reasoning": f"Error! {str(e)}", "action":"WAIT"}
+    logger.info('Processing a request.')
+    data = decode_tick(await request.body())
+    return FastJSONResponse(await decide_action(data, request_deadline(request, data)))
 
 @app.post("/agentic-predict")
 async def generate_action_agentic(request: Request):
-    logging.info('Processing a request for agentic prediction.')
-    data = await request.json()
-    need_reasoning = data.get("need_reasoning","no")
-    game_state = data.get("game_state","{}")
-    valid_movement = data.get("valid_movement","[]")
-    nearest_crate = data.get("nearest_crate","{}")
-    check_bomb_radius = data.get("check_bomb_radius","{}")
-    plant_bomb_available = data.get("plant_bomb_available","{}")
-    coins_collection_policy = data.get("coins_collection_policy","{}")
-    movement_history = data.get("movement_history","[]")
-    opponents = data.get("opponents","[]")
-    if isinstance(valid_movement, str):
-        valid_movement = json.loads(valid_movement)
-    if isinstance(nearest_crate, str):
-        nearest_crate = json.loads(nearest_crate)
-    if isinstance(check_bomb_radius, str):
-        check_bomb_radius = json.loads(check_bomb_radius)
-    if isinstance(plant_bomb_available, str):
-        plant_bomb_available = json.loads(plant_bomb_available)
-    if isinstance(coins_collection_policy, str):
-        coins_collection_policy = json.loads(coins_collection_policy)
-    if isinstance(movement_history, str):
-        movement_history = json.loads(movement_history)
-    if isinstance(opponents, str):
-        opponents = json.loads(opponents)
-    try:
-        # Agentic bot: Uses PredictAgent tools to predict each opponent's move, then makes final decision
-        final_answer = await agentic_bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, opponents)
-        return final_answer
-    except Exception as e:
-        print(f"Error : {str(e)}")
-        print(traceback.format_exc())
-        return {"reasoning": f"Error! {str(e)}", "action":"WAIT"}
+    logger.info('Processing a request for agentic prediction.')
+    data = decode_tick(await request.body())
+    return FastJSONResponse(await decide_agentic(data, request_deadline(request, data)))
 
 @app.post("/battle-agent")
 async def generate_action_battle(request: Request):
-    logging.info('Processing a request for battle agent.')
-    data = await request.json()
-    need_reasoning = data.get("need_reasoning","no")
-    game_state = data.get("game_state","{}")
-    valid_movement = data.get("valid_movement","[]")
-    nearest_crate = data.get("nearest_crate","{}")
-    check_bomb_radius = data.get("check_bomb_radius","{}")
-    plant_bomb_available = data.get("plant_bomb_available","{}")
-    coins_collection_policy = data.get("coins_collection_policy","{}")
-    movement_history = data.get("movement_history","[]")
-    opponents = data.get("opponents","[]")
-    if isinstance(valid_movement, str):
-        valid_movement = json.loads(valid_movement)
-    if isinstance(nearest_crate, str):
-        nearest_crate = json.loads(nearest_crate)
-    if isinstance(check_bomb_radius, str):
-        check_bomb_radius = json.loads(check_bomb_radius)
-    if isinstance(plant_bomb_available, str):
-        plant_bomb_available = json.loads(plant_bomb_available)
-    if isinstance(coins_collection_policy, str):
-        coins_collection_policy = json.loads(coins_collection_policy)
-    if isinstance(movement_history, str):
-        movement_history = json.loads(movement_history)
-    if isinstance(opponents, str):
-        opponents = json.loads(opponents)
+    logger.info('Processing a request for battle agent.')
+    data = decode_tick(await request.body())
+    return FastJSONResponse(await decide_battle(data, request_deadline(request, data)))
+
+@app.post("/batch")
+async def generate_actions_batch(request: Request):
+    """
+    Decides many ticks, for any of the agent endpoints, in one HTTP call.
+    Body: {"requests": [{"endpoint": "/battle-agent", "payload": {...}}, ...]}
+    Items run concurrently, at most BATCH_SIZE at a time, and results come back in the same order.
+    Each item gets its own deadline (deadline_ms in its payload, else the X-Deadline-Ms header), counted from the arrival of the batch.
+    """
+    logger.info('Processing a batch request.')
+    items = decode_batch(await request.body())
+    if len(items) > MAX_BATCH_REQUESTS:
+        return FastJSONResponse(status_code=400, content={"error": f"At most {MAX_BATCH_REQUESTS} requests per batch"})
+
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(BATCH_SIZE)
+    header_deadline = request.headers.get("x-deadline-ms")
+
+    async def decide_item(index, item):
+        try:
+            decider = DECIDERS.get(item.endpoint)
+            if decider is None:
+                return {"index": index, "status": "error", "error": f"Unknown endpoint {item.endpoint}"}
+            payload = decode_tick(item.payload)
+            budget = deadline_budget(payload.get("deadline_ms", header_deadline), payload.get("need_reasoning"))
+            async with semaphore:
+                budget = max(budget - (time.monotonic() - started), 0)
+                response = await decider(payload, budget)
+            return {"index": index, "status": "ok", "response": response}
+        except Exception as e:
+            logger.error(f"Error in batch item {index} : {str(e)}", exc_info=True)
+            return {"index": index, "status": "error", "error": str(e)}
+
+    results = await asyncio.gather(*(decide_item(index, item) for index, item in enumerate(items)))
+    return FastJSONResponse({"results": results})
+
+@app.websocket("/ws")
+async def game_session(websocket: WebSocket, endpoint: str = "/", deadline_ms: Optional[float] = None, game_id: Optional[str] = None):
+    """
+    Persistent game session: the game streams one JSON message per tick, with the same fields as the POST body
+    of the endpoint (plus an optional "tick" id), and each decision is pushed back as {"tick": ..., "response": ...}.
+    Query parameters: endpoint, the agent endpoint used for the ticks (default "/"), deadline_ms, the default tick budget,
+    and game_id, which keeps the game state on the server so ticks only need to carry what changed.
+    Up to SESSION_MAX_IN_FLIGHT ticks are decided concurrently, decisions are sent as soon as they are ready, but ticks
+    carrying a game_id are decided one at a time and in arrival order, as they share the state of their game (see decisions.with_session).
+    """
+    await websocket.accept()
+    if endpoint not in DECIDERS:
+        await websocket.close(code=1008, reason=f"Unknown endpoint {endpoint}")
+        return
+    logger.info(f'Opening game session for {endpoint}.')
+    send_lock = asyncio.Lock()
+    in_flight = asyncio.Semaphore(SESSION_MAX_IN_FLIGHT)
+    tasks = set()
+
+    async def send(reply):
+        async with send_lock:
+            await websocket.send_text(encoder.encode(reply).decode())
+
+    async def decide_tick(message):
+        tick = message.get("tick")
+        try:
+            decider = DECIDERS.get(message.get("endpoint", endpoint))
+            if decider is None:
+                await send({"tick": tick, "error": f"Unknown endpoint {message.get('endpoint')}"})
+                return
+            response = await decider(message, deadline_budget(message.get("deadline_ms", deadline_ms), message.get("need_reasoning")))
+            await send({"tick": tick, "response": response})
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            logger.error(f"Error in game session tick {tick} : {str(e)}", exc_info=True)
+            try:
+                await send({"tick": tick, "error": str(e)})
+            except Exception as send_error:
+                # The session is gone, nobody is left to tell
+                logger.warning(f"Could not report the error of game session tick {tick} : {str(send_error)}")
+        finally:
+            in_flight.release()
+
     try:
-        # Battle bot: Aggressive agent focused on destroying crates and eliminating opponents while maintaining safety
-        final_answer = await battle_bot(need_reasoning, game_state, valid_movement, nearest_crate, check_bomb_radius, plant_bomb_available, coins_collection_policy, movement_history, opponents, maverick_top_actions="", maverick_features="", maverick_best_action="")
-        return final_answer
-    except Exception as e:
-        print(f"Error : {str(e)}")
-        print(traceback.format_exc())
-        return {"reasoning": f"Error! {str(e)}", "action":"WAIT"}
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000), frame.get("reason"))
+            text = frame.get("text")
+            if text is None:
+                await send({"tick": None, "error": "Binary frames are not supported, send each tick as a JSON text frame"})
+                continue
+            try:
+                message = decode_tick(text)
+                if game_id is not None:
+                    message.setdefault("game_id", game_id)
+            except msgspec.MsgspecError as e:
+                await send({"tick": None, "error": f"Malformed payload: {str(e)}"})
+                continue
+            await in_flight.acquire()
+            task = asyncio.create_task(decide_tick(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except WebSocketDisconnect:
+        logger.info(f'Game session for {endpoint} closed.')
+    finally:
+        for task in tasks:
+            task.cancel()
+
+@app.get("/stats")
+async def get_stats():
+    return {"agent_cache": agent_cache.stats(), "decision_cache": decision_cache.stats(), "canonical_cache": canonical_stats.stats(), "single_flight": single_flight.stats(), "fast_path": fast_path_stats.stats(), "deadline": deadline_stats.stats(), "deployments": executor.stats(), "opponent_model": opponent_model.stats(), "sessions": session_store.stats(), "plans": plan_stats.stats(), "prompts": prompt_stats.stats(), "prompt_cache": prompt_cache_stats.stats(), "logging": logging_stats.stats(), "mock_llm": {name: backend.stats() for name, backend in MOCK_BACKENDS.items()}, "startup": startup_stats}
+
+@app.get("/metrics")
+async def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+
+def serve_production():
+    """
+    Production launch: SERVER_WORKERS worker processes (WEB_CONCURRENCY), uvloop and httptools when installed, no reloader.
+    Each worker keeps its own caches and sessions, the metrics of all workers are merged through PROMETHEUS_MULTIPROC_DIR.
+    """
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    # Inherited by the workers, so their ready time counts from the launch and not from their own import
+    os.environ["SERVER_STARTED_AT"] = str(time.time())
+    if SERVER_WORKERS > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="bomberman-metrics-")
+    logger.info(f"Starting {SERVER_WORKERS} workers on {SERVER_HOST}:{SERVER_PORT} with {loop} and {http}")
+    uvicorn.run("main:app", host=SERVER_HOST, port=SERVER_PORT, workers=SERVER_WORKERS, loop=loop, http=http, reload=False, proxy_headers=True, log_level="warning")
 
 
 if __name__ == "__main__":
-   uvicorn.run("main:app", host="0.0.0.0", port=6000, reload=True, proxy_headers=True)
+    if "--production" in sys.argv or os.environ.get("APP_ENV", "").lower() == "production":
+        serve_production()
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=6000, reload=True, proxy_headers=True)
@@ -0,0 +1,89 @@
+import os
+import time
+import functools
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+DECISION_LATENCY = Histogram(
+    "bomberman_decision_latency_seconds",
+    "End-to-end latency of a tick decision, per endpoint and source of the decision (llm, cache, plan, fast_path, fallback, error).",
+    ["endpoint", "source"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_LATENCY = Histogram(
+    "bomberman_llm_latency_seconds",
+    "Latency of a single agent run on a deployment.",
+    ["agent", "deployment"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_RETRIES = Histogram(
+    "bomberman_llm_retries",
+    "Retries needed by an agent run, across deployments.",
+    ["agent"],
+    buckets=(0, 1, 2, 3, 4, 5),
+)
+FALLBACKS = Counter(
+    "bomberman_fallbacks_total",
+    "Ticks answered with the local fallback because the deadline ran out.",
+    ["endpoint"],
+)
+CACHE_LOOKUPS = Counter(
+    "bomberman_cache_lookups_total",
+    "Lookups of the agent and decision caches.",
+    ["cache", "result"],
+)
+INPUT_TOKENS = Counter(
+    "bomberman_input_tokens_total",
+    "Input tokens sent, per deployment.",
+    ["deployment"],
+)
+CACHED_INPUT_TOKENS = Counter(
+    "bomberman_cached_input_tokens_total",
+    "Input tokens served from the prompt cache of the provider, per deployment.",
+    ["deployment"],
+)
+OUTPUT_TOKENS = Counter(
+    "bomberman_output_tokens_total",
+    "Output tokens received, per deployment.",
+    ["deployment"],
+)
+PLAN_TICKS = Counter(
+    "bomberman_plan_ticks_total",
+    "Ticks of game sessions in plan mode, by outcome: served from the plan, decided by the LLM, answered from the decision cache, or decided locally.",
+    ["endpoint", "outcome"],
+)
+PLAN_INVALIDATIONS = Counter(
+    "bomberman_plan_invalidations_total",
+    "Plans dropped before they were used up, by reason.",
+    ["endpoint", "reason"],
+)
+
+def observe_decision(endpoint):
+    """
+    Records the end-to-end latency of a decider in DECISION_LATENCY, labelled with the source of its answer.
+    """
+    def decorator(decide):
+        @functools.wraps(decide)
+        async def observed(data, budget):
+            started = time.monotonic()
+            source = "error"
+            try:
+                final_answer = await decide(data, budget)
+                source = final_answer.get("source", "llm") if isinstance(final_answer, dict) else "llm"
+                return final_answer
+            finally:
+                DECISION_LATENCY.labels(endpoint, source).observe(time.monotonic() - started)
+        return observed
+    return decorator
+
+def render_metrics():
+    """
+    Returns:
+        Tuple of (body, content type) of the Prometheus text exposition, merged across workers in multi-worker mode
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
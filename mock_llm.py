@@ -0,0 +1,148 @@
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+import httpx
+from agent_settings import MOCK_LATENCY_MS, MOCK_LATENCY_SIGMA, MOCK_CACHE_SPEEDUP, MOCK_THROTTLE_RATE, MOCK_SERVER_ERROR_RATE
+from agent_settings import MOCK_TIMEOUT_RATE, MOCK_TIMEOUT_SECONDS, MOCK_FAULT_DEPLOYMENTS, MOCK_SEED
+
+logger = logging.getLogger(__name__)
+
+# The provider caches prompt prefixes of at least 1024 tokens, in steps of 128 tokens.
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_STEP_TOKENS = 128
+PROMPT_CACHE_SIZE = 1024
+
+def count_tokens(text):
+    return max(len(text) // 4, 1)
+
+def sample_from_schema(schema, defs, rng):
+    """
+    Builds a random value valid against a JSON schema, as produced for the strict output types of the agents
+    (objects, enums from Literal, strings, numbers, arrays, anyOf and $ref to $defs).
+    """
+    if "$ref" in schema:
+        return sample_from_schema(defs[schema["$ref"].rsplit("/", 1)[-1]], defs, rng)
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "const" in schema:
+        return schema["const"]
+    if "anyOf" in schema:
+        return sample_from_schema(rng.choice(schema["anyOf"]), defs, rng)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = rng.choice(kind)
+    if kind == "object":
+        return {name: sample_from_schema(prop, defs, rng) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [sample_from_schema(schema.get("items", {}), defs, rng) for _ in range(rng.randint(0, 2))]
+    if kind == "integer":
+        return rng.randint(0, 10)
+    if kind == "number":
+        return round(rng.uniform(0, 10), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "null":
+        return None
+    return rng.choice(["Mock decision, the move keeps the agent safe.", "Mock decision, heading for the nearest objective."])
+
+class MockLLM():
+    """
+    OpenAI compatible chat completions served in process through an httpx transport, for one client.
+    Answers are random but valid against the response_format schema of the request. Latency is log-normal around
+    MOCK_LATENCY_MS, shortened when the system prompt hits the simulated prompt cache, and 429s, 5xx and timeouts are
+    injected at the configured rates on the deployments listed in MOCK_FAULT_DEPLOYMENTS (all when empty).
+    """
+    def __init__(self, client, deployments=None, seed=MOCK_SEED):
+        """
+        Args:
+            client: Name of the client served
+            deployments: Name of the deployment (see llm.DEPLOYMENT_ROUTES) behind each model of the client, e.g. the dev
+                client serves both dev and dev_reasoning. Requests for other models count as the client itself.
+        """
+        self.client = client
+        self.deployments = deployments or {}
+        self.rng = random.Random(f"{seed}-{client}" if seed is not None else None)
+        self.prefixes = OrderedDict()
+        self.requests = 0
+        self.injected = {"throttled": 0, "server_error": 0, "timeout": 0}
+
+    def faults(self, model):
+        """
+        Whether faults are injected in the requests for the model, matched on the name of its deployment.
+        """
+        return not MOCK_FAULT_DEPLOYMENTS or self.deployments.get(model, self.client) in MOCK_FAULT_DEPLOYMENTS
+
+    def transport(self):
+        return httpx.MockTransport(self.handle)
+
+    def cached_tokens(self, messages, prompt_tokens):
+        """
+        Simulated prefix cache: the system message is cached after its first request, the rest of the prompt is not.
+        """
+        system = "".join(str(m.get("content", "")) for m in messages if m.get("role") in ("system", "developer"))
+        key = hashlib.sha256(system.encode("utf-8")).hexdigest()
+        hit = key in self.prefixes
+        self.prefixes[key] = True
+        self.prefixes.move_to_end(key)
+        if len(self.prefixes) > PROMPT_CACHE_SIZE:
+            self.prefixes.popitem(last=False)
+        prefix_tokens = min(count_tokens(system), prompt_tokens)
+        if not hit or prefix_tokens < PROMPT_CACHE_MIN_TOKENS:
+            return 0
+        return prefix_tokens // PROMPT_CACHE_STEP_TOKENS * PROMPT_CACHE_STEP_TOKENS
+
+    async def handle(self, request):
+        self.requests += 1
+        body = json.loads(request.content or b"{}")
+        messages = body.get("messages", [])
+        prompt_tokens = sum(count_tokens(str(m.get("content", ""))) for m in messages)
+        cached_tokens = self.cached_tokens(messages, prompt_tokens)
+
+        latency = MOCK_LATENCY_MS / 1000 * self.rng.lognormvariate(0, MOCK_LATENCY_SIGMA)
+        latency *= 1 - MOCK_CACHE_SPEEDUP * cached_tokens / prompt_tokens if prompt_tokens else 1
+
+        if self.faults(body.get("model")):
+            draw = self.rng.random()
+            if draw < MOCK_TIMEOUT_RATE:
+                self.injected["timeout"] += 1
+                await asyncio.sleep(MOCK_TIMEOUT_SECONDS)
+                raise httpx.ReadTimeout("Mock LLM timed out", request=request)
+            draw -= MOCK_TIMEOUT_RATE
+            if draw < MOCK_THROTTLE_RATE:
+                self.injected["throttled"] += 1
+                return httpx.Response(429, headers={"retry-after": "1"}, json={"error": {"code": "429", "message": "Mock rate limit exceeded"}})
+            draw -= MOCK_THROTTLE_RATE
+            if draw < MOCK_SERVER_ERROR_RATE:
+                self.injected["server_error"] += 1
+                await asyncio.sleep(latency / 2)
+                return httpx.Response(self.rng.choice([500, 502, 503]), json={"error": {"code": "500", "message": "Mock server error"}})
+
+        await asyncio.sleep(latency)
+        schema = (body.get("response_format") or {}).get("json_schema", {}).get("schema")
+        if schema:
+            content = json.dumps(sample_from_schema(schema, schema.get("$defs", {}), self.rng))
+        else:
+            content = "Mock answer."
+        completion_tokens = count_tokens(content)
+        return httpx.Response(200, json={
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", self.client),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens},
+            },
+        })
+
+    def stats(self):
+        deployments = sorted(set(self.deployments.values())) or [self.client]
+        return {"requests": self.requests, "injected": dict(self.injected), "fault_deployments": [d for d in deployments if not MOCK_FAULT_DEPLOYMENTS or d in MOCK_FAULT_DEPLOYMENTS]}
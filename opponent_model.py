@@ -0,0 +1,194 @@
+import numpy as np
+from collections import OrderedDict
+from agent_settings import PREDICTOR_CONFIDENCE_THRESHOLD, PREDICTOR_MAX_OPPONENTS
+
+ACTIONS = ["UP", "RIGHT", "DOWN", "LEFT", "WAIT", "BOMB"]
+ACTION_INDEX = {action: idx for idx, action in enumerate(ACTIONS)}
+MOVES = {(0, -1): "UP", (1, 0): "RIGHT", (0, 1): "DOWN", (-1, 0): "LEFT", (0, 0): "WAIT"}
+# No previous move known, used as the row of the transition counts before a second position is seen
+START = len(ACTIONS)
+
+# Multipliers applied on top of the Markov probabilities by the intent indicators of the opponent
+ESCAPE_WEIGHT = 6.0
+COIN_WEIGHT = 2.5
+CRATE_WEIGHT = 1.5
+ATTACK_WEIGHT = 1.5
+GLOBAL_PRIOR_WEIGHT = 0.5  # weight of the transitions shared across all opponents
+SMOOTHING = 1.0
+
+def position_moves(positions):
+    """
+    Actions between consecutive positions, e.g. [[5, 8], [5, 7]] -> ["UP"]. Jumps that are not a single step are skipped.
+    """
+    moves = []
+    for previous, current in zip(positions, positions[1:]):
+        try:
+            delta = (int(current[0]) - int(previous[0]), int(current[1]) - int(previous[1]))
+        except (TypeError, ValueError, IndexError):
+            continue
+        if delta in MOVES:
+            moves.append(MOVES[delta])
+    return moves
+
+def opponent_key(name, game_id=None):
+    """
+    Key of the state of an opponent: its name within its game, so two games with a player of the same name
+    do not share transitions, or the name alone when the client sends no game_id.
+    """
+    return name if game_id is None else (game_id, name)
+
+class OpponentModel():
+    """
+    Online Markov model of the moves of each opponent, learnt from last_3_actions across requests and
+    combined with rule features (valid moves, danger, coin/crate direction) to predict the next move with a confidence.
+    Opponents are tracked per game (see opponent_key), the transitions of all of them form the shared prior.
+    """
+    def __init__(self, max_opponents=PREDICTOR_MAX_OPPONENTS):
+        self.max_opponents = max_opponents
+        self.transitions = OrderedDict()
+        self.global_transitions = np.zeros((START + 1, len(ACTIONS)))
+        self.last_predictions = {}
+        self.last_observed = {}
+        self.hits = {"local": 0, "llm": 0}
+        self.scored = {"local": 0, "llm": 0}
+        self.local_predictions = 0
+        self.llm_predictions = 0
+
+    def opponent_transitions(self, key):
+        counts = self.transitions.get(key)
+        if counts is None:
+            counts = np.zeros((START + 1, len(ACTIONS)))
+            self.transitions[key] = counts
+            if len(self.transitions) > self.max_opponents:
+                evicted, _ = self.transitions.popitem(last=False)
+                self.last_predictions.pop(evicted, None)
+                self.last_observed.pop(evicted, None)
+        else:
+            self.transitions.move_to_end(key)
+        return counts
+
+    def observe(self, opponent_data, step=None, game_id=None):
+        """
+        Learns the latest move of the opponent, and scores the prediction made for it on the previous request.
+        A tick resent or duplicated by the client shows the same positions at the same step and is only learnt once.
+        Without a step, an opponent standing still for the whole window is only counted once until it moves.
+
+        Args:
+            step: Tick of the game the positions were observed at, when the client sends it
+            game_id: Game the opponent plays in, when the client sends it
+        """
+        key = opponent_key(opponent_data.get("name", "Unknown"), game_id)
+        positions = opponent_data.get("last_3_actions") or []
+        moves = position_moves(positions)
+        if not moves:
+            return
+        observed = (step, str(positions))
+        if self.last_observed.get(key) == observed:
+            return
+        counts = self.opponent_transitions(key)
+        self.last_observed[key] = observed
+        previous = ACTION_INDEX[moves[-2]] if len(moves) > 1 else START
+        latest = ACTION_INDEX[moves[-1]]
+        counts[previous, latest] += 1
+        self.global_transitions[previous, latest] += 1
+
+        last_prediction = self.last_predictions.pop(key, None)
+        if last_prediction:
+            action, source = last_prediction
+            self.scored[source] += 1
+            # A bomb is planted without moving, so it shows up as WAIT in the positions
+            if action == moves[-1] or (action == "BOMB" and moves[-1] == "WAIT"):
+                self.hits[source] += 1
+
+    def predict(self, opponent_data, game_id=None):
+        """
+        Returns:
+            Tuple of (action, confidence, probabilities dict) for the next move of the opponent
+        """
+        moves = position_moves(opponent_data.get("last_3_actions") or [])
+        previous = ACTION_INDEX[moves[-1]] if moves else START
+
+        counts = self.transitions.get(opponent_key(opponent_data.get("name", "Unknown"), game_id))
+        row = self.global_transitions[previous] * GLOBAL_PRIOR_WEIGHT + SMOOTHING
+        if counts is not None:
+            row = row + counts[previous]
+        probabilities = row / row.sum()
+
+        weights = np.ones(len(ACTIONS))
+        escape_routes = opponent_data.get("escape_routes") or []
+        if opponent_data.get("in_danger") and escape_routes:
+            weights[[ACTION_INDEX[a] for a in escape_routes if a in ACTION_INDEX]] *= ESCAPE_WEIGHT
+        coin_direction = opponent_data.get("nearest_coin_direction")
+        if coin_direction in ACTION_INDEX:
+            weights[ACTION_INDEX[coin_direction]] *= COIN_WEIGHT
+        crate_direction = opponent_data.get("nearest_crate_direction")
+        if crate_direction in ACTION_INDEX:
+            weights[ACTION_INDEX[crate_direction]] *= CRATE_WEIGHT
+        if opponent_data.get("can_bomb_us") and opponent_data.get("bombs_available", 0):
+            weights[ACTION_INDEX["BOMB"]] *= ATTACK_WEIGHT
+
+        valid_moves = [a for a in opponent_data.get("valid_moves") or [] if a in ACTION_INDEX]
+        if valid_moves:
+            mask = np.zeros(len(ACTIONS))
+            mask[[ACTION_INDEX[a] for a in valid_moves]] = 1
+            weights *= mask
+
+        scores = probabilities * weights
+        if scores.sum() == 0:
+            return "WAIT", 0.0, {}
+        scores = scores / scores.sum()
+        best = int(scores.argmax())
+        return ACTIONS[best], float(scores[best]), {ACTIONS[i]: round(float(p), 4) for i, p in enumerate(scores) if p > 0}
+
+    def record_prediction(self, name, action, source, game_id=None):
+        """
+        Remembers the prediction served for the opponent, to be scored against its next observed move.
+        """
+        self.last_predictions[opponent_key(name, game_id)] = (action, source)
+        if source == "local":
+            self.local_predictions += 1
+        else:
+            self.llm_predictions += 1
+
+    def stats(self):
+        return {
+            "opponents": len(self.transitions),
+            "confidence_threshold": PREDICTOR_CONFIDENCE_THRESHOLD,
+            "local_predictions": self.local_predictions,
+            "llm_predictions": self.llm_predictions,
+            "hit_rate": {
+                source: round(self.hits[source] / self.scored[source], 4) if self.scored[source] else None
+                for source in self.scored
+            },
+        }
+
+opponent_model = OpponentModel()
+
+def local_predictions(opponents, step=None, game_id=None):
+    """
+    Learns from the latest moves of the opponents, then predicts each one locally.
+
+    Args:
+        step: Tick of the game, to tell a new tick from a resent one (see OpponentModel.observe)
+        game_id: Game of the tick, the opponents are tracked per game when the client sends it
+
+    Returns:
+        Tuple of (dict of opponent name to confident predictions, list of opponents left for the LLM)
+    """
+    predictions = {}
+    uncertain = []
+    for opp in opponents:
+        opponent_model.observe(opp, step, game_id)
+        opp_name = opp.get("name", "Unknown")
+        action, confidence, probabilities = opponent_model.predict(opp, game_id)
+        if confidence >= PREDICTOR_CONFIDENCE_THRESHOLD:
+            predictions[opp_name] = {
+                "reasoning": f"Local model: {action} is the most likely move (probabilities {probabilities}) from recent moves and intent indicators.",
+                "action": action,
+                "confidence": round(confidence, 4),
+                "source": "local",
+            }
+            opponent_model.record_prediction(opp_name, action, "local", game_id)
+        else:
+            uncertain.append(opp)
+    return predictions, uncertain
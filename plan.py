@@ -0,0 +1,157 @@
+from collections import Counter, deque
+from typing import Literal
+from session_store import current_session
+from metrics import PLAN_TICKS, PLAN_INVALIDATIONS
+from agent_settings import PLAN_MODE, PLAN_MAX_STEPS
+
+PlanAction = Literal["UP", "RIGHT", "DOWN", "LEFT", "WAIT", "BOMB"]
+# Conditions an agent can attach to its plan, on top of "not in danger" and "the planned move is valid" that always apply.
+PlanCondition = Literal["coin_available", "crate_available", "follows_coin_action", "follows_crate_action"]
+
+PLAN_INSTRUCTIONS = f"""
+        Plan Mode:
+        - Besides the action for this tick, return "plan": the actions you intend to take on the next ticks, at most {PLAN_MAX_STEPS}, e.g. the rest of a straight walk to a coin. Return an empty plan when the next ticks cannot be foreseen.
+        - Return "plan_valid_while": the conditions the plan relies on, among "coin_available", "crate_available", "follows_coin_action" (every planned move is the coin action of its tick) and "follows_crate_action".
+        - The plan is dropped as soon as you are in danger, a planned move is not valid anymore or one of its conditions breaks, and you are asked again.
+        """
+
+ANSWER_FORMAT = """- Answer with a JSON object with two fields: "reasoning", a string, and "action", exactly one of the valid movements given in the input."""
+PLAN_ANSWER_FORMAT = """- Answer with a JSON object with four fields: "reasoning", a string, "action", exactly one of the valid movements given in the input, "plan" and "plan_valid_while", as described under Plan Mode."""
+
+def plan_instructions(instructions):
+    """
+    Instructions of an agent in plan mode: its answer format line asks for the plan fields too, and the plan mode section is added.
+    """
+    if ANSWER_FORMAT not in instructions:
+        raise ValueError("Instructions without the answer format line cannot be turned to plan mode")
+    return instructions.replace(ANSWER_FORMAT, PLAN_ANSWER_FORMAT) + PLAN_INSTRUCTIONS
+
+class Plan():
+    """
+    Actions an agent planned after its current one, served on the next ticks of the game while they stay valid.
+    """
+    def __init__(self, actions, conditions, reasoning):
+        self.actions = deque(actions[:PLAN_MAX_STEPS])
+        self.conditions = set(conditions)
+        self.reasoning = reasoning
+
+    @classmethod
+    def from_decision(cls, decision):
+        actions = decision.get("plan") if isinstance(decision, dict) else None
+        if not actions:
+            return None
+        return cls(list(actions), decision.get("plan_valid_while") or [], decision.get("reasoning", ""))
+
+    def check(self, features, last_action):
+        """
+        Returns:
+            None if the next planned action can be served for a tick with these features, else why the plan is dropped
+        """
+        check_bomb_radius = features["check_bomb_radius"]
+        if check_bomb_radius.get("in_danger") == "yes" or check_bomb_radius.get("ticks_to_explosion") is not None:
+            return "danger"
+        history = features["movement_history"]
+        if history and last_action and isinstance(history[-1], dict) and history[-1].get("action") != last_action:
+            return "deviation"
+        action = self.actions[0]
+        if action == "BOMB":
+            if features["plant_bomb_available"].get("plant") != "true":
+                return "invalid_action"
+        elif action != "WAIT" and action not in features["valid_movement"]:
+            return "invalid_action"
+        coins = features["coins_collection_policy"]
+        crate = features["nearest_crate"]
+        if "coin_available" in self.conditions and coins.get("coin_available") != "yes":
+            return "coin_available"
+        if "crate_available" in self.conditions and crate.get("crate_available") != "yes":
+            return "crate_available"
+        if "follows_coin_action" in self.conditions and coins.get("coin_action") != action:
+            return "follows_coin_action"
+        if "follows_crate_action" in self.conditions and crate.get("crate_action") != action:
+            return "follows_crate_action"
+        return None
+
+class PlanStats():
+    """
+    Counts, per endpoint, the ticks of game sessions in plan mode and how they were decided, and why plans were dropped.
+    """
+    def __init__(self):
+        self.ticks = Counter()
+        self.served = Counter()
+        self.llm_calls = Counter()
+        self.cached = Counter()
+        self.plans = Counter()
+        self.invalidations = Counter()
+
+    def record(self, endpoint, outcome):
+        self.ticks[endpoint] += 1
+        if outcome == "plan":
+            self.served[endpoint] += 1
+        elif outcome == "llm":
+            self.llm_calls[endpoint] += 1
+        elif outcome == "cache":
+            self.cached[endpoint] += 1
+        PLAN_TICKS.labels(endpoint, outcome).inc()
+
+    def record_invalidation(self, endpoint, reason):
+        self.invalidations[reason] += 1
+        PLAN_INVALIDATIONS.labels(endpoint, reason).inc()
+
+    def stats(self):
+        return {
+            endpoint: {
+                "ticks": ticks,
+                "served_from_plan": self.served[endpoint],
+                "llm_calls": self.llm_calls[endpoint],
+                "llm_calls_per_tick": round(self.llm_calls[endpoint] / ticks, 4),
+                "from_cache": self.cached[endpoint],
+                "plans": self.plans[endpoint],
+            }
+            for endpoint, ticks in self.ticks.items()
+        } | {"invalidations": dict(self.invalidations)}
+
+plan_stats = PlanStats()
+
+def plan_mode():
+    """
+    Whether the tick being decided should ask the agent for a plan: PLAN_MODE is on and the tick belongs to a game session.
+    """
+    return PLAN_MODE and current_session.get() is not None
+
+def serve_plan(endpoint, features):
+    """
+    Next action of the plan of the current game session, if it still holds for this tick.
+
+    Returns:
+        Response dict tagged with source "plan", else None and the agent has to decide (and replan)
+    """
+    session = current_session.get()
+    if not PLAN_MODE or session is None or session.plan is None:
+        return None
+    plan = session.plan
+    last_action = session.last_decision.get("action") if session.last_decision else None
+    reason = plan.check(features, last_action)
+    if reason:
+        session.plan = None
+        plan_stats.record_invalidation(endpoint, reason)
+        return None
+    action = plan.actions.popleft()
+    if not plan.actions:
+        session.plan = None
+    plan_stats.record(endpoint, "plan")
+    return {"reasoning": f"Following the plan: {plan.reasoning}", "action": action, "valid_movement": features["valid_movement"], "source": "plan", "plan": list(plan.actions)}
+
+def record_plan(endpoint, decision):
+    """
+    Keeps the plan of a decision made by the agent in the current game session, any other decision drops the plan.
+    """
+    session = current_session.get()
+    if not PLAN_MODE or session is None:
+        return
+    # Decisions answered from the decision cache carry the plan of the agent run they come from, but cost no LLM call
+    source = decision.get("source", "llm") if isinstance(decision, dict) else "error"
+    agent_decision = source in ("llm", "cache")
+    plan_stats.record(endpoint, source if agent_decision else "local")
+    session.plan = Plan.from_decision(decision) if agent_decision else None
+    if session.plan is not None:
+        plan_stats.plans[endpoint] += 1
@@ -0,0 +1,215 @@
+import logging
+import functools
+from collections import Counter
+from agent_settings import PROMPT_TOKEN_BUDGETS, PROMPT_MIN_OPPONENTS
+
+logger = logging.getLogger(__name__)
+
+# Text templates of every piece of the agent prompts.
+TEMPLATES = {
+    "roster": "Opponents in the game : {names}\n",
+    "status": "Valid Movement : {valid_movement}\nCurrent Status: {current_status}\n",
+    "crate": "Crate reason: {crate_reason}\nCrate action: {crate_action}\n",
+    "danger": "Are you in a bomb radius : {in_bomb_radius}\nIn Danger of bomb : {in_danger}\nEscape from Bomb : {escape_bomb_action}\n",
+    "safe_actions": "Safe actions (ticks of margin) : {safe_actions}\n",
+    "plant_bomb": "Plant Bomb Reason: {plant_bomb_reason}\n",
+    "coins": "Collect Coins Action : {coin_action}\nReason for coins : {coin_reason}\n",
+    "history_header": "Last 5 Moves :\n",
+    "history_move": "Action : {action}, Reason : {reasoning}\n",
+    "history_summary": "Earlier actions : {actions}\n",
+    "opponents_omitted": "({count} lower relevance opponents omitted)\n",
+    "rl_suggestion": "Q Learning Model actions : {rl_model_suggestion}",
+    "maverick": "Maverick Actions:{maverick_top_actions}\nMaverick Features:{maverick_features}\nMaverick Best Action: {maverick_best_action}",
+    "intel_header": "\n--- Opponent Intelligence ---\n",
+    "intel_opponent": "\nOpponent: {name}\n  Position: {position}, Distance: {distance}\n  Status: {status}, Bombs available: {bombs_available}\n  Score: {score} (Diff: {score_diff})\n",
+    "intel_threat": "  THREAT: This opponent can bomb you from their current position!\n",
+    "intel_vulnerable": "  Vulnerable: Trying to escape via {escape_routes}\n",
+    "intel_coin": "  Intent: Moving towards coin ({direction})\n",
+    "intel_crate": "  Intent: Moving towards crate ({direction})\n",
+    "predictions_header": "\n--- Opponent Predictions ---\n",
+    "prediction": "Opponent {name}:\n  Predicted Action: {action}\n  Reasoning: {reasoning}\n\n",
+}
+
+def render(template, **values):
+    return TEMPLATES[template].format(**values)
+
+@functools.lru_cache(maxsize=1)
+def token_encoding():
+    """
+    Loaded once, by the startup hook of the service, so that no request waits on the blocking load.
+    """
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken unavailable, estimating tokens from characters: {e}")
+        return None
+
+def estimate_tokens(text):
+    """
+    Local token count of a prompt, with tiktoken when available, else about 4 characters per token.
+    """
+    encoding = token_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def render_safe_actions(safe_actions):
+    return ", ".join(f"{item['action']} ({item['margin']})" for item in safe_actions)
+
+@functools.lru_cache(maxsize=4096)
+def render_history(moves, detailed):
+    """
+    Renders the movement history, the last `detailed` moves with their reasoning and the older ones as a list of actions.
+    Cached, as consecutive ticks of a game mostly share the same history.
+
+    Args:
+        moves: Tuple of (action, reasoning) pairs, oldest first
+    """
+    if not moves:
+        return ""
+    summarised = moves[:len(moves) - detailed] if detailed < len(moves) else ()
+    text = render("history_header")
+    if summarised:
+        text += render("history_summary", actions=", ".join(str(action) for action, _ in summarised))
+    for action, reasoning in moves[len(summarised):]:
+        text += render("history_move", action=action, reasoning=reasoning)
+    return text
+
+def opponent_relevance(opp):
+    """
+    How much an opponent matters for our next move: threats first, then vulnerable ones, then the closest.
+    """
+    distance = opp.get("distance_to_us")
+    distance = distance if isinstance(distance, (int, float)) else 99
+    return (2 if opp.get("can_bomb_us") else 0) + (1 if opp.get("in_danger") else 0) - distance / 100
+
+def render_opponent_intel(idx, opp):
+    text = render(
+        "intel_opponent",
+        name=opp.get("name", f"Opponent_{idx}"),
+        position=opp.get("position", "Unknown"),
+        distance=opp.get("distance_to_us", "Unknown"),
+        status="In danger" if opp.get("in_danger", False) else "Safe",
+        bombs_available=opp.get("bombs_available", 0),
+        score=opp.get("score", 0),
+        score_diff=opp.get("score_diff", 0),
+    )
+    if opp.get("can_bomb_us", False):
+        text += render("intel_threat")
+    if opp.get("in_danger", False) and opp.get("escape_routes", []):
+        text += render("intel_vulnerable", escape_routes=opp.get("escape_routes"))
+    if opp.get("nearest_coin_direction"):
+        text += render("intel_coin", direction=opp.get("nearest_coin_direction"))
+    if opp.get("nearest_crate_direction"):
+        text += render("intel_crate", direction=opp.get("nearest_crate_direction"))
+    return text
+
+class PromptStats():
+    def __init__(self):
+        self.requests = Counter()
+        self.tokens = Counter()
+        self.saved = Counter()
+        self.trimmed = Counter()
+
+    def record(self, endpoint, tokens, saved):
+        self.requests[endpoint] += 1
+        self.tokens[endpoint] += tokens
+        self.saved[endpoint] += saved
+        if saved:
+            self.trimmed[endpoint] += 1
+
+    def stats(self):
+        return {
+            endpoint: {
+                "budget": PROMPT_TOKEN_BUDGETS.get(endpoint),
+                "requests": requests,
+                "trimmed": self.trimmed[endpoint],
+                "avg_tokens": round(self.tokens[endpoint] / requests, 1),
+                "tokens_saved": self.saved[endpoint],
+            }
+            for endpoint, requests in self.requests.items()
+        }
+
+prompt_stats = PromptStats()
+
+class PromptBuilder():
+    """
+    Builds the user prompt of an agent from templates, laid out as: game-level context (the same on every tick of
+    a game, e.g. the opponent roster), movement history, current features, opponent blocks (most relevant first),
+    trailing suggestions. Static text belongs in the agent instructions and game-level context comes first in the
+    user prompt, so that the calls of a game share the longest prefix, which the provider can cache.
+    build() keeps the prompt under the token budget of the endpoint by first summarising the older moves of the history
+    to their actions, then dropping the least relevant opponents (keeping PROMPT_MIN_OPPONENTS), then the history reasoning.
+    """
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.budget = PROMPT_TOKEN_BUDGETS.get(endpoint)
+        self.game = []
+        self.moves = ()
+        self.sections = []
+        self.opponents_header = ""
+        self.opponents = []
+        self.trailer = []
+
+    def add(self, template, **values):
+        self.sections.append(render(template, **values))
+
+    def add_game(self, template, **values):
+        self.game.append(render(template, **values))
+
+    def set_roster(self, opponents):
+        """
+        Names of the opponents, sorted so that the roster only changes when an opponent joins or leaves the game.
+        """
+        names = sorted(str(opp.get("name", "Unknown")) for opp in opponents or [])
+        if names:
+            self.add_game("roster", names=", ".join(names))
+
+    def set_history(self, movement_history):
+        self.moves = tuple((m.get("action"), m.get("reasoning")) for m in movement_history or [])
+
+    def set_opponents(self, header):
+        self.opponents_header = header
+
+    def add_opponent(self, text, relevance=0):
+        self.opponents.append((relevance, len(self.opponents), text))
+
+    def append(self, template, **values):
+        self.trailer.append(render(template, **values))
+
+    def render_prompt(self, detailed_moves, kept_opponents):
+        current_input = "".join(self.sections)
+        if self.opponents:
+            ranked = sorted(self.opponents, key=lambda o: (-o[0], o[1]))
+            current_input += self.opponents_header + "".join(text for _, _, text in ranked[:kept_opponents])
+            if kept_opponents < len(ranked):
+                current_input += render("opponents_omitted", count=len(ranked) - kept_opponents)
+        if self.moves:
+            final_input = render_history(self.moves, detailed_moves) + "\n" + current_input
+        else:
+            final_input = current_input
+        return "".join(self.game) + final_input + "".join(self.trailer)
+
+    def build(self):
+        """
+        Returns:
+            Tuple of (prompt, estimated prompt tokens, tokens saved by trimming)
+        """
+        detailed_moves = len(self.moves)
+        kept_opponents = len(self.opponents)
+        prompt = self.render_prompt(detailed_moves, kept_opponents)
+        full_tokens = tokens = estimate_tokens(prompt)
+        while self.budget is not None and tokens > self.budget:
+            if detailed_moves > 1:
+                detailed_moves -= 1
+            elif kept_opponents > PROMPT_MIN_OPPONENTS:
+                kept_opponents -= 1
+            elif detailed_moves > 0:
+                detailed_moves = 0
+            else:
+                break
+            prompt = self.render_prompt(detailed_moves, kept_opponents)
+            tokens = estimate_tokens(prompt)
+        prompt_stats.record(self.endpoint, tokens, full_tokens - tokens)
+        return prompt, tokens, full_tokens - tokens
@@ -0,0 +1,340 @@
+import logging
+import time
+import random
+import asyncio
+import openai
+from collections import deque
+from agents import OpenAIChatCompletionsModel, Runner
+from agent_cache import AgentCache
+from admission import AdmissionController
+from agent_settings import MAX_RETRIES, BASE_BACKOFF, MAX_SLEEP, RETRYABLE_EXCEPTIONS, ADMISSION_EXPECTED_OUTPUT_TOKENS
+from agent_settings import HEDGING_ENABLED, HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY_SECONDS, LATENCY_WINDOW
+from agent_settings import BREAKER_WINDOW, BREAKER_MIN_REQUESTS, BREAKER_ERROR_RATE, BREAKER_THROTTLE_TRIP, BREAKER_COOLDOWN_SECONDS
+from deadline import DeadlineExceeded, remaining_time
+from llm import DEPLOYMENT_ROUTES
+from tool_logger import ToolLogger
+from metrics import LLM_RETRIES
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+def is_throttled(error):
+    return isinstance(error, openai.RateLimitError) or getattr(error, "status_code", None) == 429
+
+def retry_after_seconds(error):
+    """
+    Retry-After hint of a throttled response, if the service sent one.
+    """
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def estimate_tokens(*texts):
+    """
+    Rough prompt token count, about 4 characters per token.
+    """
+    return sum(len(text) for text in texts) // 4
+
+def reserved_tokens(specialist, input):
+    """
+    Tokens reserved for a call at admission: the prompt estimate plus the expected output.
+    """
+    return estimate_tokens(specialist.agent.instructions, input) + ADMISSION_EXPECTED_OUTPUT_TOKENS
+
+def backoff_delay(attempt, error=None):
+    """
+    Exponential backoff with full jitter, capped at MAX_SLEEP. A Retry-After hint is used as the floor.
+    """
+    cap = min(MAX_SLEEP, BASE_BACKOFF * 2 ** (attempt - 1))
+    delay = random.uniform(0, cap)
+    retry_after = retry_after_seconds(error) if error is not None else None
+    if retry_after:
+        delay = max(delay, retry_after)
+    return min(delay, MAX_SLEEP)
+
+class CircuitBreaker():
+    """
+    Tracks the outcome of the recent calls to one deployment.
+    Opens when the error rate over the window, or the run of consecutive 429s, passes its threshold,
+    then lets a single probe through once the cooldown is over.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self.consecutive_throttles = 0
+        self.opened_at = 0.0
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+        self.probe_in_flight = False
+        self.probe_started_at = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.throttles = 0
+        self.trips = 0
+
+    def allow(self):
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        # A probe that never reported back (e.g. cancelled by the tick deadline) does not block the next one
+        if self.state == HALF_OPEN and (not self.probe_in_flight or time.monotonic() - self.probe_started_at >= self.cooldown):
+            self.probe_in_flight = True
+            self.probe_started_at = time.monotonic()
+            return True
+        return False
+
+    def record_success(self):
+        self.successes += 1
+        self.outcomes.append(False)
+        self.consecutive_throttles = 0
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.outcomes.clear()
+            self.probe_in_flight = False
+
+    def record_failure(self, error):
+        self.failures += 1
+        self.outcomes.append(True)
+        if is_throttled(error):
+            self.throttles += 1
+            self.consecutive_throttles += 1
+        else:
+            self.consecutive_throttles = 0
+        error_rate = sum(self.outcomes) / len(self.outcomes)
+        if (
+            self.state == HALF_OPEN
+            or self.consecutive_throttles >= BREAKER_THROTTLE_TRIP
+            or (len(self.outcomes) >= BREAKER_MIN_REQUESTS and error_rate >= BREAKER_ERROR_RATE)
+        ):
+            self.trip(retry_after_seconds(error))
+
+    def trip(self, retry_after=None):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.cooldown = max(BREAKER_COOLDOWN_SECONDS, min(retry_after or 0, MAX_SLEEP))
+        self.probe_in_flight = False
+        self.trips += 1
+        logger.warning(f"Circuit breaker opened for deployment {self.name}, cooling down for {self.cooldown:.1f}s", extra={"deployment": self.name})
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "throttles": self.throttles,
+            "trips": self.trips,
+            "recent_error_rate": round(sum(self.outcomes) / len(self.outcomes), 4) if self.outcomes else 0.0,
+        }
+
+class LatencyTracker():
+    """
+    Sliding window of the latencies of the recent successful calls to one deployment.
+    """
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class HedgeStats():
+    """
+    Counts the hedged calls and the tokens spent on the calls that lost the race: the usage they reported when they
+    finished, or an estimate (prompt estimate plus the reserved output tokens) for the ones cancelled before answering.
+    """
+    def __init__(self):
+        self.fired = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.extra_tokens = 0
+        self.extra_tokens_estimate = 0
+
+    def record_loser(self, task, reserved_tokens):
+        if not task.done():
+            # Cancelled by the caller once the other call won, its usage never comes back
+            self.extra_tokens_estimate += reserved_tokens
+        elif not task.cancelled() and task.exception() is None:
+            self.extra_tokens += task.result().context_wrapper.usage.total_tokens
+
+    def stats(self):
+        return {
+            "enabled": HEDGING_ENABLED,
+            "fired": self.fired,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "extra_tokens": self.extra_tokens,
+            "extra_tokens_estimate": self.extra_tokens_estimate,
+        }
+
+class ResilientExecutor():
+    """
+    Runs agents against the deployments of their route (see llm.DEPLOYMENT_ROUTES), failing over to the next
+    compatible deployment while the circuit breaker of the preferred one is open.
+    """
+    def __init__(self, routes=DEPLOYMENT_ROUTES):
+        self.routes = routes
+        self.breakers = {deployment.name: CircuitBreaker(deployment.name) for route in routes.values() for deployment in route}
+        self.admission = {deployment.name: AdmissionController(deployment.name) for route in routes.values() for deployment in route}
+        self.latencies = {deployment.name: LatencyTracker() for route in routes.values() for deployment in route}
+        self.failover_agents = AgentCache(name="failover_agent")
+        self.failovers = 0
+        self.hedges = HedgeStats()
+
+    def pick_deployment(self, route, tried):
+        """
+        First deployment of the route whose breaker lets the call through, preferring ones not tried yet this tick.
+        Falls back to the primary deployment when every breaker is open.
+        """
+        deployments = self.routes[route]
+        for deployment in sorted(deployments, key=lambda d: d.name in tried):
+            if self.breakers[deployment.name].allow():
+                return deployment
+        return deployments[0]
+
+    def agent_for(self, specialist, deployment):
+        if deployment is self.routes[specialist.route][0]:
+            return specialist.agent
+        return self.failover_agents.get_or_build(
+            specialist.cache_key + (deployment.name,),
+            lambda: specialist.agent.clone(model=OpenAIChatCompletionsModel(model=deployment.model, openai_client=deployment.client)),
+        )
+
+    async def call(self, specialist, deployment, input):
+        """
+        Single call to one deployment, feeding its circuit breaker and latency window.
+        """
+        breaker = self.breakers[deployment.name]
+        admission = self.admission[deployment.name]
+        reserved = reserved_tokens(specialist, input)
+        await admission.acquire(reserved)
+        used_tokens = None
+        started = time.monotonic()
+        try:
+            result = await Runner.run(self.agent_for(specialist, deployment), input=input, max_turns=5, hooks=ToolLogger(deployment.name))
+            used_tokens = result.context_wrapper.usage.total_tokens
+        except RETRYABLE_EXCEPTIONS as e:
+            breaker.record_failure(e)
+            if is_throttled(e):
+                admission.on_throttle(retry_after_seconds(e))
+            raise
+        finally:
+            admission.release(used_tokens, reserved)
+        latency = time.monotonic() - started
+        breaker.record_success()
+        admission.on_success(latency)
+        self.latencies[deployment.name].record(latency)
+        return result
+
+    def hedge_deployment(self, route, deployment):
+        for candidate in self.routes[route]:
+            if candidate is not deployment and self.breakers[candidate.name].state == CLOSED:
+                return candidate
+        return None
+
+    async def call_hedged(self, specialist, deployment, input):
+        """
+        Calls the deployment, and if it has not answered by the HEDGE_PERCENTILE of its recent latency,
+        sends the same request to another deployment of the route. The first successful answer wins and the other call is cancelled.
+        """
+        hedge_deployment = self.hedge_deployment(specialist.route, deployment)
+        latencies = self.latencies[deployment.name]
+        if not HEDGING_ENABLED or hedge_deployment is None or len(latencies.samples) < HEDGE_MIN_SAMPLES:
+            return await self.call(specialist, deployment, input)
+
+        hedge_delay = max(latencies.percentile(HEDGE_PERCENTILE), HEDGE_MIN_DELAY_SECONDS)
+        primary = asyncio.ensure_future(self.call(specialist, deployment, input))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+            self.hedges.fired += 1
+            logger.info(f"{specialist.name} slower than {hedge_delay:.2f}s on {deployment.name}, hedging to {hedge_deployment.name}", extra={"agent": specialist.name, "deployment": deployment.name})
+            hedge = asyncio.ensure_future(self.call(specialist, hedge_deployment, input))
+            tasks.append(hedge)
+            pending = set(tasks)
+            winner = None
+            first_error = None
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = winner or task
+                    else:
+                        first_error = first_error or task.exception()
+            if winner is None:
+                raise first_error
+            if winner is hedge:
+                self.hedges.hedge_wins += 1
+            else:
+                self.hedges.primary_wins += 1
+            self.hedges.record_loser(primary if winner is hedge else hedge, reserved_tokens(specialist, input))
+            return winner.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def run(self, specialist, input):
+        """
+        Runs the specialist agent with retries, failover, optional hedging and jittered exponential backoff.
+
+        Returns:
+            RunResult of the successful attempt
+        """
+        tried = set()
+        for attempt in range(1, MAX_RETRIES + 1):
+            deployment = self.pick_deployment(specialist.route, tried)
+            if tried and deployment.name not in tried:
+                self.failovers += 1
+                logger.warning(f"{specialist.name} moving to deployment {deployment.name}", extra={"agent": specialist.name, "deployment": deployment.name})
+            tried.add(deployment.name)
+            try:
+                result = await self.call_hedged(specialist, deployment, input)
+                LLM_RETRIES.labels(specialist.kind).observe(attempt - 1)
+                return result
+            except RETRYABLE_EXCEPTIONS as e:
+                logger.warning(f"Transient error on {deployment.name}: {e}", extra={"agent": specialist.name, "deployment": deployment.name, "attempt": attempt}, exc_info=True)
+                if attempt >= MAX_RETRIES:
+                    LLM_RETRIES.labels(specialist.kind).observe(attempt - 1)
+                    raise
+                # Another deployment is ready to take the call straight away, no need to wait
+                if any(d.name not in tried and self.breakers[d.name].state == CLOSED for d in self.routes[specialist.route]):
+                    continue
+                delay = backoff_delay(attempt, e)
+                remaining = remaining_time()
+                if remaining is not None and remaining <= delay:
+                    raise DeadlineExceeded(f"{remaining:.2f}s left, not enough to retry {specialist.name}") from e
+                await asyncio.sleep(delay)
+            except DeadlineExceeded as e:
+                # Shed by admission control, or out of time to retry: the tick falls back, nothing is broken
+                logger.warning(f"{specialist.name} shed on {deployment.name}: {e}", extra={"agent": specialist.name, "deployment": deployment.name, "attempt": attempt})
+                raise
+            except Exception as e:
+                logger.error(f"Fatal error in {specialist.name}: {e}", extra={"agent": specialist.name, "deployment": deployment.name}, exc_info=True)
+                raise
+
+    def stats(self):
+        return {
+            "failovers": self.failovers,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+            "latency_p50": {name: latencies.percentile(0.5) for name, latencies in self.latencies.items()},
+            "latency_p90": {name: latencies.percentile(0.9) for name, latencies in self.latencies.items()},
+            "hedging": self.hedges.stats(),
+            "admission": {name: admission.stats() for name, admission in self.admission.items()},
+        }
+
+executor = ResilientExecutor()
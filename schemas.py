@@ -0,0 +1,242 @@
+import msgspec
+from typing import Any, ClassVar, List, Literal, Optional, Union
+from starlette.responses import JSONResponse
+
+Number = Union[int, float]
+# Yes/no flags, sent by the game as "yes"/"no", true/false or 0/1, and normalised to the values the agents compare against
+Flag = Union[bool, int, str]
+YES_NO = ("yes", "no")
+TRUE_FALSE = ("true", "false")
+BOOL = (True, False)
+TRUE_VALUES = {"yes", "true", "1"}
+FALSE_VALUES = {"no", "false", "0"}
+
+def flag_value(value):
+    """
+    Truth value of a flag sent as a bool, 0/1, or a yes/no, true/false or 1/0 string.
+    Raises ValueError on anything else.
+    """
+    if isinstance(value, str):
+        lowered = value.strip().lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+    elif value in (0, 1):
+        return bool(value)
+    raise ValueError(f"Invalid flag {value!r}, expected yes/no, true/false or 0/1")
+
+class Feature(msgspec.Struct, omit_defaults=True, forbid_unknown_fields=True):
+    """
+    Base of the feature dicts. Fields left out of the payload stay out of the decoded dict.
+    Unknown fields fail the typed decoding, decode_tick then validates the known fields only and keeps the others as sent.
+    """
+
+class FlaggedFeature(Feature):
+    """
+    Feature whose flags are normalised to the (true, false) values given in its flags, e.g. "yes"/"no" for
+    in_danger, whichever form the game sent them in.
+    """
+    flags: ClassVar[dict] = {}
+
+    def __post_init__(self):
+        for field, (true, false) in self.flags.items():
+            value = getattr(self, field)
+            if value is not None:
+                setattr(self, field, true if flag_value(value) else false)
+
+class NearestCrate(FlaggedFeature):
+    flags: ClassVar[dict] = {"crate_available": YES_NO}
+    crate_available: Optional[Flag] = None
+    crate_action: Optional[str] = None
+    crate_pos: Optional[List[Number]] = None
+    crate_distance: Optional[float] = None
+    crate_reason: Optional[str] = None
+
+# Actions of our agent, as the danger map ranks them
+Action = Literal["UP", "RIGHT", "DOWN", "LEFT", "WAIT", "BOMB"]
+
+class SafeAction(msgspec.Struct):
+    action: Action
+    margin: int
+
+class CheckBombRadius(FlaggedFeature):
+    flags: ClassVar[dict] = {"in_bomb_radius": YES_NO, "in_danger": YES_NO}
+    in_bomb_radius: Optional[Flag] = None
+    in_danger: Optional[Flag] = None
+    escape_bomb_action: Optional[str] = None
+    # Danger map fields, see grid_engine.DangerMap. Replaced by the server-side ones when the tick has a game_state.
+    ticks_to_explosion: Optional[int] = None
+    safe_actions: Optional[List[SafeAction]] = None
+    danger_horizon: Optional[int] = None
+
+class PlantBombAvailable(FlaggedFeature):
+    flags: ClassVar[dict] = {"plant": TRUE_FALSE}
+    plant: Optional[Flag] = None
+    reason: Optional[str] = None
+    current_status: Optional[str] = None
+    plant_bomb_reason: Optional[str] = None
+
+class CoinsCollectionPolicy(FlaggedFeature):
+    flags: ClassVar[dict] = {"coin_available": YES_NO}
+    coin_available: Optional[Flag] = None
+    coin_action: Optional[str] = None
+    coin_reason: Optional[str] = None
+
+class Move(Feature):
+    action: Optional[str] = None
+    reasoning: Optional[str] = None
+
+class Opponent(FlaggedFeature):
+    flags: ClassVar[dict] = {"in_danger": BOOL, "can_bomb_us": BOOL}
+    name: Optional[str] = None
+    position: Optional[List[Number]] = None
+    distance_to_us: Optional[float] = None
+    in_danger: Optional[Flag] = None
+    escape_routes: Optional[List[str]] = None
+    # A count, or a bool when the game only knows whether there is any
+    bombs_available: Union[float, bool, None] = None
+    score: Optional[float] = None
+    score_diff: Optional[float] = None
+    valid_moves: Optional[List[str]] = None
+    last_3_actions: Optional[List[List[Number]]] = None
+    nearest_coin_direction: Optional[str] = None
+    nearest_crate_direction: Optional[str] = None
+    can_bomb_us: Optional[Flag] = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        if isinstance(self.bombs_available, bool):
+            self.bombs_available = float(self.bombs_available)
+
+# Feature fields that may also arrive as a JSON encoded string, with the type they are validated against.
+STRING_ENCODED_FIELDS = {
+    "valid_movement": List[str],
+    "nearest_crate": NearestCrate,
+    "check_bomb_radius": CheckBombRadius,
+    "plant_bomb_available": PlantBombAvailable,
+    "coins_collection_policy": CoinsCollectionPolicy,
+    "movement_history": List[Move],
+    "opponents": List[Opponent],
+}
+
+# Struct of the feature dicts, or of the items of the feature lists, of the tick payload.
+FEATURE_STRUCTS = {
+    "nearest_crate": NearestCrate,
+    "check_bomb_radius": CheckBombRadius,
+    "plant_bomb_available": PlantBombAvailable,
+    "coins_collection_policy": CoinsCollectionPolicy,
+    "movement_history": Move,
+    "opponents": Opponent,
+}
+
+class TickRequest(FlaggedFeature):
+    """
+    Payload of one tick, shared by all the agent endpoints, the batch items and the WebSocket messages.
+    """
+    flags: ClassVar[dict] = {"need_reasoning": YES_NO}
+    need_reasoning: Optional[Flag] = None
+    game_state: Any = None
+    valid_movement: Union[List[str], str, None] = None
+    nearest_crate: Union[NearestCrate, str, None] = None
+    check_bomb_radius: Union[CheckBombRadius, str, None] = None
+    plant_bomb_available: Union[PlantBombAvailable, str, None] = None
+    coins_collection_policy: Union[CoinsCollectionPolicy, str, None] = None
+    movement_history: Union[List[Move], str, None] = None
+    opponents: Union[List[Opponent], str, None] = None
+    rl_model_suggestion: Any = None
+    deadline_ms: Union[Number, str, None] = None
+    game_id: Union[str, int, None] = None
+    reset: Optional[bool] = None
+    opponents_removed: Optional[List[str]] = None
+    endpoint: Optional[str] = None
+    tick: Any = None
+
+    def __post_init__(self):
+        super().__post_init__()
+        # String encoded fields are decoded straight into their typed form, errors surface as a ValidationError
+        for field, field_type in STRING_ENCODED_FIELDS.items():
+            value = getattr(self, field)
+            if isinstance(value, str):
+                try:
+                    setattr(self, field, msgspec.json.decode(value, type=field_type, strict=False))
+                except msgspec.ValidationError:
+                    raise
+                except msgspec.DecodeError as e:
+                    raise ValueError(f"Invalid JSON encoded {field}: {e}")
+
+class BatchItem(msgspec.Struct):
+    endpoint: str = "/"
+    payload: msgspec.Raw = msgspec.Raw(b"{}")
+
+class BatchRequest(msgspec.Struct):
+    requests: List[BatchItem] = []
+
+tick_decoder = msgspec.json.Decoder(Union[TickRequest, str], strict=False)
+request_decoder = msgspec.json.Decoder(TickRequest, strict=False)
+batch_decoder = msgspec.json.Decoder(Union[BatchRequest, List[BatchItem]])
+encoder = msgspec.json.Encoder()
+
+def known_fields(value, struct):
+    return {key: item for key, item in value.items() if key in struct.__struct_fields__} if isinstance(value, dict) else value
+
+def decode_tick(raw):
+    """
+    Decodes a tick payload (bytes or str) in a single typed pass, also when the whole payload or some of its features
+    are JSON encoded strings. Validation is lax: numbers sent as strings are turned into numbers and the flags are
+    normalised (see FlaggedFeature). Payloads carrying keys the model does not know, which the game may add before
+    the schema follows, are validated on their known fields and returned with the other keys as sent (see decode_with_unknown_fields).
+    Raises msgspec.DecodeError / msgspec.ValidationError on malformed payloads.
+
+    Returns:
+        Dict of the non-null fields of the payload, JSON encoded features decoded to dicts and lists
+    """
+    try:
+        tick = tick_decoder.decode(raw)
+        if isinstance(tick, str):
+            tick = request_decoder.decode(tick)
+    except msgspec.ValidationError as e:
+        if "unknown field" not in str(e):
+            raise
+        return decode_with_unknown_fields(raw)
+    return msgspec.to_builtins(tick)
+
+def decode_with_unknown_fields(raw):
+    """
+    Slow path of decode_tick: parses the payload untyped, validates its known fields and lays the typed values
+    over the ones sent, so the unknown keys are kept.
+    """
+    data = msgspec.json.decode(raw)
+    if isinstance(data, str):
+        data = msgspec.json.decode(data)
+    data = {field: value for field, value in data.items() if value is not None}
+    for field in STRING_ENCODED_FIELDS:
+        if isinstance(data.get(field), str):
+            data[field] = msgspec.json.decode(data[field])
+    known = known_fields(data, TickRequest)
+    for field, struct in FEATURE_STRUCTS.items():
+        value = known.get(field)
+        known[field] = [known_fields(item, struct) for item in value] if isinstance(value, list) else known_fields(value, struct)
+    typed = msgspec.to_builtins(msgspec.convert(known, TickRequest, strict=False))
+    for field in FEATURE_STRUCTS:
+        value = typed.get(field)
+        if isinstance(value, dict):
+            typed[field] = {**data[field], **value}
+        elif isinstance(value, list):
+            typed[field] = [{**sent, **item} for sent, item in zip(data[field], value)]
+    return {**data, **typed}
+
+def decode_batch(raw):
+    """
+    Returns:
+        List of batch items, their payloads still raw so each one is decoded and rejected on its own
+    """
+    batch = batch_decoder.decode(raw)
+    return batch.requests if isinstance(batch, BatchRequest) else batch
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with msgspec instead of json.dumps.
+    """
+    def render(self, content: Any) -> bytes:
+        return encoder.encode(content)
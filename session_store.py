@@ -0,0 +1,122 @@
+import time
+import asyncio
+import contextvars
+from collections import OrderedDict, deque
+from agent_settings import SESSION_MAX_GAMES, SESSION_IDLE_SECONDS, SESSION_HISTORY_LENGTH, SESSION_POSITION_HISTORY
+
+# Session of the game whose tick is being decided, set by decisions.with_session.
+current_session = contextvars.ContextVar("current_session", default=None)
+
+class GameSession():
+    """
+    Server-side state of one game: our own recent actions, the latest state and position history of each opponent,
+    the last decision returned and the plan being followed in plan mode.
+    Ticks of the game hold its lock while they are decided, so they read and update the session one at a time.
+    """
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.action_history = deque(maxlen=SESSION_HISTORY_LENGTH)
+        self.opponents = {}
+        self.opponent_positions = {}
+        self.last_decision = None
+        self.plan = None
+        self.ticks = 0
+        self.last_seen = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def apply_delta(self, data):
+        """
+        Fills the fields the client left out of a delta tick payload from the session, and updates the session with the ones it sent.
+        - movement_history: sent replaces our history, left out uses the decisions recorded by the server
+        - opponents: partial opponent dicts (with "name") are merged into the known opponents, the position sent each tick
+          extends their position history, and last_3_actions is derived from it when not sent
+        - opponents_removed: names of opponents to forget (e.g. eliminated)
+
+        Returns:
+            Full payload for the decision functions
+        """
+        data = dict(data)
+        if "movement_history" in data:
+            history = data["movement_history"]
+            if isinstance(history, list):
+                self.action_history.clear()
+                self.action_history.extend(history)
+        else:
+            data["movement_history"] = list(self.action_history)
+
+        for name in data.pop("opponents_removed", None) or []:
+            self.opponents.pop(name, None)
+            self.opponent_positions.pop(name, None)
+        if isinstance(data.get("opponents"), list):
+            for delta in data["opponents"]:
+                name = delta.get("name", "Unknown")
+                opponent = self.opponents.setdefault(name, {"name": name})
+                opponent.update(delta)
+                positions = self.opponent_positions.setdefault(name, deque(maxlen=SESSION_POSITION_HISTORY))
+                if isinstance(delta.get("last_3_actions"), list):
+                    positions.clear()
+                    positions.extend(delta["last_3_actions"])
+                elif "position" in delta:
+                    positions.append(delta["position"])
+                if "last_3_actions" not in delta and positions:
+                    opponent["last_3_actions"] = list(positions)[-3:]
+        if "opponents" in data or self.opponents:
+            data["opponents"] = [dict(opponent) for opponent in self.opponents.values()]
+        return data
+
+    def record_decision(self, decision):
+        self.ticks += 1
+        if isinstance(decision, dict) and decision.get("action"):
+            self.last_decision = decision
+            self.action_history.append({"reasoning": decision.get("reasoning"), "action": decision.get("action")})
+
+class SessionStore():
+    """
+    Bounded store of game sessions by game_id, evicting the least recently used game once full
+    and any game idle for longer than SESSION_IDLE_SECONDS.
+    """
+    def __init__(self, max_games=SESSION_MAX_GAMES, idle_seconds=SESSION_IDLE_SECONDS):
+        self.max_games = max_games
+        self.idle_seconds = idle_seconds
+        self.sessions = OrderedDict()
+        self.created = 0
+        self.evicted = 0
+        self.expired = 0
+
+    def evict_idle(self):
+        now = time.monotonic()
+        while self.sessions:
+            game_id, session = next(iter(self.sessions.items()))
+            if now - session.last_seen < self.idle_seconds:
+                break
+            del self.sessions[game_id]
+            self.expired += 1
+
+    def get(self, game_id):
+        self.evict_idle()
+        session = self.sessions.get(game_id)
+        if session is None:
+            session = GameSession(game_id)
+            self.sessions[game_id] = session
+            self.created += 1
+            if len(self.sessions) > self.max_games:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.sessions.move_to_end(game_id)
+        session.last_seen = time.monotonic()
+        return session
+
+    def close(self, game_id):
+        self.sessions.pop(game_id, None)
+
+    def stats(self):
+        return {
+            "games": len(self.sessions),
+            "max_games": self.max_games,
+            "created": self.created,
+            "evicted": self.evicted,
+            "expired": self.expired,
+        }
+
+session_store = SessionStore()
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+class Flight():
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+class SingleFlight():
+    """
+    Coalesces identical calls in flight: the first caller of a key starts the call in its own task, later callers
+    of the same key await that task instead of starting another one, and all of them get its result or its exception.
+    Each caller awaits through a shield, so a caller that goes away (cancelled, e.g. its tick deadline ran out) leaves
+    the call running for the others, and the call is only cancelled once no caller is left waiting on it.
+    A key is forgotten as soon as its call ends, past results are the job of the decision cache.
+    """
+    def __init__(self):
+        self.flights = {}
+        self.started = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    async def run(self, key, call):
+        """
+        Args:
+            key: Key of the call, callers with equal keys share one call
+            call: Coroutine function starting the call, only invoked when no call of the key is in flight
+
+        Returns:
+            Result of the shared call
+        """
+        flight = self.flights.get(key)
+        if flight is None or flight.task.done():
+            flight = Flight(asyncio.ensure_future(call()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda task: self.forget(key, flight))
+            self.started += 1
+            CACHE_LOOKUPS.labels("single_flight", "miss").inc()
+        else:
+            self.coalesced += 1
+            CACHE_LOOKUPS.labels("single_flight", "hit").inc()
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller went away, nobody needs the answer anymore
+                self.forget(key, flight)
+                flight.task.cancel()
+                self.cancelled += 1
+                logger.debug("Cancelled a call without callers left", extra={"key": key})
+
+    def forget(self, key, flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+
+    def stats(self):
+        return {
+            "in_flight": len(self.flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "cancelled": self.cancelled,
+        }
+
+single_flight = SingleFlight()
@@ -1,18 +1,17 @@
 import os
-import asyncio
-import traceback
 from typing import List, Literal
 from dataclasses import dataclass
 from pydantic import BaseModel
 
-from llm import a_client, a_client_reasoning, a_client_eu2_prod
-from agents import Agent, AgentOutputSchema, OpenAIChatCompletionsModel, Runner, function_tool
+from llm import get_client
+from agents import Agent, AgentOutputSchema, OpenAIChatCompletionsModel, function_tool
 from agent_settings import MyAgentSettings
-from agent_settings import MAX_RETRIES, RETRY_DELAY_SECONDS, RETRYABLE_STATUS_CODES, RETRYABLE_EXCEPTIONS
-from tool_logger import ToolLogger
+from agent_cache import agent_cache, agent_cache_key
+from agent_runner import run_agent
+from plan import PlanAction, PlanCondition, plan_instructions
 
 class BombermanAgent():
-    async def initialise_agent(self, need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available, maverick=False):
+    async def initialise_agent(self, need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available, maverick=False, plan_mode=False):
         """
         Initialises the Bomberman agent with the necessary settings and tools.
         """
@@ -23,7 +22,19 @@ class BombermanAgent():
         self.in_bomb_radius = in_bomb_radius
         self.plant_bomb_available = plant_bomb_available
         self.maverick = maverick
-        
+        self.plan_mode = plan_mode
+        key = agent_cache_key("bomberman", need_reasoning, valid_movement, maverick, plan_mode)
+        self.cache_key = key
+        self.kind = key[0]
+        self.route = "reasoning" if need_reasoning == "yes" else "chat"
+        self.allowed_actions = key[2]
+        self.agent = agent_cache.get_or_build(key, lambda: self.build_agent(list(key[2])))
+
+    def build_agent(self, valid_movement):
+        """
+        Builds the Bomberman agent, its output schema and model for the given valid movements.
+        Only called on an agent cache miss.
+        """
         def safe_literal(values: list[str]) -> type:
             """
             Return a Literal type if possible (Python 3.11+), else fallback to eval-based dynamic creation.
@@ -33,7 +44,7 @@ class BombermanAgent():
                 return str
             literal_str = f"Literal[{', '.join(repr(v) for v in values)}]"
             return eval(literal_str, {"Literal": Literal})
-        allowed_actions = safe_literal(self.valid_movement)
+        allowed_actions = safe_literal(valid_movement)
         
         @dataclass
         class BombermanActions(BaseModel):
@@ -41,7 +52,18 @@ class BombermanAgent():
             """A detailed reason why this specific action is chosen."""
             action: allowed_actions
             """A specific action selected from the available valid movements, including strategic bomb placements, to achieve game objectives."""
-            
+
+        @dataclass
+        class BombermanPlan(BaseModel):
+            reasoning: str
+            """A detailed reason why this specific action is chosen."""
+            action: allowed_actions
+            """A specific action selected from the available valid movements, including strategic bomb placements, to achieve game objectives."""
+            plan: List[PlanAction]
+            """The actions intended for the next ticks, after this one."""
+            plan_valid_while: List[PlanCondition]
+            """The conditions the plan relies on."""
+
         specialist_instructions = """
         Role: You are an expert Bomberman agent. Your main goal is to collect as much coins as possible, clear obstacles to explore new areas, and to survive the game by avoiding bombs and traps.
 
@@ -58,6 +80,7 @@ class BombermanAgent():
         Expected Outputs:
         - Provide a reason for your chosen actions.
         - Specify the action to be taken.
+        - Answer with a JSON object with two fields: "reasoning", a string, and "action", exactly one of the valid movements given in the input.
 
         Additional Information:
         - Always prioritize player safety while maximizing offensive opportunities.
@@ -67,16 +90,18 @@ class BombermanAgent():
         """
         # if self.maverick:
         #     specialist_instructions += """- You will also have additional input from your friend Maverick. Take into consideration of Maverick actions. Overwrite it if it is dangerous and not feasible, especially related to BOMB. Remember your priorities and stay on course."""
+        if self.plan_mode:
+            specialist_instructions = plan_instructions(specialist_instructions)
         if self.need_reasoning == "yes":
             asset_features_specialist = Agent(
                 name=self.name,
                 instructions=specialist_instructions,
                 model=OpenAIChatCompletionsModel(
                     model=os.environ.get("GPT5"),
-                    openai_client=a_client_eu2_prod,
+                    openai_client=get_client("eu2_prod"),
                 ),
                 model_settings=MyAgentSettings.reasoning_low_setting,
-                output_type=AgentOutputSchema(BombermanActions, strict_json_schema=True)
+                output_type=AgentOutputSchema(BombermanPlan if self.plan_mode else BombermanActions, strict_json_schema=True)
             )
         else:
             asset_features_specialist = Agent(
@@ -84,28 +109,12 @@ class BombermanAgent():
                 instructions=specialist_instructions,
                 model=OpenAIChatCompletionsModel(
                     model=os.environ.get("OPENAI_DEPLOYMENT_NAME"),
-                    openai_client=a_client,
+                    openai_client=get_client("primary"),
                 ),
                 model_settings=MyAgentSettings.normal_setting,
-                output_type=AgentOutputSchema(BombermanActions, strict_json_schema=True)
+                output_type=AgentOutputSchema(BombermanPlan if self.plan_mode else BombermanActions, strict_json_schema=True)
             )
-        self.agent = asset_features_specialist
+        return asset_features_specialist
 
     async def run_agent(self, input):
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                run_agent_results = await Runner.run(self.agent, input=input, max_turns=5, hooks=ToolLogger())
-                run_agent_results = run_agent_results.final_output.model_dump()
-                return run_agent_results
-            except RETRYABLE_EXCEPTIONS as e:
-                print(f"[Retry {attempt}] Transient error: {e}")
-                print(traceback.format_exc())
-                if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY_SECONDS)
-                else:
-                    raise
-            except Exception as e:
-                print(f"Fatal error in {self.name}:", str(e))
-                raise
-    
-    
\ No newline at end of file
+        return await run_agent(self, input)
@@ -1,15 +1,13 @@
 import os
-import asyncio
-import traceback
 from typing import List, Literal
 from dataclasses import dataclass
-from pydantic import BaseModel
+from pydantic import BaseModel, create_model
 
-from llm import a_client, a_client_reasoning, a_client_eu2_prod
-from agents import Agent, AgentOutputSchema, OpenAIChatCompletionsModel, Runner, function_tool
+from llm import get_client
+from agents import Agent, AgentOutputSchema, OpenAIChatCompletionsModel, function_tool
 from agent_settings import MyAgentSettings
-from agent_settings import MAX_RETRIES, RETRY_DELAY_SECONDS, RETRYABLE_STATUS_CODES, RETRYABLE_EXCEPTIONS
-from tool_logger import ToolLogger
+from agent_cache import agent_cache, agent_cache_key
+from agent_runner import run_agent
 
 class PredictAgent():
     async def initialise_agent(self, need_reasoning, game_state, valid_movement, in_bomb_radius, plant_bomb_available):
@@ -22,7 +20,18 @@ class PredictAgent():
         self.valid_movement = valid_movement
         self.in_bomb_radius = in_bomb_radius
         self.plant_bomb_available = plant_bomb_available
-        
+        key = agent_cache_key("predict", need_reasoning, valid_movement, False)
+        self.cache_key = key
+        self.kind = key[0]
+        self.route = "reasoning" if need_reasoning == "yes" else "chat"
+        self.allowed_actions = key[2]
+        self.agent = agent_cache.get_or_build(key, lambda: self.build_agent(list(key[2])))
+
+    def build_agent(self, valid_movement):
+        """
+        Builds the Predict agent, its output schema and model for the given valid movements.
+        Only called on an agent cache miss.
+        """
         def safe_literal(values: list[str]) -> type:
             """
             Return a Literal type if possible (Python 3.11+), else fallback to eval-based dynamic creation.
@@ -32,7 +41,7 @@ class PredictAgent():
                 return str
             literal_str = f"Literal[{', '.join(repr(v) for v in values)}]"
             return eval(literal_str, {"Literal": Literal})
-        allowed_actions = safe_literal(self.valid_movement)
+        allowed_actions = safe_literal(valid_movement)
         
         @dataclass
         class BombermanActions(BaseModel):
@@ -50,6 +59,14 @@ class PredictAgent():
         Expected Outputs:
         - Provide a reason for your chosen actions.
         - Specify the action to be taken.
+        - Answer with a JSON object with two fields: "reasoning", a string, and "action", exactly one of the valid moves of the opponent.
+
+        Based on this information, predict what action this opponent will take next.
+        Consider:
+        1. If they're in danger, they'll likely try to escape
+        2. If they can collect coins easily, they might go for it
+        3. If they're aggressive and can bomb us, they might attack
+        4. Their recent movement patterns indicate their strategy
         """
             
         if self.need_reasoning == "yes":
@@ -58,7 +75,7 @@ class PredictAgent():
                 instructions=specialist_instructions,
                 model=OpenAIChatCompletionsModel(
                     model=os.environ.get("GPT5"),
-                    openai_client=a_client_eu2_prod,
+                    openai_client=get_client("eu2_prod"),
                 ),
                 model_settings=MyAgentSettings.reasoning_low_setting,
                 output_type=AgentOutputSchema(BombermanActions, strict_json_schema=True)
@@ -69,28 +86,102 @@ class PredictAgent():
                 instructions=specialist_instructions,
                 model=OpenAIChatCompletionsModel(
                     model=os.environ.get("OPENAI_DEPLOYMENT_NAME"),
-                    openai_client=a_client,
+                    openai_client=get_client("primary"),
                 ),
                 model_settings=MyAgentSettings.normal_setting,
                 output_type=AgentOutputSchema(BombermanActions, strict_json_schema=True)
             )
-        self.agent = asset_features_specialist
+        return asset_features_specialist
+
+    async def run_agent(self, input):
+        return await run_agent(self, input)
+
+
+class BatchPredictAgent():
+    async def initialise_agent(self, need_reasoning, game_state, opponents_valid_moves):
+        """
+        Initialises the agent predicting the next move of several opponents in a single call.
+        The action of each prediction is constrained by the valid moves of that opponent.
+        """
+        self.name = "Batch Predict Agent"
+        self.need_reasoning = need_reasoning
+        self.game_state = game_state
+        self.opponents_valid_moves = opponents_valid_moves
+        key = ("batch_predict", need_reasoning, tuple(tuple(dict.fromkeys(moves)) for moves in opponents_valid_moves), False)
+        self.cache_key = key
+        self.kind = key[0]
+        self.route = "reasoning" if need_reasoning == "yes" else "chat"
+        self.allowed_actions = key[2]
+        self.agent = agent_cache.get_or_build(key, lambda: self.build_agent([list(moves) for moves in key[2]]))
+
+    def build_agent(self, opponents_valid_moves):
+        """
+        Builds the Batch Predict agent, with one prediction field per opponent (opponent_1, opponent_2, ...).
+        Only called on an agent cache miss.
+        """
+        def safe_literal(values: list[str]) -> type:
+            if not values:
+                return str
+            literal_str = f"Literal[{', '.join(repr(v) for v in values)}]"
+            return eval(literal_str, {"Literal": Literal})
+
+        predictions = {}
+        for idx, valid_moves in enumerate(opponents_valid_moves, start=1):
+            prediction = create_model(
+                f"Opponent{idx}Prediction",
+                reasoning=(str, ...),
+                action=(safe_literal(valid_moves), ...),
+            )
+            predictions[f"opponent_{idx}"] = (prediction, ...)
+        OpponentPredictions = create_model("OpponentPredictions", **predictions)
+
+        specialist_instructions = """
+        Role: You are an expert Bomberman agent. Your main goal is to predict what each opponent will do given the opponents' states.
+
+        Inputs:
+        - Information about the current state of each opponent, numbered Opponent 1, Opponent 2, ...
+
+        Expected Outputs:
+        - One prediction per opponent, in the field with the same number (opponent_1 for Opponent 1, ...).
+        - For each prediction, provide a reason and specify the action the opponent will take.
+        - Answer with a JSON object with one field per opponent, each an object with two fields: "reasoning", a string, and "action", exactly one of the valid moves of that opponent.
+
+        Based on this information, predict what action each opponent will take next.
+        Consider:
+        1. If they're in danger, they'll likely try to escape
+        2. If they can collect coins easily, they might go for it
+        3. If they're aggressive and can bomb us, they might attack
+        4. Their recent movement patterns indicate their strategy
+        """
+
+        if self.need_reasoning == "yes":
+            asset_features_specialist = Agent(
+                name=self.name,
+                instructions=specialist_instructions,
+                model=OpenAIChatCompletionsModel(
+                    model=os.environ.get("GPT5"),
+                    openai_client=get_client("eu2_prod"),
+                ),
+                model_settings=MyAgentSettings.reasoning_low_setting,
+                output_type=AgentOutputSchema(OpponentPredictions, strict_json_schema=True)
+            )
+        else:
+            asset_features_specialist = Agent(
+                name=self.name,
+                instructions=specialist_instructions,
+                model=OpenAIChatCompletionsModel(
+                    model=os.environ.get("OPENAI_DEPLOYMENT_NAME"),
+                    openai_client=get_client("primary"),
+                ),
+                model_settings=MyAgentSettings.normal_setting,
+                output_type=AgentOutputSchema(OpponentPredictions, strict_json_schema=True)
+            )
+        return asset_features_specialist
 
     async def run_agent(self, input):
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                run_agent_results = await Runner.run(self.agent, input=input, max_turns=5, hooks=ToolLogger())
-                run_agent_results = run_agent_results.final_output.model_dump()
-                return run_agent_results
-            except RETRYABLE_EXCEPTIONS as e:
-                print(f"[Retry {attempt}] Transient error: {e}")
-                print(traceback.format_exc())
-                if attempt < MAX_RETRIES:
-                    await asyncio.sleep(RETRY_DELAY_SECONDS)
-                else:
-                    raise
-            except Exception as e:
-                print(f"Fatal error in {self.name}:", str(e))
-                raise
-    
-    
\ No newline at end of file
+        """
+        Returns:
+            List of prediction dicts (action, reasoning), in the order of the opponents
+        """
+        results = await run_agent(self, input)
+        return [results[f"opponent_{idx}"] for idx in range(1, len(self.opponents_valid_moves) + 1)]
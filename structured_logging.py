@@ -0,0 +1,114 @@
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from agent_settings import LOG_LEVEL, LOG_QUEUE_SIZE, LOG_SAMPLE_RATE
+
+# Attributes every LogRecord has, anything else was passed through extra= and is written as a field.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, the extra= fields of the call and the traceback if any.
+    """
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a LOG_SAMPLE_RATE share of the records below WARNING, warnings and errors are always kept.
+    """
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.sampled_out = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands the records to the writer thread without blocking the event loop: only the message and the traceback are
+    rendered in the caller, the JSON encoding and the write happen on the writer thread. Records are dropped, and counted,
+    when the queue is full.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.queued = 0
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            self.queued += 1
+        except queue.Full:
+            self.dropped += 1
+
+class LoggingStats():
+    def __init__(self):
+        self.handler = None
+        self.sampler = None
+
+    def stats(self):
+        if self.handler is None:
+            return {}
+        return {
+            "level": logging.getLevelName(logging.getLogger().level),
+            "sample_rate": self.sampler.rate,
+            "queued": self.handler.queued,
+            "dropped": self.handler.dropped,
+            "sampled_out": self.sampler.sampled_out,
+            "backlog": self.handler.queue.qsize(),
+        }
+
+logging_stats = LoggingStats()
+setup_lock = threading.Lock()
+
+def setup_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE, stream=None):
+    """
+    Routes the root logger through a bounded queue to a background thread writing JSON lines to stdout.
+    Safe to call more than once, only the first call configures logging.
+    """
+    with setup_lock:
+        if logging_stats.handler is not None:
+            return
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        handler = DroppingQueueHandler(log_queue)
+        sampler = SamplingFilter(sample_rate)
+        handler.addFilter(sampler)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(JsonFormatter())
+        listener = QueueListener(log_queue, writer)
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(handler)
+        listener.start()
+        atexit.register(listener.stop)
+        logging_stats.handler = handler
+        logging_stats.sampler = sampler
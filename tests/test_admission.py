@@ -0,0 +1,86 @@
+import asyncio
+import time
+import pytest
+from admission import AdmissionController, TokenBucket
+from deadline import DeadlineExceeded, tick_deadline
+
+def controller(limit):
+    admission = AdmissionController("test")
+    admission.limit = limit
+    return admission
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def scenario():
+        admission, admitted = controller(1), []
+        async def call(index):
+            await admission.acquire(1)
+            admitted.append(index)
+            await asyncio.sleep(0.001)
+            admission.release()
+        await admission.acquire(1)
+        tasks = []
+        for index in range(5):
+            tasks.append(asyncio.ensure_future(call(index)))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        waiting = len(admission.waiters)
+        admission.release()
+        await asyncio.gather(*tasks)
+        return admission, waiting, admitted
+    admission, waiting, admitted = asyncio.run(scenario())
+    assert waiting == 5
+    assert admitted == [0, 1, 2, 3, 4]
+    assert admission.stats()["in_flight"] == 0 and admission.stats()["waiting"] == 0
+
+def test_a_released_slot_wakes_a_single_waiter():
+    async def scenario():
+        admission = controller(1)
+        await admission.acquire(1)
+        tasks = [asyncio.ensure_future(admission.acquire(1)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        admission.release()
+        await asyncio.sleep(0.01)
+        woken = [admission.waiters[0].is_set()] + [turn.is_set() for turn in list(admission.waiters)[1:]]
+        done = sum(task.done() for task in tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return done, woken
+    done, woken = asyncio.run(scenario())
+    assert done == 1
+    assert not any(woken)
+
+def test_new_calls_queue_behind_waiting_ones():
+    async def scenario():
+        admission = controller(1)
+        await admission.acquire(1)
+        first = asyncio.ensure_future(admission.acquire(1))
+        await asyncio.sleep(0.01)
+        # A fast success grows the limit by a slot, the newcomer arriving at once must not take it from the head
+        admission.on_success(0)
+        second = asyncio.ensure_future(admission.acquire(1))
+        await asyncio.sleep(0.01)
+        state = (first.done(), second.done())
+        for task in (first, second):
+            task.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return state
+    assert asyncio.run(scenario()) == (True, False)
+
+def test_waiters_give_up_when_the_tick_deadline_runs_out():
+    async def scenario():
+        admission = controller(1)
+        await admission.acquire(1)
+        tick_deadline.set(time.monotonic() + 0.02)
+        with pytest.raises(DeadlineExceeded):
+            await admission.acquire(1)
+        return admission
+    admission = asyncio.run(scenario())
+    assert admission.stats()["rejected"] == 1 and admission.stats()["waiting"] == 0
+
+def test_calls_above_the_token_capacity_take_the_same_amount_they_waited_for():
+    bucket = TokenBucket(rate=1, capacity=100)
+    assert bucket.wait_time(500) == 0
+    bucket.take(500)
+    assert bucket.level == pytest.approx(0, abs=0.01)
+    assert bucket.wait_time(500) == pytest.approx(100, abs=0.01)
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+import specialised_agents.bomberman as bomberman
+from agent_cache import AgentCache, agent_cache_key
+
+def test_keys_drop_duplicated_movements_but_keep_their_order():
+    assert agent_cache_key("bomberman", "no", ["UP", "LEFT", "UP"]) == agent_cache_key("bomberman", "no", ["UP", "LEFT"])
+    assert agent_cache_key("bomberman", "no", ["UP", "LEFT"]) != agent_cache_key("bomberman", "no", ["LEFT", "UP"])
+    assert agent_cache_key("bomberman", "no", ["UP"]) != agent_cache_key("bomberman", "no", ["UP"], plan_mode=True)
+
+def test_agents_are_built_once_per_key():
+    cache, builds = AgentCache(maxsize=4), []
+    def builder():
+        builds.append(1)
+        return object()
+    first = cache.get_or_build("key", builder)
+    assert cache.get_or_build("key", builder) is first
+    assert len(builds) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_least_recently_used_agents_are_evicted():
+    cache = AgentCache(maxsize=2)
+    for key in ("a", "b"):
+        cache.get_or_build(key, object)
+    cache.get_or_build("a", object)
+    cache.get_or_build("c", object)
+    assert list(cache.agents) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+@pytest.fixture
+def agent_cache(monkeypatch):
+    cache = AgentCache()
+    monkeypatch.setattr(bomberman, "agent_cache", cache)
+    monkeypatch.setattr(bomberman.BombermanAgent, "build_agent", lambda self, valid_movement: object())
+    return cache
+
+def test_ticks_with_the_same_movements_share_the_agent(agent_cache):
+    async def agent(valid_movement):
+        specialist = bomberman.BombermanAgent()
+        await specialist.initialise_agent("no", "{}", valid_movement, "no", "yes")
+        return specialist
+    first, second, other = [asyncio.run(agent(movements)) for movements in (["UP", "BOMB"], ["UP", "BOMB", "UP"], ["DOWN"])]
+    assert first.agent is second.agent
+    assert first.agent is not other.agent
+    assert first.allowed_actions == ("UP", "BOMB")
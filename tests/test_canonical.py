@@ -0,0 +1,62 @@
+import pytest
+from canonical import REFLECTIONS, CanonicalState, reflect_direction, reflect_position, reflect_text
+
+ACTIONS = ["UP", "RIGHT", "DOWN", "LEFT", "WAIT", "BOMB"]
+
+def features(mirror=False, status="No bomb detected.", endpoint="battle"):
+    """
+    Features of a tick of the endpoint, or of its mirror image left to right.
+    """
+    move = lambda action: reflect_direction(action, "mirror_x") if mirror else action
+    return dict(
+        endpoint=endpoint,
+        valid_movement=[move("UP"), move("RIGHT"), move("LEFT")],
+        nearest_crate={"crate_available": "yes", "crate_action": move("DOWN"), "crate_distance": 2.0},
+        check_bomb_radius={"in_bomb_radius": "no", "in_danger": "no", "escape_bomb_action": "WAIT"},
+        plant_bomb_available={"plant": "false", "plant_bomb_reason": status, "current_status": status},
+        coins_collection_policy={"coin_available": "yes", "coin_action": move("LEFT")},
+        movement_history=[{"action": move(action), "reasoning": "free text"} for action in ["LEFT", "UP"]],
+        opponents=[{"name": "rival", "position": reflect_position([3, 5], "mirror_x") if mirror else [3, 5], "distance_to_us": 4, "valid_moves": [move("LEFT"), move("DOWN")]}],
+    )
+
+@pytest.mark.parametrize("reflection", REFLECTIONS)
+def test_reflections_are_involutions(reflection):
+    for action in ACTIONS:
+        assert reflect_direction(reflect_direction(action, reflection), reflection) == action
+    for position in ([0, 0], [3, 11], [16, 16]):
+        assert reflect_position(reflect_position(position, reflection), reflection) == position
+
+def test_mirror_images_share_a_key():
+    state = CanonicalState(**features())
+    mirrored = CanonicalState(**features(mirror=True))
+    assert state.key == mirrored.key
+    assert state.reflection != mirrored.reflection
+
+def test_decision_round_trips_through_the_canonical_frame():
+    state = CanonicalState(**features())
+    mirrored = CanonicalState(**features(mirror=True))
+    decision = {"action": "LEFT", "reasoning": "Take the coin on the LEFT, in the upper left corner", "plan": ["LEFT", "UP"]}
+    canonical = state.reflect(decision)
+    assert state.reflect(canonical) == decision
+    # Served to the mirrored state, the decision is mirrored too, prose directions are left as written
+    assert mirrored.reflect(canonical) == {"action": "RIGHT", "reasoning": "Take the coin on the RIGHT, in the upper left corner", "plan": ["RIGHT", "UP"]}
+
+@pytest.mark.parametrize("endpoint", ["bot", "battle", "agentic"])
+def test_bomb_status_is_part_of_the_key(endpoint):
+    assert CanonicalState(**features(status="Standing on a bomb.", endpoint=endpoint)).key != CanonicalState(**features(endpoint=endpoint)).key
+
+@pytest.mark.parametrize("endpoint, rendered, ignored", [("battle", "plant_bomb_reason", "current_status"), ("agentic", "current_status", "plant_bomb_reason")])
+def test_the_key_follows_the_status_the_prompt_renders(endpoint, rendered, ignored):
+    standing = features(endpoint=endpoint)
+    standing["plant_bomb_available"] = dict(standing["plant_bomb_available"], **{rendered: "Standing on a bomb."})
+    assert CanonicalState(**standing).key != CanonicalState(**features(endpoint=endpoint)).key
+    stale = features(endpoint=endpoint)
+    stale["plant_bomb_available"] = dict(stale["plant_bomb_available"], **{ignored: "Standing on a bomb."})
+    assert CanonicalState(**stale).key == CanonicalState(**features(endpoint=endpoint)).key
+
+def test_free_text_extras_pin_the_identity():
+    state = CanonicalState(**features(), extras={"maverick_best_action": "LEFT"})
+    assert state.reflection == "identity"
+
+def test_reflect_text_only_maps_action_tokens():
+    assert reflect_text("Go UP then LEFT, away from the lower right corner", "mirror_xy") == "Go DOWN then RIGHT, away from the lower right corner"
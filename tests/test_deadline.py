@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+import deadline
+from deadline import DeadlineStats, DeadlineExceeded, run_with_deadline, remaining_time
+from decisions import deadline_budget
+from agent_settings import DEFAULT_DEADLINE_SECONDS, REASONING_DEADLINE_SECONDS, MAX_DEADLINE_SECONDS
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    stats = DeadlineStats()
+    monkeypatch.setattr(deadline, "deadline_stats", stats)
+    return stats
+
+def fallback():
+    return {"action": "WAIT", "source": "fallback"}
+
+def test_slow_decisions_get_the_fallback(stats):
+    async def decide():
+        await asyncio.sleep(1)
+        return {"action": "UP"}
+    assert asyncio.run(run_with_deadline("bot", decide(), 0.01, fallback)) == fallback()
+    assert stats.stats() == {"bot": {"requests": 1, "fallbacks": 1, "fallback_rate": 1.0}}
+
+def test_steps_that_cannot_fit_the_budget_get_the_fallback():
+    async def decide():
+        raise DeadlineExceeded("no time left for a retry")
+    assert asyncio.run(run_with_deadline("bot", decide(), 1, fallback)) == fallback()
+
+def test_decisions_in_time_see_their_remaining_budget(stats):
+    async def decide():
+        return {"action": "UP", "remaining": remaining_time()}
+    decision = asyncio.run(run_with_deadline("bot", decide(), 1, fallback))
+    assert decision["action"] == "UP" and 0 < decision["remaining"] <= 1
+    assert stats.stats()["bot"]["fallbacks"] == 0
+    assert remaining_time() is None
+
+@pytest.mark.parametrize("deadline_ms, need_reasoning, budget", [
+    (None, "no", DEFAULT_DEADLINE_SECONDS),
+    (None, "yes", REASONING_DEADLINE_SECONDS),
+    ("oops", "no", DEFAULT_DEADLINE_SECONDS),
+    (250, "yes", 0.25),
+    (-5, "no", 0),
+    (10 ** 9, "no", MAX_DEADLINE_SECONDS),
+])
+def test_deadline_budget(deadline_ms, need_reasoning, budget):
+    assert deadline_budget(deadline_ms, need_reasoning) == budget
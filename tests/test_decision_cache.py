@@ -0,0 +1,71 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+import agent_runner
+from decision_cache import DecisionCache, decision_cache_key
+
+def test_keys_change_with_anything_that_decides_the_output():
+    key = decision_cache_key("bomberman", "gpt", "Play.", "tick", ("UP", "DOWN"))
+    assert key == decision_cache_key("bomberman", "gpt", "Play.", "tick", ["UP", "DOWN"])
+    assert key != decision_cache_key("bomberman", "gpt-5", "Play.", "tick", ("UP", "DOWN"))
+    assert key != decision_cache_key("bomberman", "gpt", "Play.", "tick", ("UP",))
+
+def test_entries_expire_after_their_ttl(monkeypatch):
+    cache, now = DecisionCache(ttl_seconds=1), [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache.set("key", {"action": "UP"})
+    assert cache.get("key") == {"action": "UP"}
+    now[0] += 2
+    assert cache.get("key") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+def test_entries_are_evicted_oldest_first_by_count_and_bytes():
+    cache = DecisionCache(maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"action": "UP"})
+    assert list(cache.entries) == ["b", "c"]
+    cache = DecisionCache(max_bytes=700)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"action": "UP"})
+    assert list(cache.entries) == ["b", "c"]
+    assert cache.stats()["bytes"] <= 700
+    cache.set("d", {"reasoning": "x" * 1000})
+    assert "d" not in cache.entries
+
+def test_hits_are_copies():
+    cache = DecisionCache()
+    cache.set("key", {"action": "UP"})
+    cache.get("key")["action"] = "DOWN"
+    assert cache.get("key") == {"action": "UP"}
+
+def specialist(temperature):
+    agent = SimpleNamespace(model_settings=SimpleNamespace(temperature=temperature), model=SimpleNamespace(model="gpt"), instructions="Play.")
+    return SimpleNamespace(kind="bomberman", agent=agent, allowed_actions=("UP", "DOWN"))
+
+@pytest.fixture
+def runs(monkeypatch):
+    runs = []
+    async def run(specialist, input):
+        runs.append(input)
+        return SimpleNamespace(final_output=SimpleNamespace(model_dump=lambda: {"reasoning": "Go.", "action": "UP"}))
+    monkeypatch.setattr(agent_runner.executor, "run", run)
+    monkeypatch.setattr(agent_runner, "decision_cache", DecisionCache())
+    return runs
+
+def test_deterministic_calls_are_answered_from_the_cache(runs):
+    first = asyncio.run(agent_runner.run_agent(specialist(0), "tick"))
+    second = asyncio.run(agent_runner.run_agent(specialist(0), "tick"))
+    assert len(runs) == 1
+    assert "source" not in first and second == {"reasoning": "Go.", "action": "UP", "source": "cache"}
+
+def test_sampled_calls_are_not_cached(runs):
+    for _ in range(2):
+        asyncio.run(agent_runner.run_agent(specialist(0.7), "tick"))
+    assert len(runs) == 2
+
+def test_the_cache_can_be_disabled(runs, monkeypatch):
+    monkeypatch.setattr(agent_runner, "DECISION_CACHE_ENABLED", False)
+    for _ in range(2):
+        asyncio.run(agent_runner.run_agent(specialist(0), "tick"))
+    assert len(runs) == 2
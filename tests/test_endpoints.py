@@ -0,0 +1,110 @@
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+import main
+import decisions
+from session_store import SessionStore
+
+@pytest.fixture
+def client(monkeypatch):
+    """
+    Client of the app whose agent endpoints are answered by a fake decider echoing the tick and its budget.
+    The lifespan is not run, no LLM client is built.
+    """
+    async def decide(data, budget):
+        await asyncio.sleep(data.get("sleep", 0))
+        if data.get("fail"):
+            raise ValueError("boom")
+        return {"action": "UP", "tick": data.get("tick"), "budget": budget}
+    for path in main.DECIDERS:
+        monkeypatch.setitem(main.DECIDERS, path, decide)
+    return TestClient(main.app)
+
+def test_batch_items_are_answered_in_order(client):
+    items = [{"endpoint": "/battle-agent", "payload": {"tick": 1, "sleep": 0.05}}, {"endpoint": "/", "payload": {"tick": 2}}]
+    results = client.post("/batch", json={"requests": items}).json()["results"]
+    assert [(result["index"], result["status"], result["response"]["tick"]) for result in results] == [(0, "ok", 1), (1, "ok", 2)]
+
+def test_batch_item_errors_stay_in_their_item(client):
+    items = [{"endpoint": "/nope", "payload": {}}, {"endpoint": "/", "payload": {"fail": True}}, {"endpoint": "/", "payload": {"tick": 3}}]
+    results = client.post("/batch", json={"requests": items}).json()["results"]
+    assert results[0] == {"index": 0, "status": "error", "error": "Unknown endpoint /nope"}
+    assert results[1] == {"index": 1, "status": "error", "error": "boom"}
+    assert results[2]["status"] == "ok"
+
+def test_batch_items_get_their_own_deadline(client):
+    items = [{"endpoint": "/", "payload": {"deadline_ms": 500}}, {"endpoint": "/", "payload": {}}]
+    results = client.post("/batch", json={"requests": items}, headers={"X-Deadline-Ms": "2000"}).json()["results"]
+    assert 0.4 < results[0]["response"]["budget"] <= 0.5
+    assert 1.9 < results[1]["response"]["budget"] <= 2
+
+def test_oversized_and_malformed_batches_are_rejected(client, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_REQUESTS", 1)
+    assert client.post("/batch", json={"requests": [{"endpoint": "/", "payload": {}}] * 2}).status_code == 400
+    assert client.post("/batch", json={"requests": [{"endpoint": 1}]}).status_code == 422
+
+@pytest.fixture
+def game(monkeypatch):
+    """
+    Decider behind the game session store, recording how many ticks of the game were decided at once.
+    """
+    game = {"running": 0, "most_running": 0, "histories": []}
+    async def decide(data, budget):
+        game["running"] += 1
+        game["most_running"] = max(game["most_running"], game["running"])
+        game["histories"].append([move["action"] for move in data["movement_history"]])
+        await asyncio.sleep(0.02)
+        game["running"] -= 1
+        return {"reasoning": "Go.", "action": f"MOVE{data['tick']}"}
+    monkeypatch.setattr(decisions, "session_store", SessionStore())
+    monkeypatch.setitem(main.DECIDERS, "/", decisions.with_session(decide))
+    return game
+
+def test_ticks_of_a_game_are_decided_in_order(game):
+    with TestClient(main.app).websocket_connect("/ws?game_id=game-1") as websocket:
+        for tick in range(3):
+            websocket.send_text(json.dumps({"tick": tick}))
+        replies = [json.loads(websocket.receive_text()) for _ in range(3)]
+    assert [reply["tick"] for reply in replies] == [0, 1, 2]
+    assert game["most_running"] == 1
+    assert game["histories"] == [[], ["MOVE0"], ["MOVE0", "MOVE1"]]
+
+def test_bad_frames_are_answered_with_errors(client):
+    with client.websocket_connect("/ws") as websocket:
+        websocket.send_bytes(b"{}")
+        assert "Binary frames" in json.loads(websocket.receive_text())["error"]
+        websocket.send_text("{")
+        assert json.loads(websocket.receive_text())["error"].startswith("Malformed payload")
+        websocket.send_text(json.dumps({"tick": 7, "endpoint": "/nope"}))
+        assert json.loads(websocket.receive_text()) == {"tick": 7, "error": "Unknown endpoint /nope"}
+        websocket.send_text(json.dumps({"tick": 8}))
+        assert json.loads(websocket.receive_text())["response"]["action"] == "UP"
+
+def test_unknown_session_endpoints_are_refused(client):
+    with pytest.raises(WebSocketDisconnect) as closed:
+        with client.websocket_connect("/ws?endpoint=/nope") as websocket:
+            websocket.receive_text()
+    assert closed.value.code == 1008
+
+DANGER = {"in_bomb_radius": "yes", "in_danger": True, "escape_bomb_action": "LEFT"}
+
+def test_flags_sent_as_bools_reach_the_fast_path():
+    payload = {"valid_movement": ["WAIT"], "check_bomb_radius": DANGER, "nearest_crate": {}, "plant_bomb_available": {}, "coins_collection_policy": {}}
+    decision = TestClient(main.app).post("/", json=payload).json()
+    assert (decision["action"], decision["source"], decision["policy"]) == ("LEFT", "fast_path", "escape_bomb")
+
+def test_flags_sent_as_bools_reach_the_fallback(monkeypatch):
+    async def bot(*args, **kwargs):
+        await asyncio.sleep(1)
+    monkeypatch.setattr(decisions, "bot", bot)
+    payload = {"valid_movement": ["UP", "LEFT"], "check_bomb_radius": DANGER, "coins_collection_policy": {"coin_available": 1, "coin_action": "UP"}, "deadline_ms": 1}
+    decision = TestClient(main.app).post("/", json=payload).json()
+    assert (decision["action"], decision["source"]) == ("LEFT", "fallback")
+
+@pytest.mark.parametrize("safe_actions", [[{"action": "DOWN-AND-DIE"}], [{"action": "DOWN", "margin": "soon"}], ["DOWN"]])
+def test_malformed_client_danger_maps_are_rejected(safe_actions):
+    payload = {"valid_movement": ["UP", "DOWN"], "check_bomb_radius": dict(DANGER, ticks_to_explosion=1, safe_actions=safe_actions)}
+    response = TestClient(main.app).post("/", json=payload)
+    assert response.status_code == 422 and "safe_actions" in response.json()["error"]
@@ -0,0 +1,64 @@
+import pytest
+from fast_path import FastPathStats, resolve_fast_path, fallback_decision
+import fast_path
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    stats = FastPathStats()
+    monkeypatch.setattr(fast_path, "fast_path_stats", stats)
+    return stats
+
+def resolve(valid_movement, check_bomb_radius=None):
+    return resolve_fast_path("bot", valid_movement, {}, check_bomb_radius or {}, {}, {})
+
+def test_the_only_escape_from_a_bomb_is_forced():
+    decision = resolve(["LEFT", "WAIT", "BOMB"], {"in_bomb_radius": "yes", "in_danger": "yes", "escape_bomb_action": "LEFT"})
+    assert decision["action"] == "LEFT"
+    assert decision["source"] == "fast_path" and decision["policy"] == "escape_bomb"
+
+def test_the_agent_weighs_escapes_when_there_are_several():
+    assert resolve(["LEFT", "UP", "WAIT"], {"in_bomb_radius": "yes", "in_danger": "yes", "escape_bomb_action": "LEFT"}) is None
+
+def test_an_escape_that_is_not_a_valid_movement_is_ignored():
+    assert resolve(["UP", "DOWN"], {"in_danger": "yes", "escape_bomb_action": "LEFT"}) is None
+
+def test_a_single_valid_movement_is_played():
+    decision = resolve(["WAIT", "WAIT"])
+    assert decision["action"] == "WAIT" and decision["policy"] == "single_valid_movement"
+
+def test_stats_count_resolved_ticks_per_policy(stats):
+    resolve(["WAIT"])
+    resolve(["UP", "DOWN"])
+    assert stats.stats() == {"bot": {"ticks": 2, "fast_path": 1, "fast_path_rate": 0.5}, "policies": {"single_valid_movement": 1}}
+
+@pytest.mark.parametrize("check_bomb_radius, coins, crate, action", [
+    ({"in_danger": "yes", "escape_bomb_action": "LEFT"}, {"coin_available": "yes", "coin_action": "UP"}, {}, "LEFT"),
+    ({"in_danger": "no"}, {"coin_available": "yes", "coin_action": "UP"}, {"crate_available": "yes", "crate_action": "DOWN"}, "UP"),
+    ({}, {"coin_available": "no"}, {"crate_available": "yes", "crate_action": "DOWN"}, "DOWN"),
+    ({}, {}, {}, "WAIT"),
+])
+def test_fallback_escapes_then_collects_then_heads_to_crates(check_bomb_radius, coins, crate, action):
+    decision = fallback_decision(["UP", "DOWN", "LEFT", "WAIT"], crate, check_bomb_radius, coins)
+    assert decision["action"] == action and decision["source"] == "fallback"
+
+def in_blast(escape, safe_actions, ticks_to_explosion=2):
+    return {"in_bomb_radius": "yes", "in_danger": "yes", "escape_bomb_action": escape, "ticks_to_explosion": ticks_to_explosion,
+            "safe_actions": [{"action": action, "margin": margin} for action, margin in safe_actions], "danger_horizon": 6}
+
+def test_the_only_safe_escape_of_the_danger_map_is_forced():
+    decision = resolve(["RIGHT", "UP"], in_blast("RIGHT", [("RIGHT", 3)]))
+    assert (decision["action"], decision["policy"]) == ("RIGHT", "escape_bomb")
+
+def test_waiting_out_the_blast_when_it_is_the_only_safe_action():
+    decision = resolve(["UP", "DOWN"], in_blast("WAIT", [("WAIT", 2)]))
+    assert (decision["action"], decision["policy"]) == ("WAIT", "single_safe_action")
+
+def test_the_safest_escape_is_played_when_it_has_no_slack():
+    decision = resolve(["UP", "LEFT"], in_blast("UP", [("UP", 1), ("LEFT", 1)], ticks_to_explosion=1))
+    assert (decision["action"], decision["policy"]) == ("UP", "safe_escape")
+
+def test_the_agent_weighs_escapes_with_enough_margin():
+    assert resolve(["RIGHT", "DOWN"], in_blast("RIGHT", [("RIGHT", 2), ("DOWN", 2), ("WAIT", 1)])) is None
+
+def test_safe_actions_that_are_not_valid_movements_are_not_played():
+    assert resolve(["UP", "DOWN"], in_blast("LEFT", [("LEFT", 1)], ticks_to_explosion=1)) is None
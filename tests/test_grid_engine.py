@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from grid_engine import DangerMap, parse_game_state, compute_features
+
+SIZE = 17
+
+@pytest.fixture
+def arena():
+    field = np.zeros((SIZE, SIZE), int)
+    field[0, :] = field[-1, :] = field[:, 0] = field[:, -1] = -1
+    field[::2, ::2] = -1
+    return {"field": field.tolist(), "bombs": [], "coins": [], "self": ["me", 0, True, [1, 1]], "others": []}
+
+def test_no_bombs_has_no_horizon(arena):
+    danger = DangerMap(parse_game_state(arena))
+    assert danger.horizon == 0
+    assert danger.ticks_to_explosion() is None
+    assert {action for action, _ in danger.safe_actions()} == {"RIGHT", "DOWN", "WAIT"}
+
+def test_escape_from_own_bomb_in_corner(arena):
+    grid = parse_game_state(dict(arena, bombs=[[[1, 1], 3]], self=["me", 0, False, [1, 1]]))
+    danger = DangerMap(grid)
+    assert danger.ticks_to_explosion() == 4
+    assert danger.safe_actions() == [("RIGHT", 2), ("DOWN", 2), ("WAIT", 1)]
+
+def test_no_escape_when_the_bomb_explodes_now(arena):
+    grid = parse_game_state(dict(arena, bombs=[[[1, 1], 0]], self=["me", 0, False, [1, 1]]))
+    assert DangerMap(grid).safe_actions() == []
+
+def test_sidestep_out_of_the_blast_column(arena):
+    grid = parse_game_state(dict(arena, bombs=[[[1, 3], 1]]))
+    safe_actions = DangerMap(grid).safe_actions()
+    assert safe_actions[0][0] == "RIGHT"
+    assert "DOWN" not in [action for action, _ in safe_actions]
+
+def test_burning_cells_are_avoided(arena):
+    explosion_map = np.zeros((SIZE, SIZE), int)
+    explosion_map[1, 2] = 2
+    grid = parse_game_state(dict(arena, explosion_map=explosion_map.tolist()))
+    assert "DOWN" not in [action for action, _ in DangerMap(grid).safe_actions()]
+
+def test_features_carry_the_danger_map(arena):
+    grid = parse_game_state(dict(arena, bombs=[[[1, 1], 3]], self=["me", 0, False, [1, 1]]))
+    check_bomb_radius = compute_features(grid)["check_bomb_radius"]
+    assert check_bomb_radius["in_danger"] == "yes"
+    assert check_bomb_radius["escape_bomb_action"] == "RIGHT"
+    assert check_bomb_radius["danger_horizon"] > 0
@@ -0,0 +1,40 @@
+import asyncio
+import httpx
+import pytest
+import mock_llm
+from mock_llm import MockLLM
+
+@pytest.fixture
+def throttling(monkeypatch):
+    monkeypatch.setattr(mock_llm, "MOCK_LATENCY_MS", 0)
+    monkeypatch.setattr(mock_llm, "MOCK_THROTTLE_RATE", 1)
+    monkeypatch.setattr(mock_llm, "MOCK_FAULT_DEPLOYMENTS", ["dev_reasoning"])
+
+def complete(backend, model):
+    async def scenario():
+        async with httpx.AsyncClient(transport=backend.transport()) as client:
+            body = {"model": model, "messages": [{"role": "user", "content": "tick"}]}
+            return await client.post(f"http://mock-llm.local/openai/deployments/{model}/chat/completions", json=body)
+    return asyncio.run(scenario())
+
+def test_faults_are_matched_on_the_deployment_behind_the_model(throttling):
+    backend = MockLLM("dev", {"gpt-4o": "dev", "gpt-5": "dev_reasoning"})
+    assert complete(backend, "gpt-5").status_code == 429
+    assert complete(backend, "gpt-4o").status_code == 200
+    assert backend.stats() == {"requests": 2, "injected": {"throttled": 1, "server_error": 0, "timeout": 0}, "fault_deployments": ["dev_reasoning"]}
+
+def test_other_clients_are_left_alone(throttling):
+    backend = MockLLM("primary", {"gpt-4o": "primary"})
+    assert complete(backend, "gpt-4o").status_code == 200
+    assert backend.stats()["fault_deployments"] == []
+
+def test_answers_follow_the_response_schema(monkeypatch):
+    monkeypatch.setattr(mock_llm, "MOCK_LATENCY_MS", 0)
+    schema = {"type": "object", "properties": {"action": {"type": "string", "enum": ["UP", "LEFT"]}}, "required": ["action"]}
+    async def scenario():
+        async with httpx.AsyncClient(transport=MockLLM("primary").transport()) as client:
+            body = {"model": "gpt-4o", "messages": [{"role": "user", "content": "tick"}], "response_format": {"type": "json_schema", "json_schema": {"schema": schema}}}
+            return await client.post("http://mock-llm.local/openai/deployments/gpt-4o/chat/completions", json=body)
+    completion = asyncio.run(scenario()).json()
+    assert completion["choices"][0]["message"]["content"] in ('{"action": "UP"}', '{"action": "LEFT"}')
+    assert completion["usage"]["total_tokens"] > 0
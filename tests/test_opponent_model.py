@@ -0,0 +1,56 @@
+from opponent_model import OpponentModel, position_moves, opponent_key
+
+def opponent(positions, name="alice", **fields):
+    return dict({"name": name, "last_3_actions": positions, "valid_moves": ["UP", "DOWN", "LEFT", "RIGHT", "WAIT"]}, **fields)
+
+def test_moves_are_read_from_consecutive_positions():
+    assert position_moves([[5, 8], [5, 7], [6, 7], [6, 7]]) == ["UP", "RIGHT", "WAIT"]
+    assert position_moves([[5, 8], [5, 5], ["x", 1]]) == []
+
+def test_repeated_moves_are_predicted_with_growing_confidence():
+    model = OpponentModel()
+    _, before, _ = model.predict(opponent([[5, 9], [5, 8]]))
+    for step in range(10):
+        model.observe(opponent([[5, 9 + step], [5, 8 + step], [5, 7 + step]]), step)
+    action, after, _ = model.predict(opponent([[5, 9], [5, 8]]))
+    assert action == "UP" and after > before
+
+def test_a_resent_tick_is_learnt_once():
+    model = OpponentModel()
+    for _ in range(3):
+        model.observe(opponent([[5, 9], [5, 8]]), step=4)
+    assert model.transitions["alice"].sum() == 1
+
+def test_escapes_outweigh_recent_habits():
+    model = OpponentModel()
+    for step in range(2):
+        model.observe(opponent([[5, 9 + step], [5, 8 + step], [5, 7 + step]]), step)
+    action, _, _ = model.predict(opponent([[5, 9], [5, 8]], in_danger=True, escape_routes=["LEFT"]))
+    assert action == "LEFT"
+
+def test_opponents_of_the_same_name_are_kept_apart_per_game():
+    model = OpponentModel()
+    for step in range(5):
+        model.observe(opponent([[5, 9 + step], [5, 8 + step], [5, 7 + step]]), step, game_id="game-1")
+        model.observe(opponent([[5 + step, 9], [6 + step, 9], [7 + step, 9]]), step, game_id="game-2")
+    assert set(model.transitions) == {("game-1", "alice"), ("game-2", "alice")}
+    assert model.predict(opponent([[5, 9], [5, 8]]), "game-1")[0] == "UP"
+    assert model.predict(opponent([[5, 9], [6, 9]]), "game-2")[0] == "RIGHT"
+
+def test_opponents_are_tracked_by_name_without_a_game_id():
+    assert opponent_key("alice") == "alice"
+    assert opponent_key("alice", "game-1") == ("game-1", "alice")
+
+def test_predictions_are_scored_against_the_next_move_of_their_game():
+    model = OpponentModel()
+    model.record_prediction("alice", "UP", "local", game_id="game-1")
+    model.observe(opponent([[5, 9], [5, 8]]), 1, game_id="game-2")
+    assert model.stats()["hit_rate"]["local"] is None
+    model.observe(opponent([[5, 9], [5, 8]]), 1, game_id="game-1")
+    assert model.stats()["hit_rate"]["local"] == 1.0
+
+def test_least_recently_seen_opponents_are_evicted():
+    model = OpponentModel(max_opponents=2)
+    for name in ("alice", "bob", "carol"):
+        model.observe(opponent([[5, 9], [5, 8]], name=name))
+    assert list(model.transitions) == ["bob", "carol"]
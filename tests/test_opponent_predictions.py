@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+import agentic_app
+import specialised_agents.predict as predict
+from agent_cache import AgentCache
+from opponent_model import OpponentModel
+
+OPPONENTS = [{"name": name, "valid_moves": ["UP", "DOWN", "WAIT"]} for name in ("alice", "bob", "carol")]
+
+@pytest.fixture
+def calls(monkeypatch):
+    """
+    Predictions answered by fake agent calls, recorded per call with the opponents they covered.
+    """
+    calls = []
+    async def predict_batch(need_reasoning, opponents, game_state, check_bomb_radius, plant_bomb_available):
+        calls.append([opp["name"] for opp in opponents])
+        return [{"reasoning": "Batched.", "action": "UP"} for _ in opponents]
+    async def predict_single(need_reasoning, opp, game_state, valid_movement, check_bomb_radius, plant_bomb_available):
+        calls.append([opp["name"]])
+        return {"reasoning": "Single.", "action": "DOWN"}
+    monkeypatch.setattr(agentic_app, "predict_opponent_moves", predict_batch)
+    monkeypatch.setattr(agentic_app, "predict_opponent_move", predict_single)
+    monkeypatch.setattr(agentic_app, "local_predictions", lambda opponents, step=None, game_id=None: ({}, opponents))
+    monkeypatch.setattr(agentic_app, "opponent_model", OpponentModel())
+    return calls
+
+def predict_opponents(timeout=None):
+    return asyncio.run(agentic_app.predict_opponents("no", OPPONENTS, "{}", ["UP"], {}, {}, timeout=timeout))
+
+def test_opponents_are_predicted_in_one_batched_call(calls, monkeypatch):
+    monkeypatch.setattr(agentic_app, "BATCHED_OPPONENT_PREDICTION", True)
+    predictions = predict_opponents()
+    assert calls == [["alice", "bob", "carol"]]
+    assert predictions == {name: {"reasoning": "Batched.", "action": "UP"} for name in ("alice", "bob", "carol")}
+
+def test_batching_can_be_disabled(calls, monkeypatch):
+    monkeypatch.setattr(agentic_app, "BATCHED_OPPONENT_PREDICTION", False)
+    predictions = predict_opponents()
+    assert sorted(calls) == [["alice"], ["bob"], ["carol"]]
+    assert {prediction["action"] for prediction in predictions.values()} == {"DOWN"}
+
+def test_predictions_not_done_in_time_are_marked_as_failed(calls, monkeypatch):
+    async def slow_batch(*args):
+        await asyncio.sleep(1)
+    monkeypatch.setattr(agentic_app, "predict_opponent_moves", slow_batch)
+    predictions = predict_opponents(timeout=0.01)
+    assert predictions == {name: {"action": "UNKNOWN", "reasoning": "Prediction failed"} for name in ("alice", "bob", "carol")}
+
+def test_batched_answers_are_split_in_the_order_of_the_opponents(monkeypatch):
+    async def run_agent(specialist, input):
+        return {"opponent_2": {"action": "DOWN"}, "opponent_1": {"action": "UP"}}
+    monkeypatch.setattr(predict, "run_agent", run_agent)
+    monkeypatch.setattr(predict, "agent_cache", AgentCache())
+    monkeypatch.setattr(predict.BatchPredictAgent, "build_agent", lambda self, opponents_valid_moves: object())
+    async def scenario():
+        agent = predict.BatchPredictAgent()
+        await agent.initialise_agent("no", "{}", [["UP"], ["DOWN", "DOWN"]])
+        return agent, await agent.run_agent("input")
+    agent, predictions = asyncio.run(scenario())
+    assert predictions == [{"action": "UP"}, {"action": "DOWN"}]
+    assert agent.allowed_actions == (("UP",), ("DOWN",))
@@ -0,0 +1,78 @@
+import pytest
+import plan
+from plan import Plan, PlanStats, serve_plan, record_plan
+from session_store import GameSession, current_session
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(plan, "PLAN_MODE", True)
+    monkeypatch.setattr(plan, "plan_stats", PlanStats())
+    session = GameSession("game-1")
+    token = current_session.set(session)
+    yield session
+    current_session.reset(token)
+
+def features(valid_movement=("UP", "RIGHT"), history=(), in_danger="no", coin_action="UP", **check_bomb_radius):
+    return {
+        "valid_movement": list(valid_movement),
+        "nearest_crate": {"crate_available": "no"},
+        "check_bomb_radius": dict(check_bomb_radius, in_danger=in_danger),
+        "plant_bomb_available": {"plant": "false"},
+        "coins_collection_policy": {"coin_available": "yes", "coin_action": coin_action},
+        "movement_history": [{"action": action} for action in history],
+    }
+
+def agent_decision(action="UP", steps=("UP", "UP"), conditions=("coin_available",)):
+    return {"reasoning": "Walk to the coin.", "action": action, "plan": list(steps), "plan_valid_while": list(conditions)}
+
+def test_plans_are_served_step_by_step_then_dropped(session):
+    record_plan("bot", agent_decision())
+    session.record_decision(agent_decision())
+    first = serve_plan("bot", features(history=["UP"]))
+    assert (first["action"], first["source"], first["plan"]) == ("UP", "plan", ["UP"])
+    session.record_decision(first)
+    assert serve_plan("bot", features(history=["UP", "UP"]))["plan"] == []
+    assert session.plan is None and serve_plan("bot", features()) is None
+    assert plan.plan_stats.stats()["bot"] == {"ticks": 3, "served_from_plan": 2, "llm_calls": 1, "llm_calls_per_tick": 0.3333, "from_cache": 0, "plans": 1}
+
+@pytest.mark.parametrize("tick, reason", [
+    (features(in_danger="yes"), "danger"),
+    (features(ticks_to_explosion=3), "danger"),
+    (features(history=["LEFT"]), "deviation"),
+    (features(valid_movement=["RIGHT"]), "invalid_action"),
+    (dict(features(), coins_collection_policy={"coin_available": "no"}), "coin_available"),
+])
+def test_plans_are_dropped_when_the_tick_breaks_them(session, tick, reason):
+    record_plan("bot", agent_decision())
+    session.record_decision(agent_decision())
+    assert serve_plan("bot", tick) is None
+    assert session.plan is None
+    assert plan.plan_stats.stats()["invalidations"] == {reason: 1}
+
+@pytest.mark.parametrize("step, plant, condition, reason", [
+    ("BOMB", "false", [], "invalid_action"),
+    ("RIGHT", "false", ["follows_coin_action"], "follows_coin_action"),
+    ("RIGHT", "false", ["crate_available"], "crate_available"),
+])
+def test_check_tells_why_a_step_cannot_be_served(step, plant, condition, reason):
+    tick = dict(features(), plant_bomb_available={"plant": plant})
+    assert Plan([step], condition, "").check(tick, None) == reason
+
+def test_bombs_and_waits_are_served_when_allowed():
+    tick = dict(features(valid_movement=["UP"]), plant_bomb_available={"plant": "true"})
+    assert Plan(["BOMB"], [], "").check(tick, None) is None
+    assert Plan(["WAIT"], [], "").check(tick, None) is None
+
+def test_local_decisions_drop_the_plan_and_cached_ones_keep_theirs(session):
+    record_plan("bot", agent_decision())
+    record_plan("bot", {"action": "LEFT", "source": "fast_path"})
+    assert session.plan is None
+    record_plan("bot", dict(agent_decision(), source="cache"))
+    assert list(session.plan.actions) == ["UP", "UP"]
+    assert plan.plan_stats.stats()["bot"]["from_cache"] == 1
+
+def test_plans_are_capped_and_ignored_outside_game_sessions(monkeypatch):
+    monkeypatch.setattr(plan, "PLAN_MAX_STEPS", 2)
+    assert list(Plan.from_decision(agent_decision(steps=["UP"] * 5)).actions) == ["UP", "UP"]
+    assert Plan.from_decision({"action": "UP", "plan": []}) is None
+    assert serve_plan("bot", features()) is None
@@ -0,0 +1,58 @@
+import pytest
+import prompt_builder
+from prompt_builder import PromptBuilder, PromptStats, opponent_relevance
+
+MOVES = [{"action": action, "reasoning": f"Reason {idx} " + "x" * 80} for idx, action in enumerate(["UP", "UP", "LEFT", "DOWN", "WAIT"])]
+
+@pytest.fixture(autouse=True)
+def tokens(monkeypatch):
+    monkeypatch.setattr(prompt_builder, "estimate_tokens", lambda text: len(text) // 4)
+    monkeypatch.setattr(prompt_builder, "prompt_stats", PromptStats())
+
+def builder(budget):
+    prompt = PromptBuilder("bot")
+    prompt.budget = budget
+    prompt.set_roster([{"name": "zed"}, {"name": "amy"}])
+    prompt.add("status", valid_movement=["UP", "LEFT"], current_status="No bomb detected.")
+    prompt.set_history(MOVES)
+    prompt.set_opponents("Opponents:\n")
+    prompt.add_opponent("far opponent" + "y" * 200 + "\n", relevance=-0.9)
+    prompt.add_opponent("threat opponent" + "y" * 200 + "\n", relevance=2)
+    prompt.add_opponent("near opponent" + "y" * 200 + "\n", relevance=-0.1)
+    prompt.append("rl_suggestion", rl_model_suggestion="UP")
+    return prompt
+
+def test_prompts_under_budget_are_laid_out_game_first():
+    prompt, tokens, saved = builder(None).build()
+    assert prompt.startswith("Opponents in the game : amy, zed\nLast 5 Moves :\n")
+    assert prompt.index("Valid Movement") < prompt.index("threat opponent") < prompt.index("near opponent") < prompt.index("far opponent")
+    assert prompt.endswith("Q Learning Model actions : UP")
+    assert saved == 0 and tokens == len(prompt) // 4
+
+def test_older_moves_are_summarised_first():
+    full, full_tokens, _ = builder(None).build()
+    prompt, tokens, saved = builder(full_tokens - 30).build()
+    assert "Earlier actions : UP, UP" in prompt and "Reason 0" not in prompt and "Reason 4" in prompt
+    assert "far opponent" in prompt
+    assert tokens <= full_tokens - 30 and saved == full_tokens - tokens
+
+def test_least_relevant_opponents_are_dropped_after_the_history():
+    # Just over budget once the history is summarised down to its last move
+    budget = len(builder(None).render_prompt(1, 3)) // 4 - 1
+    prompt, tokens, _ = builder(budget).build()
+    assert "Earlier actions : UP, UP, LEFT, DOWN\nAction : WAIT" in prompt
+    assert "near opponent" in prompt and "far opponent" not in prompt
+    assert tokens <= budget
+
+def test_the_most_relevant_opponents_are_always_kept():
+    prompt, tokens, saved = builder(1).build()
+    assert "threat opponent" in prompt and "near opponent" not in prompt
+    assert "(2 lower relevance opponents omitted)" in prompt
+    assert "Reason" not in prompt
+    assert prompt_builder.prompt_stats.stats()["bot"]["trimmed"] == 1
+
+def test_threats_rank_above_vulnerable_then_close_opponents():
+    threat = opponent_relevance({"can_bomb_us": True, "distance_to_us": 9.0})
+    vulnerable = opponent_relevance({"in_danger": True, "distance_to_us": 2.0})
+    close, far, unknown = (opponent_relevance({"distance_to_us": distance}) for distance in (1.0, 8.0, None))
+    assert threat > vulnerable > close > far > unknown
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+import httpx
+import openai
+import pytest
+import resilience
+from resilience import CircuitBreaker, ResilientExecutor, HedgeStats, CLOSED, OPEN, HALF_OPEN, reserved_tokens
+from agent_settings import BREAKER_THROTTLE_TRIP
+from llm import Deployment
+from deadline import DeadlineExceeded
+
+def throttled():
+    request = httpx.Request("POST", "https://primary.example/chat/completions")
+    return openai.RateLimitError("Too many requests", response=httpx.Response(429, request=request), body=None)
+
+@pytest.fixture
+def executor(monkeypatch):
+    """
+    Executor over two chat deployments, whose agent runs are answered by the outcomes set per deployment.
+    """
+    executor = ResilientExecutor(routes={"chat": [Deployment("primary", "primary", "gpt"), Deployment("dev", "dev", "gpt")]})
+    executor.outcomes = {"primary": "ok", "dev": "ok"}
+    executor.runs = []
+    executor.delays = {}
+    async def run(agent, input, max_turns, hooks):
+        executor.runs.append(agent)
+        await asyncio.sleep(executor.delays.get(agent, 0))
+        if executor.outcomes[agent] == "throttled":
+            raise throttled()
+        return SimpleNamespace(final_output=agent, context_wrapper=SimpleNamespace(usage=SimpleNamespace(total_tokens=10)))
+    monkeypatch.setattr(resilience.Runner, "run", run)
+    monkeypatch.setattr(executor, "agent_for", lambda specialist, deployment: deployment.name)
+    return executor
+
+SPECIALIST = SimpleNamespace(name="bomberman", kind="bomberman", route="chat", agent=SimpleNamespace(instructions="Play."))
+
+def test_breaker_trips_on_consecutive_throttles_then_probes():
+    breaker = CircuitBreaker("primary")
+    for _ in range(BREAKER_THROTTLE_TRIP):
+        assert breaker.allow()
+        breaker.record_failure(throttled())
+    assert breaker.state == OPEN and not breaker.allow()
+    breaker.opened_at -= breaker.cooldown
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    # A single probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+def test_failed_probe_opens_the_breaker_again():
+    breaker = CircuitBreaker("primary")
+    breaker.trip()
+    breaker.opened_at -= breaker.cooldown
+    assert breaker.allow()
+    breaker.record_failure(throttled())
+    assert breaker.state == OPEN
+
+def test_throttled_deployment_fails_over_and_trips(executor):
+    executor.outcomes["primary"] = "throttled"
+    for _ in range(BREAKER_THROTTLE_TRIP):
+        assert asyncio.run(executor.run(SPECIALIST, "tick")).final_output == "dev"
+    assert executor.breakers["primary"].state == OPEN
+    assert executor.failovers == BREAKER_THROTTLE_TRIP
+    # With the breaker open, calls go straight to the failover deployment
+    executor.runs.clear()
+    assert asyncio.run(executor.run(SPECIALIST, "tick")).final_output == "dev"
+    assert executor.runs == ["dev"]
+
+def test_healthy_primary_is_preferred(executor):
+    assert asyncio.run(executor.run(SPECIALIST, "tick")).final_output == "primary"
+    assert executor.failovers == 0
+
+def test_shed_calls_are_logged_as_warnings(executor, monkeypatch, caplog):
+    async def acquire(tokens):
+        raise DeadlineExceeded("0.00s left, not enough to be admitted to deployment primary")
+    monkeypatch.setattr(executor.admission["primary"], "acquire", acquire)
+    with caplog.at_level(logging.WARNING, logger="resilience"):
+        with pytest.raises(DeadlineExceeded):
+            asyncio.run(executor.run(SPECIALIST, "tick"))
+    assert [record.levelno for record in caplog.records] == [logging.WARNING]
+    assert "shed" in caplog.records[0].getMessage()
+
+def test_hedged_calls_account_for_the_tokens_of_the_loser(executor, monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGING_ENABLED", True)
+    for _ in range(resilience.HEDGE_MIN_SAMPLES):
+        executor.latencies["primary"].record(0.01)
+    executor.delays["primary"] = 1
+    assert asyncio.run(executor.run(SPECIALIST, "tick")).final_output == "dev"
+    stats = executor.hedges.stats()
+    assert stats["fired"] == 1 and stats["hedge_wins"] == 1
+    # The primary was cancelled before answering, only an estimate of its tokens is known
+    assert stats["extra_tokens"] == 0
+    assert stats["extra_tokens_estimate"] == reserved_tokens(SPECIALIST, "tick")
+
+def test_losers_that_answered_count_their_reported_usage():
+    async def scenario():
+        hedges, loser = HedgeStats(), asyncio.get_running_loop().create_future()
+        loser.set_result(SimpleNamespace(context_wrapper=SimpleNamespace(usage=SimpleNamespace(total_tokens=42))))
+        hedges.record_loser(loser, 500)
+        return hedges.stats()
+    stats = asyncio.run(scenario())
+    assert stats["extra_tokens"] == 42 and stats["extra_tokens_estimate"] == 0
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+import msgspec
+import pytest
+from schemas import decode_tick
+
+PAYLOAD = json.loads((Path(__file__).parent.parent / "test_payload.json").read_text())
+
+def payload(**changes):
+    data = json.loads(json.dumps(PAYLOAD))
+    data.update(changes)
+    return json.dumps(data).encode()
+
+def without_nulls(value):
+    if isinstance(value, dict):
+        return {key: without_nulls(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [without_nulls(item) for item in value]
+    return value
+
+def test_game_payload_round_trips():
+    data = decode_tick(json.dumps(PAYLOAD).encode())
+    for field in ("valid_movement", "nearest_crate", "check_bomb_radius", "plant_bomb_available", "coins_collection_policy", "movement_history", "opponents"):
+        assert data[field] == without_nulls(PAYLOAD[field])
+
+def test_flags_are_normalised_to_the_values_the_agents_compare_against():
+    opponents = [dict(PAYLOAD["opponents"][0], bombs_available=True, in_danger=1, can_bomb_us="no")]
+    data = decode_tick(payload(
+        need_reasoning=True,
+        opponents=opponents,
+        check_bomb_radius={"in_bomb_radius": 0, "in_danger": True, "escape_bomb_action": "LEFT"},
+        plant_bomb_available={"plant": "TRUE"},
+        coins_collection_policy=json.dumps({"coin_available": "1"}),
+    ))
+    assert data["need_reasoning"] == "yes"
+    assert data["check_bomb_radius"] == {"in_bomb_radius": "no", "in_danger": "yes", "escape_bomb_action": "LEFT"}
+    assert data["plant_bomb_available"] == {"plant": "true"}
+    assert data["coins_collection_policy"] == {"coin_available": "yes"}
+    assert (data["opponents"][0]["in_danger"], data["opponents"][0]["can_bomb_us"], data["opponents"][0]["bombs_available"]) == (True, False, 1.0)
+
+def test_numbers_sent_as_strings_are_turned_into_numbers():
+    opponents = [dict(PAYLOAD["opponents"][0], distance_to_us="8.5", score="3")]
+    data = decode_tick(payload(opponents=opponents, nearest_crate={"crate_distance": "2"}))
+    assert data["opponents"][0]["distance_to_us"] == 8.5
+    assert data["opponents"][0]["score"] == 3.0
+    assert data["nearest_crate"]["crate_distance"] == 2.0
+
+def test_null_fields_are_dropped():
+    data = decode_tick(payload(opponents=None, deadline_ms=None))
+    assert "opponents" not in data and "deadline_ms" not in data
+
+def test_unknown_keys_are_kept_and_known_ones_still_normalised():
+    check_bomb_radius = dict(PAYLOAD["check_bomb_radius"], in_danger=True, blast_power=2)
+    opponents = [dict(PAYLOAD["opponents"][0], team="red", score="3")]
+    data = decode_tick(payload(check_bomb_radius=json.dumps(check_bomb_radius), opponents=opponents, season=4, tick=None))
+    assert data["check_bomb_radius"]["blast_power"] == 2 and data["check_bomb_radius"]["in_danger"] == "yes"
+    assert data["opponents"][0]["team"] == "red" and data["opponents"][0]["score"] == 3.0
+    assert data["season"] == 4 and "tick" not in data
+
+def test_whole_payload_as_json_string():
+    assert decode_tick(json.dumps(json.dumps(PAYLOAD)).encode())["opponents"] == without_nulls(PAYLOAD["opponents"])
+
+@pytest.mark.parametrize("changes", [
+    {"opponents": [{"position": "north"}]},
+    {"opponents": [{"position": "north", "team": "red"}]},
+    {"nearest_crate": "{not json"},
+    {"valid_movement": {"UP": True}},
+    {"check_bomb_radius": {"in_danger": "maybe"}},
+    {"check_bomb_radius": {"in_danger": 2, "blast_power": 2}},
+])
+def test_malformed_payloads_are_rejected(changes):
+    with pytest.raises(msgspec.MsgspecError):
+        decode_tick(payload(**changes))
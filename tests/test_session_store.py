@@ -0,0 +1,48 @@
+import time
+from session_store import GameSession, SessionStore
+
+def test_left_out_history_is_filled_from_recorded_decisions():
+    session = GameSession("game-1")
+    session.record_decision({"reasoning": "Go.", "action": "UP", "source": "llm"})
+    session.record_decision({"reasoning": "Error!", "source": "error"})
+    assert session.apply_delta({})["movement_history"] == [{"reasoning": "Go.", "action": "UP"}]
+    assert session.ticks == 2
+
+def test_sent_history_replaces_the_recorded_one():
+    session = GameSession("game-1")
+    session.record_decision({"reasoning": "Go.", "action": "UP"})
+    session.apply_delta({"movement_history": [{"action": "LEFT"}]})
+    assert session.apply_delta({})["movement_history"] == [{"action": "LEFT"}]
+
+def test_opponent_deltas_are_merged_and_extend_the_positions():
+    session = GameSession("game-1")
+    session.apply_delta({"opponents": [{"name": "alice", "position": [1, 1], "score": 3}]})
+    data = session.apply_delta({"opponents": [{"name": "alice", "position": [1, 2]}, {"name": "bob", "last_3_actions": [[5, 5], [5, 4]]}]})
+    alice, bob = data["opponents"]
+    assert alice == {"name": "alice", "position": [1, 2], "score": 3, "last_3_actions": [[1, 1], [1, 2]]}
+    assert bob["last_3_actions"] == [[5, 5], [5, 4]]
+    data = session.apply_delta({"opponents_removed": ["bob"]})
+    assert [opp["name"] for opp in data["opponents"]] == ["alice"]
+
+def test_only_the_last_three_positions_are_sent_to_the_agents():
+    session = GameSession("game-1")
+    for y in range(5):
+        data = session.apply_delta({"opponents": [{"name": "alice", "position": [1, y]}]})
+    assert data["opponents"][0]["last_3_actions"] == [[1, 2], [1, 3], [1, 4]]
+
+def test_the_least_recently_used_game_is_evicted():
+    store = SessionStore(max_games=2)
+    first = store.get("a")
+    store.get("b")
+    assert store.get("a") is first
+    store.get("c")
+    assert list(store.sessions) == ["a", "c"]
+    assert store.stats()["evicted"] == 1
+
+def test_idle_games_expire(monkeypatch):
+    store, now = SessionStore(idle_seconds=10), [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    first = store.get("a")
+    now[0] += 11
+    assert store.get("a") is not first
+    assert store.stats()["expired"] == 1
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+import pytest
+import agent_runner
+from single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flights, calls = SingleFlight(), []
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"action": "UP"}
+        results = await asyncio.gather(*(flights.run("key", call) for _ in range(5)))
+        return flights, calls, results
+    flights, calls, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"action": "UP"}] * 5
+    assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 4, "cancelled": 0}
+
+def test_call_survives_a_caller_that_leaves():
+    async def scenario():
+        flights = SingleFlight()
+        async def call():
+            await asyncio.sleep(0.05)
+            return "done"
+        return await asyncio.gather(asyncio.wait_for(flights.run("key", call), 0.01), flights.run("key", call), return_exceptions=True)
+    impatient, patient = asyncio.run(scenario())
+    assert isinstance(impatient, asyncio.TimeoutError)
+    assert patient == "done"
+
+def test_call_is_cancelled_once_every_caller_left():
+    async def scenario():
+        flights, cancelled = SingleFlight(), asyncio.Event()
+        async def call():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        await asyncio.gather(*(asyncio.wait_for(flights.run("key", call), 0.01) for _ in range(3)), return_exceptions=True)
+        await asyncio.sleep(0)
+        return flights, cancelled.is_set()
+    flights, cancelled = asyncio.run(scenario())
+    assert cancelled
+    assert flights.stats()["cancelled"] == 1 and flights.stats()["in_flight"] == 0
+
+def test_exceptions_reach_every_caller():
+    async def scenario():
+        flights = SingleFlight()
+        async def call():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+        return await asyncio.gather(flights.run("key", call), flights.run("key", call), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in asyncio.run(scenario()))
+
+@pytest.mark.parametrize("temperature, runs", [(0, 1), (None, 3)])
+def test_only_deterministic_agent_calls_are_coalesced(monkeypatch, temperature, runs):
+    calls = []
+    async def run(specialist, input):
+        calls.append(input)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(final_output=SimpleNamespace(model_dump=lambda: {"reasoning": "r", "action": "UP"}))
+    monkeypatch.setattr(agent_runner.executor, "run", run)
+    monkeypatch.setattr(agent_runner, "DECISION_CACHE_ENABLED", False)
+    agent = SimpleNamespace(model_settings=SimpleNamespace(temperature=temperature), model=SimpleNamespace(model="gpt"), instructions="Play.")
+    specialist = SimpleNamespace(agent=agent, kind="bomberman", allowed_actions=("UP",))
+
+    async def scenario():
+        return await asyncio.gather(*(agent_runner.run_agent(specialist, f"tick at temperature {temperature}") for _ in range(3)))
+    results = asyncio.run(scenario())
+    assert len(calls) == runs
+    assert all(result["action"] == "UP" for result in results)
@@ -1,47 +1,95 @@
-from agents import Agent, RunContextWrapper, RunHooks, Runner, Tool, Usage, function_tool
-import traceback
+from agents import Agent, RunContextWrapper, RunHooks
+from collections import defaultdict
+import time
+import logging
+from metrics import LLM_LATENCY, INPUT_TOKENS, CACHED_INPUT_TOKENS, OUTPUT_TOKENS
 
-class ToolLogger(RunHooks):
+logger = logging.getLogger(__name__)
+
+def cached_tokens(usage):
+    details = getattr(usage, "input_tokens_details", None)
+    return (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+class PromptCacheStats():
+    """
+    Cached vs uncached input tokens per agent, as reported in the usage of the provider,
+    with the mean latency of calls that hit and missed the prompt cache.
+    """
     def __init__(self):
+        self.agents = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "cached_tokens": 0, "hit_calls": 0, "hit_latency": 0.0, "miss_latency": 0.0})
+
+    def record(self, agent_name, usage, latency):
+        stats = self.agents[agent_name]
+        cached = cached_tokens(usage)
+        stats["calls"] += 1
+        stats["input_tokens"] += usage.input_tokens
+        stats["cached_tokens"] += cached
+        if cached:
+            stats["hit_calls"] += 1
+            stats["hit_latency"] += latency
+        else:
+            stats["miss_latency"] += latency
+
+    def stats(self):
+        result = {}
+        for agent_name, stats in self.agents.items():
+            miss_calls = stats["calls"] - stats["hit_calls"]
+            result[agent_name] = {
+                "calls": stats["calls"],
+                "input_tokens": stats["input_tokens"],
+                "cached_tokens": stats["cached_tokens"],
+                "uncached_tokens": stats["input_tokens"] - stats["cached_tokens"],
+                "cached_rate": round(stats["cached_tokens"] / stats["input_tokens"], 3) if stats["input_tokens"] else 0.0,
+                "avg_latency_cache_hit": round(stats["hit_latency"] / stats["hit_calls"], 3) if stats["hit_calls"] else None,
+                "avg_latency_cache_miss": round(stats["miss_latency"] / miss_calls, 3) if miss_calls else None,
+            }
+        return result
+
+prompt_cache_stats = PromptCacheStats()
+
+class ToolLogger(RunHooks):
+    """
+    Logs the agent and tool events of a run on one deployment, and feeds its latency and token usage to the metrics.
+    """
+    def __init__(self, deployment="unknown"):
+        self.deployment = deployment
         self.event_counter = 0
-        self.total_input_tokens = 0
-        self.total_output_tokens = 0
-
-    def _usage_to_str(self, usage) -> str:
-        return (
-            f"🧾 Usage → "
-            f"{usage.requests} requests | "
-            f"{usage.input_tokens} input tokens | "
-            f"{usage.output_tokens} output tokens | "
-            f"{usage.total_tokens} total tokens"
-        )
+        self.started_at = {}
 
     async def on_agent_start(self, context, agent) -> None:
         self.event_counter += 1
-        self.total_input_tokens += context.usage.input_tokens
-        self.total_output_tokens += context.usage.output_tokens
-        print("\n" + "="*60)
-        print(f"🚀 Event #{self.event_counter} → Agent: **{agent.name}** started")
-        print(f"   {self._usage_to_str(context.usage)}")
-        print("="*60)
-    
+        self.started_at[agent.name] = time.monotonic()
+        logger.debug("Agent started", extra={"agent": agent.name, "deployment": self.deployment, "event": self.event_counter})
+
     async def on_agent_end(self, context: RunContextWrapper, agent: Agent, output: any) -> None:
         self.event_counter += 1
-        self.total_input_tokens += context.usage.input_tokens
-        self.total_output_tokens += context.usage.output_tokens
-        print("\n" + "-"*60)
-        print(f"🏁 Event #{self.event_counter} → Agent: **{agent.name}** ended")
-        print(f"   ↪ Output: {output}")
-        print(f"   {self._usage_to_str(context.usage)}")
-        print("-"*60)
-        
+        INPUT_TOKENS.labels(self.deployment).inc(context.usage.input_tokens)
+        CACHED_INPUT_TOKENS.labels(self.deployment).inc(cached_tokens(context.usage))
+        OUTPUT_TOKENS.labels(self.deployment).inc(context.usage.output_tokens)
+        latency = None
+        started_at = self.started_at.pop(agent.name, None)
+        if started_at is not None:
+            latency = time.monotonic() - started_at
+            LLM_LATENCY.labels(agent.name, self.deployment).observe(latency)
+            prompt_cache_stats.record(agent.name, context.usage, latency)
+        logger.info("Agent ended", extra={
+            "agent": agent.name,
+            "deployment": self.deployment,
+            "event": self.event_counter,
+            "latency_seconds": round(latency, 3) if latency is not None else None,
+            "requests": context.usage.requests,
+            "input_tokens": context.usage.input_tokens,
+            "cached_tokens": cached_tokens(context.usage),
+            "output_tokens": context.usage.output_tokens,
+        })
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Agent output", extra={"agent": agent.name, "output": output})
+
     async def on_tool_start(self, context, agent, tool):
-        print(f"[🛠 START] Agent: {agent.name} | Tool: {tool.name}")
+        logger.debug("Tool started", extra={"agent": agent.name, "tool": tool.name})
 
     async def on_tool_end(self, context, agent, tool, result):
-        print(f"[✅ END] Tool: {tool.name} by Agent: {agent.name}")
-        # print(f"Output: {result}")
-    
+        logger.debug("Tool ended", extra={"agent": agent.name, "tool": tool.name})
+
     async def on_tool_error(self, context, agent, tool, error):
-        print(f"[❌ ERROR] Tool: {tool.name} failed with error: {error}")
-        print(traceback.format_exc())
\ No newline at end of file
+        logger.error(f"Tool failed with error: {error}", extra={"agent": agent.name, "tool": tool.name}, exc_info=error)